@@ -2,15 +2,16 @@
 # pip freeze > requirements.txt
 
 import streamlit as st
-import pandas as pd
 from packaging_list_parser import parse_packaging_list
-from coa_parser import parse_certificate_of_analysis
-from match_coa_to_packing_list import validate_against_packaging_list
-from sterilization_cert import parse_sterilization_certificate  
-from validate_sc import validate_sc_against_sources
-import smtplib
-from email.message import EmailMessage
-from io import StringIO
+from parse_cache import cached_parse, content_hash, read_file_bytes
+from report_export import report_excel_bytes, report_signature
+from validation_state import ValidationState, client_report
+from results_view import cached_view, render_results
+from job_queue import FINISHED, STAGES, STAGE_LABELS, get_runner
+from history_store import get_history_store
+from product_master import get_product_master
+import timing
+from email_outbox import describe, get_outbox, get_sender, send_report, sender_configured
 
 
 
@@ -36,115 +37,111 @@ def login():
 
 login()
 
-# Upload Packing List
-uploaded_file = st.file_uploader("Upload Packing List (Excel)", type=["xlsx", "xls"])
-if uploaded_file:
-    df, extracted_items = parse_packaging_list(uploaded_file)
-    if df is not None:
-        st.success("✅ Packing List Loaded")
-        st.subheader("🔍 Extracted Item Info")
-        st.dataframe(extracted_items)
-        st.session_state["packaging_list"] = extracted_items
-    else:
-        st.error("❌ Failed to parse the uploaded file.")
-
-# Upload multiple COAs
-if "packaging_list" in st.session_state:
-    st.subheader("📄 Upload One or More COA PDFs")
-    coa_files = st.file_uploader("Upload COAs", type=["pdf"], accept_multiple_files=True, key="multi_coa")
-    if coa_files:
-        all_coa_results = []
-        for file in coa_files:
-            coa_data = parse_certificate_of_analysis(file)
-            if coa_data:
-                result_df = validate_against_packaging_list(coa_data, st.session_state["packaging_list"])
-                result_df["COA File"] = file.name
-                all_coa_results.append(result_df)
-            else:
-                st.error(f"❌ Could not extract data from `{file.name}`")
-
-        if all_coa_results:
-            st.markdown("## 📋 COA Validation Results")
-            final_coa_table = pd.concat(all_coa_results, ignore_index=True)
-            total_checks = final_coa_table.shape[0]
-            total_matches = (final_coa_table["Match"] == "✅").sum()
-            total_mismatches = (final_coa_table["Match"] == "❌").sum()
-            st.success(f"Total Fields Checked: {total_checks}")
-            st.info(f"✅ Matches: {total_matches}")
-            st.error(f"❌ Mismatches: {total_mismatches}")
-
-            def highlight_mismatches(val):
-                if val == "❌":
-                    return "color: red; font-weight: bold;"
-                if val == "✅":
-                    return "color: green; font-weight: bold;"
-                return ""
-
-            styled_table = final_coa_table.style.applymap(
-                highlight_mismatches,
-                subset=["Match"]
-            )
-
-            with st.expander("🔍 View Detailed COA Validation Table", expanded=True):
-                st.dataframe(styled_table, use_container_width=True)
+# Timings are collected for this session's run only, so the toggle never affects
+# other sessions or background jobs.
+collect_timings = st.sidebar.toggle("⏱️ Collect timings", key="collect_timings")
+profile_run = st.sidebar.toggle("🧪 Profile this run (cProfile)", key="profile_run")
+timing.collect_run(collect_timings)
+# The profiler is stopped even when Streamlit ends the run early (an exception, or a
+# widget change restarting the script); a hook left enabled breaks the next run.
+profiler = timing.start_profile() if profile_run else None
+profile_report = None
+
+try:
+    final_coa_table = None
+    combined_validation = None
+
+    # Upload Packing List
+    uploaded_file = st.file_uploader("Upload Packing List (Excel)", type=["xlsx", "xls"])
+    if uploaded_file:
+        df, extracted_items = cached_parse(parse_packaging_list, uploaded_file)
+        if df is not None:
+            st.success("✅ Packing List Loaded")
+            st.subheader("🔍 Extracted Item Info")
+            st.dataframe(extracted_items.df)
+            st.session_state["packaging_list"] = extracted_items
+            # Each packing list is added to the product master once per upload, not on every
+            # rerun; sizes and descriptions it lacks are then checked against earlier ones
+            # for the same ref code.
+            packing_list_hash = content_hash(read_file_bytes(uploaded_file))
+            if st.session_state.get("product_master_learned") != packing_list_hash:
+                get_product_master().learn(extracted_items, source=uploaded_file.name)
+                st.session_state["product_master_learned"] = packing_list_hash
+        else:
+            st.error("❌ Failed to parse the uploaded file.")
+
+    background = False
+    if "packaging_list" in st.session_state:
+        background = st.toggle(
+            "🕒 Validate in the background",
+            key="background_mode",
+            help="Runs parsing and validation as a job that keeps going if the page is refreshed or closed.",
+        )
 
-            st.download_button(
-                "⬇️ Download COA Validation Report as CSV",
-                final_coa_table.to_csv(index=False),
-                file_name="coa_validation_report.csv",
-                mime="text/csv"
+    # Upload multiple COAs
+    if "packaging_list" in st.session_state:
+        st.subheader("📄 Upload One or More COA PDFs")
+        coa_files = st.file_uploader("Upload COAs", type=["pdf"], accept_multiple_files=True, key="multi_coa")
+        if coa_files and not background:
+            # Only new or changed files are parsed and revalidated on each rerun.
+            coa_state = st.session_state.setdefault("coa_validation", ValidationState("coa", get_product_master()))
+            coa_progress = st.progress(0.0, text="Parsing COAs...")
+            coa_state.sync(
+                coa_files,
+                st.session_state["packaging_list"],
+                progress=lambda done, total, result: coa_progress.progress(done / total, text=f"Parsed {done}/{total} COAs"),
             )
+            coa_progress.empty()
+            for error in coa_state.errors():
+                st.error(f"❌ {error}")
+            final_coa_table = coa_state.table()
+
+            if final_coa_table is not None:
+                st.markdown("## 📋 COA Validation Results")
+                counts = coa_state.counts()
+                st.success(f"Total Fields Checked: {counts['checks']}")
+                st.info(f"✅ Matches: {counts['matches']}")
+                st.error(f"❌ Mismatches: {counts['mismatches']}")
+
+                # Only the page shown is styled and sent to the browser; filters run on the server.
+                with st.expander("🔍 View Detailed COA Validation Table", expanded=True):
+                    render_results(coa_state.view(), "coa_results")
 
-# Upload Sterilization Certificates
-if "packaging_list" in st.session_state:
-    st.subheader("🧼 Upload Sterilization Certificates (PDFs)")
-    sc_files = st.file_uploader("Upload SC PDFs", type=["pdf"], accept_multiple_files=True, key="multi_sc")
-    if sc_files:
-        sc_results = []
-        for file in sc_files:
-            sc_data_list = parse_sterilization_certificate(file)
-            if sc_data_list:
-                sc_results.extend(sc_data_list)
-            else:
-                st.error(f"❌ Could not extract data from `{file.name}`")
-
-        # Validate SCs only against Packing List
-        if sc_results:
-            st.markdown("## 📋 SC Validation Results")
-            all_validations = []
-            for sc in sc_results:
-                validation_df = validate_sc_against_sources(
-                    sc,
-                    st.session_state["packaging_list"]
-                )
-                validation_df["SC Certificate"] = sc.get("Batch No", "Unknown")
-                all_validations.append(validation_df)
-
-            if all_validations:
-                combined_validation = pd.concat(all_validations, ignore_index=True)
-                combined_validation = combined_validation.astype(str)
-                total_checks = combined_validation.shape[0]
-                total_matches = (combined_validation["Validation"] == "✅").sum()
-                total_mismatches = (combined_validation["Validation"] == "❌").sum()
-                st.success(f"Total Fields Checked: {total_checks}")
-                st.info(f"✅ Matches: {total_matches}")
-                st.error(f"❌ Mismatches: {total_mismatches}")
-
-                def highlight_discrepancies(val):
-                    if isinstance(val, str) and val.startswith("❌"):
-                        return "color: red; font-weight: bold;"
-                    if isinstance(val, str) and val.startswith("✅"):
-                        return "color: green; font-weight: bold;"
-                    return ""
-
-                styled_combined = combined_validation.style.applymap(
-                    highlight_discrepancies,
-                    subset=["SC Value", "Expected Value"]
+                st.download_button(
+                    "⬇️ Download COA Validation Report as CSV",
+                    final_coa_table.to_csv(index=False),
+                    file_name="coa_validation_report.csv",
+                    mime="text/csv"
                 )
 
+    # Upload Sterilization Certificates
+    if "packaging_list" in st.session_state:
+        st.subheader("🧼 Upload Sterilization Certificates (PDFs)")
+        sc_files = st.file_uploader("Upload SC PDFs", type=["pdf"], accept_multiple_files=True, key="multi_sc")
+        if sc_files and not background:
+            sc_state = st.session_state.setdefault("sc_validation", ValidationState("sc", get_product_master()))
+            sc_progress = st.progress(0.0, text="Parsing SCs...")
+            # Validate SCs only against Packing List
+            sc_state.sync(
+                sc_files,
+                st.session_state["packaging_list"],
+                progress=lambda done, total, result: sc_progress.progress(done / total, text=f"Parsed {done}/{total} SCs"),
+            )
+            sc_progress.empty()
+            for error in sc_state.errors():
+                st.error(f"❌ {error}")
+
+            combined_validation = sc_state.table()
+            if combined_validation is not None:
+                st.markdown("## 📋 SC Validation Results")
+                counts = sc_state.counts()
+                st.success(f"Total Fields Checked: {counts['checks']}")
+                st.info(f"✅ Matches: {counts['matches']}")
+                st.error(f"❌ Mismatches: {counts['mismatches']}")
+
                 # Show only detailed table
                 with st.expander("🔍 View Detailed Validation Table", expanded=True):
-                    st.dataframe(styled_combined, use_container_width=True)
+                    render_results(sc_state.view(), "sc_results")
 
                 # Download CSV
                 csv = combined_validation.to_csv(index=False).encode('utf-8')
@@ -154,93 +151,183 @@ if "packaging_list" in st.session_state:
                     file_name="sc_validation_report.csv",
                     mime="text/csv"
                 )
-                
-def send_email_report(to_email, concise_df, sender_email, sender_password, smtp_server="smtp.gmail.com", smtp_port=587):
-    msg = EmailMessage()
-    msg["Subject"] = "Validation Report"
-    msg["From"] = sender_email
-    msg["To"] = to_email
-    msg.set_content("Please find attached the concise mismatch report from Marflow QC Validator.")
-    csv_buffer = StringIO()
-    concise_df.to_csv(csv_buffer, index=False)
-    csv_bytes = csv_buffer.getvalue().encode('utf-8')
-    msg.add_attachment(csv_bytes, maintype="application", subtype="csv", filename="mismatch_report.csv")
-
-    with smtplib.SMTP(smtp_server, smtp_port) as smtp:
-        smtp.starttls()
-        smtp.login(sender_email, sender_password)
-        smtp.send_message(msg)
-     
-# 📌 Build a concise mismatch-only table from both COA and SC
-# 📌 Build final merged table in client-desired format
-if "packaging_list" in st.session_state:
-    if 'final_coa_table' in locals() and 'combined_validation' in locals():
-        ref_lookup = st.session_state["packaging_list"].set_index("Batch No")["Ref Code"].to_dict()
-        coa_data = final_coa_table[final_coa_table["Match"] == "❌"].copy()
-        coa_data["Ref code"] = coa_data["Batch No"].map(ref_lookup).fillna("Not mention")
-        coa_data["COA"] = coa_data["Field"] + ": " + coa_data["COA Value"].astype(str)
-        coa_data["Packing list"] = coa_data["Field"] + ": " + coa_data["Expected Value"].astype(str)
-        coa_data["EtO Sterilization certificate"] = "--"
-        coa_data = coa_data[["Ref code", "Batch No", "EtO Sterilization certificate", "COA", "Packing list"]]
-        sc_data = combined_validation[combined_validation["Validation"] == "❌"].copy()
-        sc_data["Ref code"] = sc_data["Batch No"].map(ref_lookup).fillna("Not mention")
-        sc_data["EtO Sterilization certificate"] = sc_data.apply(lambda row: f"{row['Field']}: {row['SC Value'].replace('❌','').replace('✅','').strip()}", axis=1)
-        sc_data["Packing list"] = sc_data.apply(lambda row: f"{row['Field']}: {row['Expected Value'].replace('❌','').replace('✅','').strip()}", axis=1)
-        sc_data["COA"] = "--"
-        sc_data = sc_data[["Ref code", "Batch No", "EtO Sterilization certificate", "COA", "Packing list"]]
-        final_client_format = pd.concat([coa_data, sc_data], ignore_index=True)
-        st.markdown("## 📋 Final Table")
-        st.dataframe(final_client_format, use_container_width=True)
-        st.download_button(
-            label="⬇️ Download Report as CSV",
-            data=final_client_format.to_csv(index=False),
-            file_name="final_client_report.csv",
-            mime="text/csv")
-
-
-        from io import BytesIO
-        from openpyxl.styles import Font, Alignment
-        from openpyxl.utils.dataframe import dataframe_to_rows
-        from openpyxl import Workbook
-
-        # Create workbook and sheet
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Report"
-
-        # Add DataFrame rows to worksheet
-        for r_idx, row in enumerate(dataframe_to_rows(final_client_format, index=False, header=True), 1):
-            ws.append(row)
-            for c_idx, cell in enumerate(ws[r_idx], 1):
-                cell.alignment = Alignment(wrap_text=True, vertical="top")
-                if r_idx == 1:
-                    cell.font = Font(bold=True)
-
-        # Optional: Auto-adjust column widths
-        for column_cells in ws.columns:
-            length = max(len(str(cell.value)) if cell.value else 0 for cell in column_cells)
-            ws.column_dimensions[column_cells[0].column_letter].width = length + 3
-
-        # Save to in-memory buffer
-        excel_buffer = BytesIO()
-        wb.save(excel_buffer)
-        excel_buffer.seek(0)
-
-        # Streamlit download button
-        st.download_button(
-            label="⬇️ Download Final Report as Excel",
-            data=excel_buffer.getvalue(),
-            file_name="final_client_report.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+
+    def render_job(job_id, polling=False):
+        store = get_runner().store
+        job = store.get(job_id)
+        if job is None:
+            st.warning(f"⚠️ Job `{job_id}` not found")
+            return
+        if polling and job["status"] in FINISHED:
+            st.rerun()
+
+        st.markdown(f"## 🕒 Background Job `{job_id}`")
+        for stage in STAGES:
+            progress = job["progress"][stage]
+            fraction = progress["done"] / progress["total"] if progress["total"] else float(job["status"] == "done")
+            st.progress(fraction, text=f"{STAGE_LABELS[stage]}: {progress['done']}/{progress['total']}")
+        if job["status"] == "failed":
+            st.error(f"❌ Job failed: {job['error']}")
+
+        # Tables are stored as each stage finishes, so show whatever is ready.
+        results = store.results(job_id)
+        for error in results.get("errors", []):
+            st.error(f"❌ {error}")
+        # A stored table never changes, so its view is built once per job.
+        if results.get("coa_table") is not None:
+            with st.expander("🔍 COA Validation Table", expanded=False):
+                view = cached_view(st.session_state, f"job_{job_id}_coa_view", (), lambda: results["coa_table"],
+                                   result_column="Match", style_columns=["Match"])
+                render_results(view, f"job_{job_id}_coa")
+        if results.get("sc_table") is not None:
+            with st.expander("🔍 SC Validation Table", expanded=False):
+                view = cached_view(st.session_state, f"job_{job_id}_sc_view", (), lambda: results["sc_table"],
+                                   result_column="Validation", style_columns=["SC Value", "Expected Value"])
+                render_results(view, f"job_{job_id}_sc")
+        if "client_report" in results:
+            st.error(f"❌ Mismatches: {results['mismatches']}")
+            view = cached_view(st.session_state, f"job_{job_id}_client_view", (), lambda: results["client_report"])
+            render_results(view, f"job_{job_id}_client")
+            st.download_button(
+                label="⬇️ Download Report as CSV",
+                data=results["client_report"].to_csv(index=False),
+                file_name=f"final_client_report_{job_id}.csv",
+                mime="text/csv",
+                key="job_report_csv")
+
+
+    def show_job(job_id):
+        """Renders a job, polling every few seconds until it has finished."""
+        job = get_runner().store.get(job_id)
+        if job is not None and job["status"] not in FINISHED:
+            st.fragment(run_every="2s")(render_job)(job_id, polling=True)
+        else:
+            render_job(job_id)
+
+
+    if background:
+        if uploaded_file and (coa_files or sc_files) and st.button("🚀 Start background validation"):
+            st.query_params["job"] = get_runner().submit(uploaded_file, coa_files or [], sc_files or [])
+
+    # The job ID lives in the URL so a refreshed page picks the job back up.
+    if st.query_params.get("job"):
+        show_job(st.query_params["job"])
+
+    def send_email_report(to_email, concise_df):
+        """
+        Queues the report in the outbox and returns its message ID. A background
+        sender delivers it over a reused SMTP connection (MARFLOW_SMTP_*), retrying
+        with backoff, so the page never waits on the mail server.
+        """
+        return send_report(to_email, concise_df)
+
+    # 📌 Build a concise mismatch-only table from both COA and SC
+    # 📌 Build final merged table in client-desired format
+    if "packaging_list" in st.session_state:
+        if final_coa_table is not None and combined_validation is not None:
+            coa_state, sc_state = st.session_state["coa_validation"], st.session_state["sc_validation"]
+            final_view = cached_view(
+                st.session_state, "final_view", (coa_state.client_rows(), sc_state.client_rows()),
+                lambda: client_report(coa_state, sc_state),
+            )
+            final_client_format = final_view.df
+
+            st.markdown("## 📋 Final Table")
+            render_results(final_view, "final_results")
+            st.download_button(
+                label="⬇️ Download Report as CSV",
+                data=final_client_format.to_csv(index=False),
+                file_name="final_client_report.csv",
+                mime="text/csv")
+
+
+            # The workbook is only rendered when asked for, and reused until the tables change.
+            report_key = report_signature(final_client_format, final_coa_table, combined_validation)
+            if st.button("📊 Prepare Excel Report"):
+                st.session_state["report_xlsx"] = (report_key, report_excel_bytes(final_client_format, final_coa_table, combined_validation))
+            prepared = st.session_state.get("report_xlsx")
+            if prepared and prepared[0] == report_key:
+                st.download_button(
+                    label="⬇️ Download Final Report as Excel",
+                    data=prepared[1],
+                    file_name="final_client_report.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                )
+
+            # Saved only when asked for, so the partial results of a shipment still being
+            # uploaded never reach the history; the same results are saved once.
+            history_key = repr(report_signature(final_coa_table, combined_validation))
+            history = get_history_store()
+            if history.has_shipment(history_key):
+                st.caption("📚 These results are saved in the validation history.")
+            elif st.button("💾 Save to History", help="Save this shipment's results once all its COAs and SCs are uploaded"):
+                shipment_id = history.record_shipment(
+                    st.session_state["packaging_list"],
+                    final_coa_table,
+                    combined_validation,
+                    certificates=[*coa_state.certificates(), *sc_state.certificates()],
+                    packing_list_name=uploaded_file.name if uploaded_file else None,
+                    signature=history_key,
+                )
+                st.success(f"✅ Saved to history as shipment {shipment_id}")
+
+            with st.expander("📧 Email Report"):
+                if not sender_configured():
+                    st.info("Set MARFLOW_SMTP_HOST (and _USER, _PASSWORD) to send reports; queued emails wait until then.")
+                email_to = st.text_input("Send to", key="email_to", help="One or more addresses, separated by commas")
+                if st.button("📨 Queue Email") and email_to:
+                    st.session_state["email_id"] = send_email_report(email_to, final_client_format)
+                if st.session_state.get("email_id"):
+                    message = get_outbox().get(st.session_state["email_id"])
+                    if message is not None:
+                        sender = get_sender()
+                        st.caption(describe(message, sender.status() if sender is not None else None))
+
+
+
+    # 📚 Validation history across all saved shipments
+    if st.session_state.get("authenticated"):
+        with st.expander("📚 Validation History"):
+            history = get_history_store()
+            batch_column, ref_column, field_column = st.columns(3)
+            history_batch = batch_column.text_input("Batch No", key="history_batch")
+            history_ref = ref_column.text_input("Ref code", key="history_ref")
+            history_field = field_column.selectbox("Field", ["All", *history.fields()], key="history_field")
+            history_dates = st.date_input("Validated between", value=(), key="history_dates")
+            history_failed = st.checkbox("Only mismatches", key="history_failed")
+
+            if history_batch:
+                summary = history.batch_summary(history_batch)
+                st.info(f"Batch {history_batch}: ❌ {summary['failures']} failed checks of {summary['checks']} across {summary['shipments']} shipments")
+            history_dates = list(history_dates) if isinstance(history_dates, (list, tuple)) else [history_dates]
+            st.dataframe(
+                history.query(
+                    batch_no=history_batch,
+                    ref_code=history_ref,
+                    field=None if history_field == "All" else history_field,
+                    date_from=history_dates[0].isoformat() if history_dates else None,
+                    date_to=history_dates[-1].isoformat() if history_dates else None,
+                    failed_only=history_failed,
+                ),
+                use_container_width=True,
+            )
+finally:
+    if profiler is not None:
+        profile_report = timing.stop_profile(profiler)
 
 
+if collect_timings or profile_report is not None:
+    with st.expander("⏱️ Timing Summary", expanded=True):
+        if collect_timings:
+            st.dataframe(timing.summary().round(1), use_container_width=True, hide_index=True)
+        if profile_report is not None:
+            st.code(profile_report, language="text")
 
         
         
 # # ✅ Show only if the concise table exists
 # if "packaging_list" in st.session_state:
-#     if 'final_coa_table' in locals() and 'combined_validation' in locals():
+#     if final_coa_table is not None and combined_validation is not None:
 #         # [same code for building concise_mismatches table here]
 
 #         if not concise_mismatches.empty:
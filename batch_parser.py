@@ -0,0 +1,215 @@
+import logging
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import ocr
+from coa_parser import parse_certificate_of_analysis
+from parse_cache import (
+    as_named_stream,
+    content_hash,
+    file_name,
+    get_default_cache,
+    is_cacheable,
+    read_file_bytes,
+)
+from sterilization_cert import parse_sterilization_certificate
+import timing
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def default_worker_count():
+    """Worker count from MARFLOW_PARSE_WORKERS, else one per CPU."""
+    configured = os.environ.get("MARFLOW_PARSE_WORKERS")
+    if configured:
+        try:
+            return max(1, int(configured))
+        except ValueError:
+            logger.warning("⚠️ Ignoring invalid MARFLOW_PARSE_WORKERS=%r", configured)
+    return os.cpu_count() or 1
+
+
+def _get_pool():
+    # The pool is shared across reruns, sessions, jobs and the folder watcher, so it
+    # is sized once from the configured worker count; callers cap their own share.
+    # Spawning keeps worker start-up safe inside the threaded Streamlit server.
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=default_worker_count(), mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _discard_pool(pool=None):
+    """Drops the shared pool, or with `pool` only if it is still the current one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None and (pool is None or _pool is pool):
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def shutdown_pool():
+    """Stops the shared worker pools (headless callers should call this on exit)."""
+    _discard_pool()
+    ocr.shutdown_pool()
+
+
+def _submit(get_pool, discard_pool, *args):
+    """
+    Submits `_parse_in_worker(*args)` to the pool from `get_pool`. A pool broken
+    by a worker crash (or stopped by `shutdown_pool`) refuses new work, so it is
+    replaced once, by whichever caller finds it first.
+    """
+    pool = get_pool()
+    try:
+        return pool.submit(_parse_in_worker, *args)
+    except (BrokenProcessPool, RuntimeError):
+        discard_pool(pool)
+        return get_pool().submit(_parse_in_worker, *args)
+
+
+def _parse_bytes(parse_fn, name, data):
+    with timing.span(f"parse.{parse_fn.__name__}", file=name):
+        return parse_fn(as_named_stream(data, name))
+
+
+def _parse_in_worker(parse_fn, name, data, collect_timing):
+    """Process-pool entry point; also returns the worker's timings when they are being collected."""
+    timing.enable(collect_timing)
+    value = _parse_bytes(parse_fn, name, data)
+    return value, timing.drain() if collect_timing else None
+
+
+def _result(name, data, error=None):
+    # An SC with no readable pages parses to [], which is as much a failure as None.
+    if not data and error is None:
+        error = f"Could not extract data from `{name}`"
+    return {"name": name, "data": data, "error": error}
+
+
+def parse_batch(files, parse_fn, max_workers=None, progress=None, cache=None, use_cache=True):
+    """
+    Parses every file with `parse_fn` across a process pool.
+
+    Returns one dict per input file, in input order, with the file "name", the
+    parsed "data" (None on failure) and an "error" message (None on success).
+    `progress(done, total, result)` is called in the caller's thread as each file
+    finishes. Files already in the parse cache are not sent to the pool, and at
+    most `max_workers` of the batch run on the shared pool at a time. With OCR
+    on, scanned files go to the separate OCR pool, so they run alongside the
+    text-native ones instead of ahead of them.
+    """
+    files = list(files)
+    total = len(files)
+    results = [None] * total
+    if cache is None and use_cache:
+        cache = get_default_cache()
+
+    done = 0
+    pending = []
+    for i, uploaded_file in enumerate(files):
+        name = file_name(uploaded_file)
+        try:
+            data = read_file_bytes(uploaded_file)
+        except OSError as e:
+            results[i] = _result(name, None, f"Could not read `{name}`: {e}")
+        else:
+            key = cache.make_key(parse_fn, content_hash(data)) if cache else None
+            found, value = cache.get(key) if cache else (False, None)
+            if found:
+                results[i] = _result(name, value)
+            else:
+                pending.append((i, name, data, key))
+                continue
+        done += 1
+        if progress:
+            progress(done, total, results[i])
+
+    scanned = []
+    if ocr.enabled():
+        flags = [ocr.is_scanned(data) for _, _, data, _ in pending]
+        scanned = [item for item, flag in zip(pending, flags) if flag]
+        pending = [item for item, flag in zip(pending, flags) if not flag]
+    workers = min(max_workers or default_worker_count(), len(pending))
+
+    def finish(i, name, key, value, error=None):
+        nonlocal done
+        if error is None and cache and is_cacheable(value):
+            cache.put(key, value)
+        results[i] = _result(name, value, error)
+        done += 1
+        if progress:
+            progress(done, total, results[i])
+
+    collect_timing = timing.is_enabled()
+    futures = {}
+    for i, name, data, key in scanned:
+        futures[_submit(ocr.get_pool, ocr.shutdown_pool, parse_fn, name, data, collect_timing)] = (i, name, key, False)
+
+    queue = deque()
+    if workers <= 1:
+        for i, name, data, key in pending:
+            finish(i, name, key, _parse_bytes(parse_fn, name, data))
+    else:
+        queue.extend(pending)
+
+    # At most `workers` of this batch are on the shared pool at once, so other
+    # sessions, jobs and the watcher keep their turn.
+    running = 0
+    while queue or futures:
+        while queue and running < workers:
+            i, name, data, key = queue.popleft()
+            try:
+                future = _submit(_get_pool, _discard_pool, parse_fn, name, data, collect_timing)
+            except Exception as e:
+                finish(i, name, key, None, f"Parsing `{name}` failed: {e}")
+                continue
+            futures[future] = (i, name, key, True)
+            running += 1
+        if not futures:
+            continue
+        finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+        for future in finished:
+            i, name, key, on_parser_pool = futures.pop(future)
+            running -= on_parser_pool
+            try:
+                value, worker_timings = future.result()
+            except BrokenProcessPool as e:
+                finish(i, name, key, None, f"Parser worker crashed on `{name}`: {e}")
+            except Exception as e:
+                finish(i, name, key, None, f"Parsing `{name}` failed: {e}")
+            else:
+                if worker_timings:
+                    timing.merge(worker_timings)
+                finish(i, name, key, value)
+    return results
+
+
+def submit_parse(parse_fn, name, data):
+    """
+    Queues one file on the shared worker pool (the OCR pool if it is scanned and
+    OCR is on) for callers that keep their own queue and limit (the folder
+    watcher). The future's result is (parsed value, worker timings or None); after
+    a BrokenProcessPool error the next submit starts a new pool.
+    """
+    if ocr.enabled() and ocr.is_scanned(data):
+        return _submit(ocr.get_pool, ocr.shutdown_pool, parse_fn, name, data, timing.is_enabled())
+    return _submit(_get_pool, _discard_pool, parse_fn, name, data, timing.is_enabled())
+
+
+def parse_coa_batch(files, **kwargs):
+    """Runs `parse_certificate_of_analysis` over a batch of COA PDFs."""
+    return parse_batch(files, parse_certificate_of_analysis, **kwargs)
+
+
+def parse_sc_batch(files, **kwargs):
+    """Runs `parse_sterilization_certificate` over a batch of SC PDFs."""
+    return parse_batch(files, parse_sterilization_certificate, **kwargs)
@@ -0,0 +1,131 @@
+"""
+Micro-benchmark for the field-extraction rules.
+
+    python -m benchmarks.bench_extraction [--docs 2000] [--annex-lines 200]
+
+Times per-document extraction with the compiled rule sets in extraction_rules.py
+against the previous per-field `re.search` loops, and checks that both return the
+same values for every generated document.
+"""
+import argparse
+import random
+import re
+import time
+
+from extraction_rules import COA_RULES, SC_RULES
+
+LEGACY_COA_PATTERNS = {
+    "Product Name": r"Product Name\s+(.*?)\s+Certificate No",
+    "Batch No": r"Batch No\.\s+(.*?)\s+(?:Product Type|Product Size|Certificate No)",
+    "Product Size": r"Product Size\s+([A-Z0-9 ,.+\-xXcmCM]+)",
+    "Mfg. Date": r"Mfg\. Date\s+(.*?)\s+Product Size",
+    "Exp. Date": r"Exp\. Date\s+(.*?)\s+Actual Batch Size",
+    "Shipping Qty": r"Shipping Qty\.\s+(\d+)",
+    "Quantity Released": r"Quantity Released\s+(\d+)"
+}
+
+LEGACY_SC_PATTERNS = {
+    "Batch No": r"Batch No[:\s]*([A-Z0-9/]+)",
+    "Mfg. Date": r"Mfg\. Date[:\s]*([A-Z]{3}\s*[-–]?\s*\d{4})",
+    "Exp. Date": r"Exp\. Date[:\s]*([A-Z]{3}\s*[-–]?\s*\d{4})",
+    "Product Description": r"Product Description[:\s]*(.+?)(?:\n|$)"
+}
+
+
+def legacy_coa(full_text):
+    coa_data = {}
+    for line in full_text.splitlines():
+        if "product type" in line.lower():
+            match = re.search(r"Product Type\s*[:\-]?\s*(.*)", line, re.IGNORECASE)
+            if match:
+                val = match.group(1).strip()
+                if val and not re.search(r"^(PRODUCT SIZE|CERTIFICATE|BATCH|DATE|QTY)", val, re.IGNORECASE):
+                    val = val.upper().replace("X", "x").replace("CH ", "CH").replace("CM", "cm")
+                    coa_data["Product Type"] = re.sub(r"\s+", " ", val)
+                    break
+    for key, pattern in LEGACY_COA_PATTERNS.items():
+        match = re.search(pattern, full_text, re.IGNORECASE)
+        if match:
+            value = match.group(1).strip()
+            value = value.upper().replace("X", "x").replace("CH ", "CH").replace("CM", "cm")
+            coa_data[key] = re.sub(r"\s+", " ", value)
+    return coa_data
+
+
+def legacy_sc(page_text):
+    steri_data = {}
+    for key, pattern in LEGACY_SC_PATTERNS.items():
+        match = re.search(pattern, page_text, re.IGNORECASE | re.MULTILINE)
+        if match:
+            steri_data[key] = match.group(1).strip().upper()
+    return steri_data
+
+
+def make_coa_text(rng, annex_lines):
+    size = rng.choice(["CH 16 x 40 cm", "CH12-14", "18G x 45 mm", "CH 8"])
+    lines = [
+        "CERTIFICATE OF ANALYSIS",
+        f"Product Name {rng.choice(['FOLEY CATHETER', 'Nelaton Catheter', 'URINE BAG'])} Certificate No QC/{rng.randint(1, 999)}",
+        f"Batch No. MF{rng.randint(1000, 9999)}/25 " + rng.choice(["Product Type 2 WAY", "Product Size " + size, "Certificate No X1"]),
+        f"Product Type {rng.choice(['2 way', '3 WAY', 'Product Size', 'paediatric'])}",
+        f"Mfg. Date {rng.choice(['FEB 2025', 'Feb-2025', '2025-02'])} Product Size {size}",
+        f"Exp. Date {rng.choice(['JAN 2030', 'Jan-2030'])} Actual Batch Size {rng.randint(1, 9) * 1000}",
+        f"Shipping Qty. {rng.randint(1, 900)} Quantity Released {rng.randint(1, 900)}",
+    ]
+    if rng.random() < 0.2:
+        lines.pop(rng.randrange(1, len(lines)))
+    lines += [f"Test {i} {rng.choice(['PASS', 'COMPLIES'])} {rng.random():.3f}" for i in range(annex_lines)]
+    return "\n".join(lines)
+
+
+def make_sc_text(rng):
+    lines = [
+        "CERTIFICATE OF STERILIZATION",
+        f"Batch No: MF{rng.randint(1000, 9999)}/25",
+        f"Mfg. Date: {rng.choice(['FEB 2025', 'FEB-2025', 'FEB – 2025'])}",
+        f"Exp. Date: {rng.choice(['JAN 2030', 'JAN-2030'])}",
+        f"Product Description: {rng.choice(['Foley Catheter 2 way', 'URINE BAG 2000 ML'])}",
+        "Sr Type Size Quantity",
+        f"1 2 WAY CH {rng.randint(6, 26)} {rng.randint(1, 900)}",
+    ]
+    if rng.random() < 0.2:
+        lines.pop(rng.randrange(1, 5))
+    return "\n".join(lines)
+
+
+def time_per_doc(fn, docs):
+    start = time.perf_counter()
+    for doc in docs:
+        fn(doc)
+    return (time.perf_counter() - start) / len(docs)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--docs", type=int, default=2000)
+    ap.add_argument("--annex-lines", type=int, default=200, help="Test-result lines appended to each COA")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    coa_docs = [make_coa_text(rng, args.annex_lines) for _ in range(args.docs)]
+    sc_docs = [make_sc_text(rng) for _ in range(args.docs)]
+
+    mismatches = sum(legacy_coa(doc) != COA_RULES.extract(doc) for doc in coa_docs)
+    mismatches += sum(legacy_sc(doc) != SC_RULES.extract(doc) for doc in sc_docs)
+
+    print(f"{'document':<6} {'legacy µs/doc':>14} {'rules µs/doc':>14} {'speed-up':>9}")
+    for label, legacy, rules, docs in [
+        ("COA", legacy_coa, COA_RULES.extract, coa_docs),
+        ("SC", legacy_sc, SC_RULES.extract, sc_docs),
+    ]:
+        before = time_per_doc(legacy, docs)
+        after = time_per_doc(rules, docs)
+        print(f"{label:<8} {before * 1e6:>14.1f} {after * 1e6:>14.1f} {before / after:>8.1f}x")
+
+    print(f"value mismatches: {mismatches}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,73 @@
+"""
+Regression check and benchmark for the description matching in product_matching.py.
+
+    python -m benchmarks.bench_matching [--rows 10000]
+
+Checks the expected outcome for description pairs seen on certificates (word
+order, hyphenation, abbreviations, run-together words, differing numbers and
+qualifiers), then times scoring certificate values against their packing-list
+rows for a packing list of `--rows` descriptions. Exits non-zero if any pair is
+judged differently from CASES.
+"""
+import argparse
+import random
+import time
+
+from benchmarks.synthetic import PRODUCTS
+from product_matching import DescriptionIndex, description_score
+
+# (packing-list description, certificate value, expected match at the default threshold)
+CASES = [
+    ("J-TIP GUIDE WIRE", "GUIDE WIRE TIP J", True),
+    ("GUIDE WIRE TIP J", "J TIP GUIDE WIRE", True),
+    ("FOLEY CATHETER 2 WAY", "Foley Cath 2-Way", True),
+    ("FOLEY CATHETER 2 WAY", "FOLEY CATHETER 2WAY", True),
+    ("FOLEY CATHETER 2 WAY", "FOLEY CATHETER TWO WAY", True),
+    ("SILICONE FOLEY CATHETER PAEDIATRIC", "Silicone Foley Catheter Pediatric", True),
+    ("I.V. CANNULA", "IV CANNULA", True),
+    ("URINE BAG WITH T-VALVE", "URINE BAG T VALVE", True),
+    ("NELATON CATHETER", "nelaton catheter", True),
+    ("SUCTION CATHETER", "SUCTIONCATHETER", True),
+    ("FOLEY CATHETER 2 WAY", "FOLEYCATHETER 2WAY", True),
+    ("FOLEY CATHETER 2 WAY", "FOLEY CATHETER 3 WAY", False),
+    ("URINE BAG 2000 ML", "URINE BAG 1000 ML", False),
+    ("FOLEY CATHETER", "FOLEY BALLOON CATHETER 2 WAY", False),
+    ("SUCTION CATHETER", "FEEDING TUBE", False),
+    ("FEEDING TUBE", "FEEDING TUBE (INFANT)", False),
+    ("NELATON CATHETER", "", False),
+]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=10000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    failures = 0
+    for expected, actual, should_match in CASES:
+        score, matched = description_score(expected, actual)
+        if matched != should_match:
+            failures += 1
+            print(f"❌ {expected!r} vs {actual!r}: score {score:.2f}, matched {matched}, expected {should_match}")
+
+    rng = random.Random(args.seed)
+    words = ["STERILE", "SILICONE", "LATEX", "PAEDIATRIC", "ADULT", "FEMALE", "WITH T-VALVE", "SINGLE USE"]
+    descriptions = [f"{rng.choice(PRODUCTS)[0]} {rng.choice(words)} {rng.randint(1, 40)}" for _ in range(args.rows)]
+    certificates = [description.title() if rng.random() < 0.8 else rng.choice(descriptions) for description in descriptions]
+
+    start = time.perf_counter()
+    index = DescriptionIndex(descriptions)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    index.score_rows(range(args.rows), certificates)
+    scored = time.perf_counter() - start
+
+    print(f"index of {args.rows} descriptions built in {built * 1000:.1f} ms")
+    print(f"scored {args.rows} certificates in {scored * 1000:.1f} ms ({args.rows / scored:,.0f}/s)")
+    print(f"cases: {len(CASES)}, wrong: {failures}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
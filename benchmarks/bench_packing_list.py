@@ -0,0 +1,118 @@
+"""
+Benchmark and regression check for packing-list description/size normalization.
+
+    python -m benchmarks.bench_packing_list [--rows 50000]
+
+Runs the per-row `extract_normalized_size` + `re.sub` cleaning that
+parse_packaging_list used before, and the vectorized `normalize_sizes` /
+`strip_size_from_descriptions`, over a corpus of packing-list descriptions.
+Reports rows/second for both and exits non-zero if any Size or Description
+differs.
+"""
+import argparse
+import re
+import time
+
+import pandas as pd
+
+from packaging_list_parser import extract_normalized_size, normalize_sizes, strip_size_from_descriptions
+
+# Descriptions in the shapes seen on supplier packing lists (sizes in CH, cm and
+# gauge, ranges, decimals, line breaks, stray punctuation) plus edge cases.
+DESCRIPTION_CORPUS = [
+    "FOLEY BALLOON CATHETER 2 WAY CH 16 40 CM",
+    "Foley Balloon Catheter 2-Way, CH14, 40cm",
+    "FOLEY CATHETER 3 WAY CH 22 30CC BALLOON",
+    "SILICONE FOLEY CATHETER 2 WAY PAEDIATRIC CH 8",
+    "NELATON CATHETER CH 8-10, 40CM",
+    "Nelaton Catheter Female CH 12 TO 14 20 cm",
+    "SUCTION CATHETER WITH THUMB CONTROL CH 12/14",
+    "SUCTION CATHETER CH10 – CH12 50 CM",
+    "FEEDING TUBE CH 8.5 40 CM",
+    "INFANT FEEDING TUBE CH5 + CH6",
+    "RYLES TUBE CH 16\n105 CM",
+    "Ryles Tube CH 14\r\n 105cm",
+    "IV CANNULA 18G WITH INJECTION PORT",
+    "I.V. Cannula 20 G x 32 mm",
+    "IV CANNULA 22G 0.9 X 25MM",
+    "HYPODERMIC NEEDLE 23G X 1\"",
+    "SPINAL NEEDLE 25 G QUINCKE 90MM",
+    "J-TIP GUIDE WIRE 0.035\" 150 CM",
+    "GUIDE WIRE TIP J 0.038 260CM",
+    "URINE BAG 2000 ML WITH T-VALVE",
+    "URINE COLLECTION BAG 2000ML (PAEDIATRIC 100 ML)",
+    "EXTENSION TUBE 150 CM",
+    "THREE WAY STOPCOCK",
+    "ENDOTRACHEAL TUBE CUFFED 7.5 MM",
+    "Chest Drainage Catheter Ch 28, 45 cm",
+    "THORACIC CATHETER CH 24 STRAIGHT",
+    "CH-16 FOLEY",
+    "Ch 7.5 To 8.5 Ureteral Stent 26 Cm",
+    "MICRO DRIP SET 60 DROPS 150cm",
+    "Scalp Vein Set 21G, 30 cm tubing",
+    "BLOOD TRANSFUSION SET  G-200",
+    "RECTAL TUBE CH 24,40 CM",
+    "Levin Tube CH 18 - 125 CM",
+    "OXYGEN MASK ADULT",
+    "NASAL CANNULA (ADULT) 2.1 M",
+    "",
+    "   ",
+    "nan",
+    "CH",
+    "12G",
+    "10CM",
+]
+
+
+def legacy(descriptions):
+    sizes, cleaned = [], []
+    for full_desc in descriptions:
+        full_desc = str(full_desc).strip()
+        sizes.append(extract_normalized_size(full_desc))
+        cleaned_desc = re.sub(r"\bCH\s*\d+.*?(?=[,\s]|$)", "", full_desc, flags=re.IGNORECASE)
+        cleaned_desc = re.sub(r"\d+\s*CM", "", cleaned_desc, flags=re.IGNORECASE)
+        cleaned_desc = re.sub(r"\d+\s*G", "", cleaned_desc, flags=re.IGNORECASE)
+        cleaned_desc = re.sub(r"[-+]", "", cleaned_desc)
+        cleaned.append(re.sub(r"\s+", " ", cleaned_desc).strip(" ,"))
+    return sizes, cleaned
+
+
+def vectorized(descriptions):
+    full_desc = pd.Series(descriptions, dtype=object).map(str).astype(object).str.strip()
+    return normalize_sizes(full_desc).tolist(), strip_size_from_descriptions(full_desc).tolist()
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--rows", type=int, default=50000)
+    args = ap.parse_args(argv)
+
+    failures = 0
+    expected, actual = legacy(DESCRIPTION_CORPUS), vectorized(DESCRIPTION_CORPUS)
+    for i, desc in enumerate(DESCRIPTION_CORPUS):
+        for label, before, after in (("Size", expected[0][i], actual[0][i]), ("Description", expected[1][i], actual[1][i])):
+            if before != after:
+                failures += 1
+                print(f"❌ {label} differs for {desc!r}: {before!r} != {after!r}")
+
+    rows = (DESCRIPTION_CORPUS * (args.rows // len(DESCRIPTION_CORPUS) + 1))[:args.rows]
+    timings = {}
+    for label, fn in (("legacy", legacy), ("vectorized", vectorized)):
+        start = time.perf_counter()
+        result = fn(rows)
+        timings[label] = time.perf_counter() - start
+        if label == "legacy":
+            reference = result
+        elif result != reference:
+            failures += 1
+            print("❌ results differ on the scaled corpus")
+
+    for label, seconds in timings.items():
+        print(f"{label:<11} {args.rows / seconds:>12,.0f} rows/s")
+    print(f"speed-up    {timings['legacy'] / timings['vectorized']:>12.1f}x")
+    print(f"corpus: {len(DESCRIPTION_CORPUS)} descriptions, differences: {failures}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,107 @@
+"""
+Benchmark for the PDF text backends.
+
+    python -m benchmarks.bench_pdf_backends [--docs 40] [--annex-pages 3]
+
+Generates a corpus of COA and SC PDFs with PyMuPDF (words drawn as separate text
+objects in several fonts and sizes, with baseline jitter, ruled Size/Quantity
+tables and test-result annex pages) and reports pages/second of raw text
+extraction for each backend. That the backends parse the same fields is checked
+by tests/test_pdf_backends.py, on this corpus and the synthetic shipment.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import pymupdf
+
+from pdf_backends import TEXT_BACKENDS, PdfDocument
+
+from benchmarks.synthetic import FONTS, draw_annex, draw_line, draw_table
+
+
+def make_coa(rng, annex_pages):
+    size = rng.choice(["CH 16 x 40 cm", "CH12-14", "18G x 45 mm", "CH 8"])
+    lines = [
+        ["CERTIFICATE", "OF", "ANALYSIS"],
+        ["Product", "Name", rng.choice(["FOLEY CATHETER", "Nelaton Catheter", "URINE BAG"]), "Certificate", "No", f"QC/{rng.randint(1, 999)}"],
+        ["Batch", "No.", f"MF{rng.randint(1000, 9999)}/25", "Product", "Type", rng.choice(["2 WAY", "3 WAY", "paediatric"])],
+        ["Mfg.", "Date", rng.choice(["FEB 2025", "Feb-2025", "2025-02"]), "Product", "Size", size],
+        ["Exp.", "Date", rng.choice(["JAN 2030", "Jan-2030"]), "Actual", "Batch", "Size", str(rng.randint(1, 9) * 1000)],
+        ["Shipping", "Qty.", str(rng.randint(1, 900)), "Quantity", "Released", str(rng.randint(1, 900))],
+    ]
+    if rng.random() < 0.2:
+        lines.pop(rng.randrange(1, len(lines)))
+    doc = pymupdf.open()
+    page = doc.new_page()
+    fontname = rng.choice(FONTS)
+    for i, words in enumerate(lines):
+        draw_line(page, rng, 60 + 24 * i, words, fontname, rng.choice([9, 10, 11]))
+    for _ in range(annex_pages):
+        draw_annex(doc, rng, fontname)
+    return doc
+
+
+def make_sc(rng, pages):
+    doc = pymupdf.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        fontname = rng.choice(FONTS)
+        fontsize = rng.choice([10, 11])
+        lines = [
+            ["STERILIZATION", "CERTIFICATE"],
+            ["Batch", "No:", f"MF{rng.randint(1000, 9999)}/25"],
+            ["Mfg.", "Date:", rng.choice(["FEB 2025", "FEB-2025"])],
+            ["Exp.", "Date:", rng.choice(["JAN 2030", "JAN-2030"])],
+            ["Product", "Description:", rng.choice(["Foley Catheter 2 way", "URINE BAG 2000 ML"])],
+        ]
+        for i, words in enumerate(lines):
+            draw_line(page, rng, 50 + 20 * i, words, fontname, fontsize)
+        if rng.random() < 0.8:
+            rows = [["Sr", "Type", "Size", "Quantity"], ["1", rng.choice(["2 WAY", "3 WAY"]), f"CH {rng.randint(6, 26)}", str(rng.randint(1, 900))]]
+            draw_table(page, 180, rows, fontname, fontsize)
+        else:
+            draw_line(page, rng, 200, ["Annex:", "cycle", "records"], fontname, fontsize)
+    return doc
+
+
+def write_corpus(directory, rng, docs, annex_pages):
+    coa_paths, sc_paths = [], []
+    for i in range(docs):
+        coa_paths.append(os.path.join(directory, f"coa{i}.pdf"))
+        make_coa(rng, annex_pages).save(coa_paths[-1])
+        sc_paths.append(os.path.join(directory, f"sc{i}.pdf"))
+        make_sc(rng, rng.randint(1, 4)).save(sc_paths[-1])
+    return coa_paths, sc_paths
+
+
+def pages_per_second(paths, backend):
+    pages = 0
+    start = time.perf_counter()
+    for path in paths:
+        with PdfDocument(path, text_backend=backend) as pdf:
+            for _ in pdf.page_texts():
+                pages += 1
+    return pages / (time.perf_counter() - start)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--docs", type=int, default=40, help="COA and SC files generated of each kind")
+    ap.add_argument("--annex-pages", type=int, default=3, help="Test-result pages appended to each COA")
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        coa_paths, sc_paths = write_corpus(directory, rng, args.docs, args.annex_pages)
+        print(f"{'backend':<12} {'pages/s':>10}")
+        for backend in TEXT_BACKENDS:
+            print(f"{backend:<12} {pages_per_second(coa_paths + sc_paths, backend):>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,241 @@
+"""
+Throughput and peak-memory benchmark of the whole parse → validate → report pipeline.
+
+    python -m benchmarks.bench_pipeline [--size small|medium|large] [--repeat 3] [--save-baseline]
+    python -m benchmarks.bench_pipeline --items 10000 --coas 50 --coa-pages 500 --baseline my.json
+
+Generates a shipment with benchmarks.synthetic, then runs each stage (packing-list
+parse, COA and SC parsing, batch validation, client report, Excel export and
+history write) `--repeat` times, keeping the best time per call, and once more under
+tracemalloc for the stage's peak Python heap (MuPDF's own allocations are not
+included). Parsing runs in this process, without the parse cache.
+
+Results are compared with the saved baseline for the size (benchmarks/baselines/)
+and the run exits non-zero if a stage's throughput dropped or its peak memory grew
+by more than `--tolerance`, if a certificate parses differently from what was
+generated, or if validation does not find exactly the mismatches put in.
+`--save-baseline` records the current run instead. Baselines are machine-specific
+and not committed (benchmarks/baselines/ is git-ignored): run once with
+`--save-baseline` on the machine that compares against it, then without. With no
+baseline the results are only printed.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from batch_parser import parse_coa_batch, parse_sc_batch
+from history_store import HistoryStore
+from packaging_list_parser import parse_packaging_list
+from report_export import report_excel_bytes
+from shipment import build_client_report, build_coa_table, build_sc_table, count_mismatches
+
+from benchmarks.synthetic import make_shipment
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+SIZES = {
+    "small": {"items": 100, "coas": 20, "coa_pages": 3, "scs": 2, "sc_pages": 10},
+    "medium": {"items": 2000, "coas": 200, "coa_pages": 5, "scs": 10, "sc_pages": 50},
+    "large": {"items": 10000, "coas": 1000, "coa_pages": 20, "scs": 4, "sc_pages": 500},
+}
+DEFAULT_TOLERANCE = 0.3
+MIN_STAGE_SECONDS = 0.2
+
+
+def stage_packing_list(ctx):
+    with open(ctx["shipment"].packing_list, "rb") as fh:
+        df, ctx["packing_list"] = parse_packaging_list(fh)
+    return len(df), "rows"
+
+
+def stage_parse_coa(ctx):
+    ctx["parsed_coas"] = parse_coa_batch(ctx["shipment"].coa_paths, max_workers=1, use_cache=False)
+    return len(ctx["parsed_coas"]), "files"
+
+
+def stage_parse_sc(ctx):
+    ctx["parsed_scs"] = parse_sc_batch(ctx["shipment"].sc_paths, max_workers=1, use_cache=False)
+    return ctx["shipment"].sc_page_count, "pages"
+
+
+def stage_validate_coa(ctx):
+    ctx["coa_table"] = build_coa_table(ctx["parsed_coas"], ctx["packing_list"])
+    return len(ctx["shipment"].coa_paths), "records"
+
+
+def stage_validate_sc(ctx):
+    ctx["sc_table"] = build_sc_table(ctx["parsed_scs"], ctx["packing_list"])
+    return ctx["shipment"].sc_page_count, "records"
+
+
+def stage_client_report(ctx):
+    ctx["client_report"] = build_client_report(ctx["coa_table"], ctx["sc_table"], ctx["packing_list"])
+    return len(ctx["coa_table"]) + len(ctx["sc_table"]), "checks"
+
+
+def stage_export(ctx):
+    report_excel_bytes(ctx["client_report"], ctx["coa_table"], ctx["sc_table"])
+    return len(ctx["coa_table"]) + len(ctx["sc_table"]), "rows"
+
+
+def stage_history(ctx):
+    ctx["history"].record_shipment(ctx["packing_list"], ctx["coa_table"], ctx["sc_table"])
+    return len(ctx["coa_table"]) + len(ctx["sc_table"]), "rows"
+
+
+STAGES = [
+    ("parse.packing_list", stage_packing_list),
+    ("parse.coa", stage_parse_coa),
+    ("parse.sc", stage_parse_sc),
+    ("validate.coa", stage_validate_coa),
+    ("validate.sc", stage_validate_sc),
+    ("report.client", stage_client_report),
+    ("export.xlsx", stage_export),
+    ("history.write", stage_history),
+]
+
+
+def run_stages(ctx, trace_memory=False):
+    """
+    Runs every stage in order; returns {stage: (seconds per call, count, unit, peak
+    bytes or None)}. When timing, quick stages are called again until they have run
+    for MIN_STAGE_SECONDS, so millisecond stages are not lost in timer noise.
+    """
+    results = {}
+    for name, stage in STAGES:
+        if trace_memory:
+            tracemalloc.start()
+        calls = 0
+        start = time.perf_counter()
+        while True:
+            count, unit = stage(ctx)
+            calls += 1
+            seconds = time.perf_counter() - start
+            if trace_memory or seconds >= MIN_STAGE_SECONDS:
+                break
+        peak = None
+        if trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        results[name] = (seconds / calls, count, unit, peak)
+    return results
+
+
+def check_results(ctx):
+    """Compares parsed fields and mismatch counts with what was generated; returns a list of problems."""
+    shipment = ctx["shipment"]
+    problems = []
+    for parsed in ctx["parsed_coas"] + ctx["parsed_scs"]:
+        expected = shipment.expected[parsed["name"]]
+        if parsed["data"] != expected:
+            problems.append(f"{parsed['name']} parsed as {parsed['data']!r}, expected {expected!r}")
+    found = count_mismatches(ctx["coa_table"], ctx["sc_table"])
+    if found != shipment.mismatches:
+        problems.append(f"validation found {found} mismatches, {shipment.mismatches} were generated")
+    return problems
+
+
+def measure(shipment, directory, repeat):
+    """Best-of-`repeat` time and traced peak memory per stage, plus the problems found by `check_results`."""
+    ctx = {"shipment": shipment, "history": HistoryStore(os.path.join(directory, "history.sqlite3"))}
+    best = {}
+    for _ in range(repeat):
+        for name, (seconds, count, unit, _) in run_stages(ctx).items():
+            if name not in best or seconds < best[name]["seconds"]:
+                best[name] = {"seconds": seconds, "count": count, "unit": unit}
+    for name, (_, _, _, peak) in run_stages(ctx, trace_memory=True).items():
+        best[name]["peak_mb"] = peak / 2**20
+    for result in best.values():
+        result["per_second"] = result["count"] / result["seconds"] if result["seconds"] else float("inf")
+    return best, check_results(ctx)
+
+
+def compare(results, baseline, tolerance):
+    """Returns the stages that regressed against `baseline` (throughput or peak memory beyond `tolerance`)."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline["stages"].get(name)
+        if before is None:
+            continue
+        if result["per_second"] < before["per_second"] * (1 - tolerance):
+            regressions.append(f"{name}: {result['per_second']:,.1f} {result['unit']}/s, baseline {before['per_second']:,.1f}")
+        if result["peak_mb"] > before["peak_mb"] * (1 + tolerance) and result["peak_mb"] - before["peak_mb"] > 1:
+            regressions.append(f"{name}: peak {result['peak_mb']:.1f} MB, baseline {before['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--size", choices=sorted(SIZES), default="small")
+    ap.add_argument("--items", type=int, help="Packing-list rows (10 to 10,000); overrides --size")
+    ap.add_argument("--coas", type=int, help="COA files; overrides --size")
+    ap.add_argument("--coa-pages", type=int, help="Pages per COA (1 to 500); overrides --size")
+    ap.add_argument("--scs", type=int, help="SC files; overrides --size")
+    ap.add_argument("--sc-pages", type=int, help="Certificate pages per SC (1 to 500); overrides --size")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--baseline", help="Baseline file (default: benchmarks/baselines/pipeline-SIZE.json without overrides)")
+    ap.add_argument("--save-baseline", action="store_true", help="Write this run to the baseline file instead of comparing")
+    ap.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = ap.parse_args(argv)
+
+    config = dict(SIZES[args.size])
+    overridden = False
+    for key in config:
+        if getattr(args, key) is not None:
+            config[key] = getattr(args, key)
+            overridden = True
+    baseline_path = args.baseline
+    if baseline_path is None and not overridden:
+        baseline_path = os.path.join(BASELINE_DIR, f"pipeline-{args.size}.json")
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        shipment = make_shipment(directory, seed=args.seed, **config)
+        print(f"generated {config['items']} items, {len(shipment.coa_paths)} COAs and {len(shipment.sc_paths)} SCs"
+              f" ({shipment.pages} pages) in {time.perf_counter() - start:.1f}s")
+        results, problems = measure(shipment, directory, max(1, args.repeat))
+
+    print(f"{'stage':<20} {'count':>8} {'unit':<8} {'ms':>10} {'per second':>12} {'peak MB':>9}")
+    for name, result in results.items():
+        print(f"{name:<20} {result['count']:>8} {result['unit']:<8} {result['seconds'] * 1000:>10.1f}"
+              f" {result['per_second']:>12,.1f} {result['peak_mb']:>9.1f}")
+
+    for problem in problems:
+        print(f"❌ {problem}")
+
+    regressions = []
+    if baseline_path and args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline_path)), exist_ok=True)
+        with open(baseline_path, "w") as fh:
+            json.dump({
+                "config": config,
+                "python": sys.version.split()[0],
+                "machine": platform.platform(),
+                "stages": {name: {key: result[key] for key in ("per_second", "unit", "peak_mb")} for name, result in results.items()},
+            }, fh, indent=2)
+            fh.write("\n")
+        print(f"baseline saved to {baseline_path}")
+    elif baseline_path and os.path.exists(baseline_path):
+        with open(baseline_path) as fh:
+            baseline = json.load(fh)
+        if baseline["config"] != config:
+            print(f"⚠️ {baseline_path} was recorded for {baseline['config']}; not comparing")
+        else:
+            regressions = compare(results, baseline, args.tolerance)
+            for regression in regressions:
+                print(f"❌ regression: {regression}")
+            print(f"compared with {baseline_path} (tolerance {args.tolerance:.0%}): {len(regressions)} regressions")
+    elif baseline_path:
+        print(f"no baseline at {baseline_path}; run with --save-baseline to record one")
+
+    print(f"parse / validation problems: {len(problems)}")
+    return 1 if problems or regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,296 @@
+"""
+Synthetic shipments for the benchmarks: a packing list with the real PACKING LIST
+sheet layout and COA / SC PDFs laid out the way coa_parser.py and
+sterilization_cert.py read them.
+
+    python -m benchmarks.synthetic OUT_DIR [--items 200] [--coas 20] [--coa-pages 3] [--scs 2] [--sc-pages 10]
+
+Every certificate describes a packing-list item, so a generated shipment
+validates cleanly except for the quantities deliberately changed on a
+`mismatch_rate` share of the certificates (one ❌ check each). `Shipment.expected`
+keeps what each certificate says, for checking the parsers.
+"""
+import argparse
+import os
+import random
+from datetime import datetime
+
+import pymupdf
+from openpyxl import Workbook
+
+from packaging_list_parser import PACKING_LIST_COLUMNS, PACKING_LIST_SHEET
+
+FONTS = ["helv", "tiro", "cour"]
+HEADER_ROW = 22
+
+# (description, size as written in the packing-list description, size as printed on certificates)
+PRODUCTS = [
+    ("FOLEY CATHETER 2 WAY", "CH {n} 40 CM", "CH {n} x 40 cm"),
+    ("FOLEY CATHETER 3 WAY", "CH {n} 40 CM", "CH {n} x 40 cm"),
+    ("NELATON CATHETER", "CH {n}", "CH {n}"),
+    ("SUCTION CATHETER", "CH {n}", "CH {n}"),
+    ("FEEDING TUBE", "CH {n} 40 CM", "CH {n} x 40 cm"),
+    ("IV CANNULA", "{g}G", "{g}G"),
+]
+MONTHS = ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"]
+
+# Rows 1-21 of the sheet: the exporter / consignee / invoice block above the item table.
+SHEET_HEADER = {
+    1: "PACKING LIST",
+    3: "Exporter: MARFLOW MEDICAL DEVICES",
+    5: "Invoice No. & Date: EXP/{seed}/2025",
+    8: "Consignee: SYNTHETIC HEALTHCARE DISTRIBUTION",
+    12: "Port of Loading: NHAVA SHEVA",
+    14: "Final Destination: JEBEL ALI",
+    18: "Marks & Nos.",
+    20: "Container No.: SYNU{seed:07d}",
+}
+# Columns of the real sheet that the parser ignores, placed between the ones it reads.
+EXTRA_COLUMNS = {2: "HS Code", 6: "No. of Cartons", 10: "Net Wt (Kg)", 11: "Gross Wt (Kg)"}
+
+
+class Shipment:
+    """One generated shipment: the packing-list items and what each certificate says."""
+
+    def __init__(self, items):
+        self.items = items
+        self.packing_list = None
+        self.coa_paths = []
+        self.sc_paths = []
+        # file name -> expected parse result (a dict for COAs, a list of page dicts for SCs)
+        self.expected = {}
+        self.mismatches = 0
+        self.coa_page_count = 0
+        self.sc_page_count = 0
+
+    @property
+    def pages(self):
+        return self.coa_page_count + self.sc_page_count
+
+
+def make_items(rng, count):
+    """Packing-list items with unique batch numbers and first-of-month dates."""
+    items = []
+    for i in range(count):
+        description, pl_size, cert_size = PRODUCTS[i % len(PRODUCTS)]
+        n, g = rng.choice([6, 8, 10, 12, 14, 16, 18, 20, 22, 24]), rng.choice([16, 18, 20, 22, 24])
+        mfg = datetime(2025, rng.randint(1, 12), 1)
+        exp = datetime(mfg.year + 5, mfg.month, 1)
+        items.append({
+            "serial": i + 1,
+            "description": description,
+            "goods": f"{description} {pl_size.format(n=n, g=g)}",
+            "size": cert_size.format(n=n, g=g),
+            "ref": f"MF-{i % 997:03d}-{n}",
+            "qty": rng.randint(1, 40) * 50,
+            "batch": f"B{i + 1:05d}/25",
+            "mfg": mfg,
+            "exp": exp,
+        })
+    return items
+
+
+def _month(date):
+    return f"{MONTHS[date.month - 1]} {date.year}"
+
+
+def write_packing_list(path, items, seed=0):
+    """Writes the items to a PACKING LIST sheet with the column header on row 22."""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(PACKING_LIST_SHEET)
+    header = list(PACKING_LIST_COLUMNS)
+    for position, name in sorted(EXTRA_COLUMNS.items()):
+        header.insert(position, name)
+    for row in range(1, HEADER_ROW):
+        text = SHEET_HEADER.get(row)
+        ws.append([text.format(seed=seed)] if text else [])
+    ws.append(header)
+    for item in items:
+        values = {
+            "Sl. No. of Item": item["serial"],
+            "Description of Goods": item["goods"],
+            "Ref. code": item["ref"],
+            "Qty          (In Nos)": item["qty"],
+            "BATCH NO": item["batch"],
+            "MFG DATE": item["mfg"],
+            "EXP DATE": item["exp"],
+            "HS Code": "90183930",
+            "No. of Cartons": max(1, item["qty"] // 250),
+            "Net Wt (Kg)": round(item["qty"] * 0.012, 2),
+            "Gross Wt (Kg)": round(item["qty"] * 0.015, 2),
+        }
+        ws.append([values[name] for name in header])
+    wb.create_sheet("Other").append(["Totals on the invoice sheet"])
+    wb.save(path)
+
+
+def draw_line(page, rng, y, words, fontname, fontsize):
+    """Draws each word as its own text object, with random gaps and baseline jitter."""
+    x = 40
+    for word in words:
+        page.insert_text((x, y + rng.uniform(-1, 1)), word, fontname=fontname, fontsize=fontsize)
+        x += pymupdf.get_text_length(word, fontname=fontname, fontsize=fontsize) + rng.uniform(4, 40)
+
+
+def draw_table(page, top, rows, fontname, fontsize):
+    xs = [40, 90, 210, 330, 450]
+    ys = [top + 22 * i for i in range(len(rows) + 1)]
+    for y in ys:
+        page.draw_line((xs[0], y), (xs[-1], y))
+    for x in xs:
+        page.draw_line((x, ys[0]), (x, ys[-1]))
+    for r, row in enumerate(rows):
+        for c, cell in enumerate(row):
+            page.insert_text((xs[c] + 4, ys[r] + 15), cell, fontname=fontname, fontsize=fontsize)
+
+
+def draw_annex(doc, rng, fontname):
+    page = doc.new_page()
+    for i in range(40):
+        words = [f"Test {i}", rng.choice(["PASS", "COMPLIES"]), f"{rng.random():.3f}"]
+        draw_line(page, rng, 40 + 18 * i, words, fontname, 9)
+
+
+_annex_templates = {}
+
+
+def add_annex_pages(doc, rng, fontname, count):
+    """
+    Appends `count` test-result pages. Drawing a page takes ~0.1 s, so one page is
+    drawn per font and copied, which keeps 500-page documents quick to generate.
+    """
+    if count <= 0:
+        return
+    if fontname not in _annex_templates:
+        template = pymupdf.open()
+        draw_annex(template, rng, fontname)
+        _annex_templates[fontname] = template
+    for _ in range(count):
+        doc.insert_pdf(_annex_templates[fontname])
+
+
+def make_coa(rng, item, pages=1, quantity=None):
+    """A COA for one item: the header block on page one, then `pages - 1` test-result pages."""
+    quantity = item["qty"] if quantity is None else quantity
+    lines = [
+        ["CERTIFICATE", "OF", "ANALYSIS"],
+        ["Product", "Name", *item["description"].split(), "Certificate", "No", f"QC/{item['serial']}"],
+        ["Batch", "No.", item["batch"], "Product", "Type", "STERILE"],
+        ["Mfg.", "Date", _month(item["mfg"]), "Product", "Size", *item["size"].split()],
+        ["Exp.", "Date", _month(item["exp"]), "Actual", "Batch", "Size", str(item["qty"] * 4)],
+        ["Shipping", "Qty.", str(quantity), "Quantity", "Released", str(quantity)],
+    ]
+    doc = pymupdf.open()
+    page = doc.new_page()
+    fontname = rng.choice(FONTS)
+    for i, words in enumerate(lines):
+        draw_line(page, rng, 60 + 24 * i, words, fontname, rng.choice([9, 10, 11]))
+    add_annex_pages(doc, rng, fontname, pages - 1)
+    return doc
+
+
+def make_sc(rng, pages):
+    """An SC with one certificate page per (item, quantity) in `pages`."""
+    doc = pymupdf.open()
+    for item, quantity in pages:
+        page = doc.new_page()
+        fontname = rng.choice(FONTS)
+        fontsize = rng.choice([10, 11])
+        lines = [
+            ["STERILIZATION", "CERTIFICATE"],
+            ["Batch", "No:", item["batch"]],
+            ["Mfg.", "Date:", _month(item["mfg"])],
+            ["Exp.", "Date:", _month(item["exp"])],
+            ["Product", "Description:", *item["description"].title().split()],
+        ]
+        for i, words in enumerate(lines):
+            draw_line(page, rng, 50 + 20 * i, words, fontname, fontsize)
+        rows = [["Sr", "Type", "Size", "Quantity"], ["1", "EO", item["size"], str(quantity)]]
+        draw_table(page, 180, rows, fontname, fontsize)
+    return doc
+
+
+def _expected_coa(item, quantity):
+    size = item["size"].upper().replace("X", "x").replace("CH ", "CH").replace("CM", "cm")
+    return {
+        "Product Name": item["description"],
+        "Product Type": "STERILE",
+        "Batch No": item["batch"],
+        "Product Size": " ".join(size.split()),
+        "Mfg. Date": _month(item["mfg"]),
+        "Exp. Date": _month(item["exp"]),
+        "Shipping Qty": str(quantity),
+        "Quantity Released": str(quantity),
+    }
+
+
+def _expected_sc(item, quantity):
+    return {
+        "Batch No": item["batch"],
+        "Mfg. Date": _month(item["mfg"]),
+        "Exp. Date": _month(item["exp"]),
+        "Product Description": item["description"].title().upper(),
+        "Size": item["size"].replace(" ", "").upper(),
+        "Quantity": str(quantity),
+    }
+
+
+def make_shipment(directory, items=200, coas=20, coa_pages=3, scs=2, sc_pages=10, mismatch_rate=0.1, seed=7):
+    """
+    Writes a packing list with `items` rows, `coas` COA files of `coa_pages` pages
+    and `scs` SC files of `sc_pages` certificate pages to `directory`. Certificates
+    cycle through the items, so there can be more of them than items.
+    """
+    rng = random.Random(seed)
+    shipment = Shipment(make_items(rng, items))
+    shipment.packing_list = os.path.join(directory, "packing_list.xlsx")
+    write_packing_list(shipment.packing_list, shipment.items, seed)
+
+    def quantity(item):
+        if rng.random() < mismatch_rate:
+            shipment.mismatches += 1
+            return item["qty"] + 1
+        return item["qty"]
+
+    for i in range(coas):
+        item = shipment.items[i % items]
+        qty = quantity(item)
+        path = os.path.join(directory, f"coa_{i:05d}.pdf")
+        make_coa(rng, item, coa_pages, qty).save(path)
+        shipment.coa_paths.append(path)
+        shipment.coa_page_count += coa_pages
+        shipment.expected[os.path.basename(path)] = _expected_coa(item, qty)
+
+    for i in range(scs):
+        pages = []
+        for page in range(sc_pages):
+            item = shipment.items[(i * sc_pages + page) % items]
+            pages.append((item, quantity(item)))
+        path = os.path.join(directory, f"sc_{i:05d}.pdf")
+        make_sc(rng, pages).save(path)
+        shipment.sc_paths.append(path)
+        shipment.sc_page_count += sc_pages
+        shipment.expected[os.path.basename(path)] = [_expected_sc(item, qty) for item, qty in pages]
+    return shipment
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("directory")
+    ap.add_argument("--items", type=int, default=200, help="Packing-list rows (10 to 10,000)")
+    ap.add_argument("--coas", type=int, default=20, help="COA files")
+    ap.add_argument("--coa-pages", type=int, default=3, help="Pages per COA (1 to 500)")
+    ap.add_argument("--scs", type=int, default=2, help="SC files")
+    ap.add_argument("--sc-pages", type=int, default=10, help="Certificate pages per SC (1 to 500)")
+    ap.add_argument("--mismatch-rate", type=float, default=0.1)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args(argv)
+
+    os.makedirs(args.directory, exist_ok=True)
+    shipment = make_shipment(args.directory, args.items, args.coas, args.coa_pages, args.scs, args.sc_pages, args.mismatch_rate, args.seed)
+    print(f"{shipment.packing_list}: {args.items} items; {args.coas} COAs and {args.scs} SCs, {shipment.pages} pages; {shipment.mismatches} mismatches")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
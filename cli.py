@@ -0,0 +1,150 @@
+"""
+Headless shipment validation.
+
+    python cli.py PACKING_LIST.xlsx --coa-dir COAS/ --sc-dir SCS/ -o final_client_report.xlsx
+
+Runs the same parsers and validators as app.py without Streamlit and writes the
+client report as .csv or .xlsx. Exit codes: 0 all fields match, 1 mismatches
+found, 2 input or parsing errors.
+"""
+import argparse
+import logging
+import os
+import sys
+
+EXIT_OK = 0
+EXIT_MISMATCH = 1
+EXIT_ERROR = 2
+
+
+def build_arg_parser():
+    ap = argparse.ArgumentParser(description="Validate a shipment's COAs and sterilization certificates against its packing list.")
+    ap.add_argument("packing_list", help="Packing list Excel file")
+    ap.add_argument("--coa-dir", help="Directory of COA PDFs")
+    ap.add_argument("--sc-dir", help="Directory of sterilization certificate PDFs")
+    ap.add_argument("-o", "--output", default="final_client_report.csv", help="Client report path (.csv or .xlsx)")
+    ap.add_argument("--coa-report", help="Optional path for the detailed COA validation table (.csv)")
+    ap.add_argument("--sc-report", help="Optional path for the detailed SC validation table (.csv)")
+    ap.add_argument("-j", "--workers", type=int, default=None, help="Parser worker processes (default: MARFLOW_PARSE_WORKERS or CPU count)")
+    ap.add_argument("--no-cache", action="store_true", help="Do not use the parse cache")
+    ap.add_argument("--history", action="store_true", help="Save the results to the validation history (MARFLOW_HISTORY_DB)")
+    ap.add_argument("--product-master", action="store_true",
+                    help="Add the packing list to the product master (MARFLOW_PRODUCT_MASTER) and check sizes and descriptions it lacks against it")
+    ap.add_argument("--ocr", action="store_true", help="Read scanned pages with Tesseract (same as MARFLOW_OCR=1)")
+    ap.add_argument("-q", "--quiet", action="store_true", help="Only print the summary line")
+    ap.add_argument("-v", "--verbose", action="store_true", help="Log every extracted field and timing span")
+    ap.add_argument("--timing", action="store_true", help="Print a per-stage timing summary")
+    ap.add_argument("--profile", metavar="PATH", help="Write cProfile stats of the run to PATH")
+    return ap
+
+
+def list_pdfs(directory):
+    if not directory:
+        return []
+    return sorted(
+        os.path.join(directory, name)
+        for name in os.listdir(directory)
+        if name.lower().endswith(".pdf") and os.path.isfile(os.path.join(directory, name))
+    )
+
+
+def run(args):
+    # Heavy imports (pandas, pdfplumber) are deferred until arguments are valid.
+    from batch_parser import parse_coa_batch, parse_sc_batch, shutdown_pool
+    from packaging_list_parser import parse_packaging_list
+    from parse_cache import as_named_stream, cached_parse, file_name, read_file_bytes
+    from shipment import build_client_report, build_coa_table, build_sc_table, count_mismatches, write_client_report
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr)
+
+    if args.no_cache:
+        _, packing_list = parse_packaging_list(as_named_stream(read_file_bytes(args.packing_list), file_name(args.packing_list)))
+    else:
+        _, packing_list = cached_parse(parse_packaging_list, args.packing_list)
+    if packing_list is None:
+        print(f"❌ Failed to parse packing list `{args.packing_list}`", file=sys.stderr)
+        return EXIT_ERROR
+    log(f"✅ Packing List Loaded: {len(packing_list)} items")
+
+    products = None
+    if args.product_master:
+        from product_master import get_product_master
+
+        products = get_product_master()
+        learned = products.learn(packing_list, source=file_name(args.packing_list))
+        log(f"✅ Product master: {len(products)} products ({learned} added or updated)")
+
+    coa_paths = list_pdfs(args.coa_dir)
+    sc_paths = list_pdfs(args.sc_dir)
+    batch_options = {"max_workers": args.workers, "use_cache": not args.no_cache}
+
+    def progress(kind):
+        return lambda done, total, result: log(f"[{kind} {done}/{total}] {result['name']}" + (f" ❌ {result['error']}" if result["error"] else ""))
+
+    try:
+        parsed_coas = parse_coa_batch(coa_paths, progress=progress("COA"), **batch_options) if coa_paths else []
+        parsed_scs = parse_sc_batch(sc_paths, progress=progress("SC"), **batch_options) if sc_paths else []
+    finally:
+        shutdown_pool()
+
+    final_coa_table = build_coa_table(parsed_coas, packing_list, products)
+    combined_validation = build_sc_table(parsed_scs, packing_list, products)
+    final_client_format = build_client_report(final_coa_table, combined_validation, packing_list)
+
+    write_client_report(final_client_format, args.output)
+    if args.coa_report and final_coa_table is not None:
+        final_coa_table.to_csv(args.coa_report, index=False)
+    if args.sc_report and combined_validation is not None:
+        combined_validation.to_csv(args.sc_report, index=False)
+
+    if args.history:
+        from history_store import get_history_store
+
+        certificates = [("COA", p["name"], p["data"]) for p in parsed_coas if p["data"]]
+        certificates += [("SC", p["name"], page) for p in parsed_scs if p["data"] for page in p["data"]]
+        shipment_id = get_history_store().record_shipment(
+            packing_list, final_coa_table, combined_validation,
+            certificates=certificates, packing_list_name=file_name(args.packing_list),
+        )
+        log(f"✅ Saved to history as shipment {shipment_id}")
+
+    # A certificate with nothing extracted is a parse error, even without an error message.
+    failed = [p for p in parsed_coas + parsed_scs if p["error"] or not p["data"]]
+    mismatches = count_mismatches(final_coa_table, combined_validation)
+    print(f"COAs: {len(parsed_coas)}  SCs: {len(parsed_scs)}  parse errors: {len(failed)}  mismatches: {mismatches}  report: {args.output}")
+
+    if failed:
+        return EXIT_ERROR
+    return EXIT_MISMATCH if mismatches else EXIT_OK
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format="%(message)s")
+    for directory in (args.coa_dir, args.sc_dir):
+        if directory and not os.path.isdir(directory):
+            print(f"❌ Not a directory: `{directory}`", file=sys.stderr)
+            return EXIT_ERROR
+    if not os.path.isfile(args.packing_list):
+        print(f"❌ Packing list not found: `{args.packing_list}`", file=sys.stderr)
+        return EXIT_ERROR
+    if args.ocr:
+        # Set before the parsers are imported: their cache version includes it.
+        os.environ["MARFLOW_OCR"] = "1"
+    if args.workers:
+        # The shared parser pool is sized from this when it is first used.
+        os.environ["MARFLOW_PARSE_WORKERS"] = str(args.workers)
+    import timing
+
+    timing.enable(args.timing or args.verbose)
+    with timing.profiled(args.profile):
+        status = run(args)
+    if args.timing:
+        print(timing.summary().to_string(index=False, float_format="%.1f"), file=sys.stderr)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
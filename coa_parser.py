@@ -1,7 +1,37 @@
-import pdfplumber
-import re
+import logging
 
-def parse_certificate_of_analysis(uploaded_file):
+import ocr
+import timing
+from extraction_rules import COA_RULES
+from parse_cache import file_name
+from pdf_backends import DEFAULT_TEXT_BACKEND, PdfDocument
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever extraction output changes so cached parse results are invalidated.
+# The text backend and OCR are part of the version so results from one are never served for the other.
+PARSER_VERSION = f"2-{DEFAULT_TEXT_BACKEND}{ocr.version_suffix()}"
+
+def extract_coa_fields(full_text, coa_data):
+    """
+    Fills the fields of `coa_data` that are still None from `full_text`.
+    Fields that already have a value are left untouched.
+    """
+    missing = [key for key, value in coa_data.items() if value is None]
+    with timing.span("extract.coa"):
+        found = COA_RULES.extract(full_text, missing)
+    for key, value in found.items():
+        coa_data[key] = value
+        logger.debug("✅ Matched %s: %s", key, value)
+    return coa_data
+
+
+def parse_certificate_of_analysis(uploaded_file, text_backend=None):
+    """
+    Returns the COA header fields. `text_backend` ("pymupdf" or "pdfplumber",
+    default from MARFLOW_PDF_TEXT_BACKEND) selects the text extractor. Scanned
+    pages are read with OCR when MARFLOW_OCR is on.
+    """
     try:
         coa_data = {
             "Product Name": None,
@@ -14,46 +44,27 @@ def parse_certificate_of_analysis(uploaded_file):
             "Quantity Released": None
         }
 
-        with pdfplumber.open(uploaded_file) as pdf:
-            full_text = "\n".join(page.extract_text() for page in pdf.pages if page.extract_text())
-
-        # Define patterns
-        patterns = {
-            "Product Name": r"Product Name\s+(.*?)\s+Certificate No",
-            "Batch No": r"Batch No\.\s+(.*?)\s+(?:Product Type|Product Size|Certificate No)",
-            "Product Size": r"Product Size\s+([A-Z0-9 ,.+\-xXcmCM]+)",
-            "Mfg. Date": r"Mfg\. Date\s+(.*?)\s+Product Size",
-            "Exp. Date": r"Exp\. Date\s+(.*?)\s+Actual Batch Size",
-            "Shipping Qty": r"Shipping Qty\.\s+(\d+)",
-            "Quantity Released": r"Quantity Released\s+(\d+)"
-        }
-
-        # First: handle Product Type manually so it’s strict
-        lines = full_text.splitlines()
-        for i, line in enumerate(lines):
-            if "product type" in line.lower():
-                match = re.search(r"Product Type\s*[:\-]?\s*(.*)", line, re.IGNORECASE)
-                if match:
-                    val = match.group(1).strip()
-                    if val and not re.search(r"^(PRODUCT SIZE|CERTIFICATE|BATCH|DATE|QTY)", val, re.IGNORECASE):
-                        val = val.upper().replace("X", "x").replace("CH ", "CH").replace("CM", "cm")
-                        val = re.sub(r"\s+", " ", val)
-                        coa_data["Product Type"] = val
-                        print(f"✅ Matched Product Type: {val}")
-                        break  # Only take first valid match
-
-        # Then: extract the rest normally
-        for key, pattern in patterns.items():
-            match = re.search(pattern, full_text, re.IGNORECASE)
-            if match:
-                value = match.group(1).strip()
-                value = value.upper().replace("X", "x").replace("CH ", "CH").replace("CM", "cm")
-                value = re.sub(r"\s+", " ", value)
-                coa_data[key] = value
-                print(f"✅ Matched {key}: {value}")
+        # The header block on page one normally holds every field, so pages are read
+        # one at a time (each extracted once) and reading stops as soon as all fields
+        # are filled, skipping long test-result annexes. Missing fields are searched
+        # in the new page joined to the previous one, so a label and value split
+        # across a page break are still found.
+        previous_text = None
+        with PdfDocument(uploaded_file, text_backend=text_backend) as pdf:
+            for page_text in pdf.page_texts():
+                if not page_text:
+                    continue
+                window = page_text if previous_text is None else previous_text + "\n" + page_text
+                extract_coa_fields(window, coa_data)
+                if all(value is not None for value in coa_data.values()):
+                    break
+                previous_text = page_text
+            if pdf.textless_pages and not pdf.ocr_pages:
+                logger.warning("⚠️ `%s` has %d pages without text (scanned?); set MARFLOW_OCR=1 to read them",
+                               file_name(uploaded_file), pdf.textless_pages)
 
         return coa_data
 
     except Exception as e:
-        print(f"❌ CA Parsing Error: {e}")
+        logger.error("❌ CA Parsing Error: %s", e)
         return None
@@ -0,0 +1,121 @@
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import pandas as pd
+from dateutil import parser
+
+import timing
+
+# "month" -> YYYY-MM (SC validation), "day" -> YYYY-MM-DD (COA validation).
+OUTPUT_FORMATS = {"month": "%Y-%m", "day": "%Y-%m-%d"}
+MEMO_SIZE = 4096
+
+MONTHS = {name: number for number, name in enumerate(
+    ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"], 1)}
+
+# Fast paths for the formats certificates and packing lists actually use. Each one
+# gives the same result the fallback parser would.
+_MONTH_YEAR = re.compile(r"([A-Za-z]{3})\s*[-/]?\s*(\d{4})")
+_YEAR_MONTH = re.compile(r"(\d{4})-(\d{1,2})")
+_ISO_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})(?:[ T]00:00:00)?")
+_EXCEL_SERIAL = re.compile(r"(\d{5})(?:\.0+)?")
+# Excel serial numbers 20000-80000 cover 1954-2119; outside that it is not a date.
+_EXCEL_SERIAL_RANGE = (20000, 80000)
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+_FALLBACK_YEAR_MONTH = re.compile(r"(\d{4})[-/ ]?(\d{1,2})")
+_FALLBACK_MONTH_YEAR = re.compile(r"([A-Za-z]{3})[-\s,]?(\d{4})")
+
+
+def _fast_parse(text):
+    """Returns a datetime for the known formats, else None."""
+    match = _MONTH_YEAR.fullmatch(text)
+    if match:
+        month = MONTHS.get(match.group(1).upper())
+        return datetime(int(match.group(2)), month, 1) if month else None
+    match = _YEAR_MONTH.fullmatch(text)
+    if match:
+        month = int(match.group(2))
+        return datetime(int(match.group(1)), month, 1) if 1 <= month <= 12 else None
+    match = _ISO_DATE.fullmatch(text)
+    if match:
+        try:
+            return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+        except ValueError:
+            return None
+    match = _EXCEL_SERIAL.fullmatch(text)
+    if match:
+        serial = int(match.group(1))
+        low, high = _EXCEL_SERIAL_RANGE
+        if low <= serial <= high:
+            # Date cells arrive as serial numbers once workbook styles are stripped.
+            return _EXCEL_EPOCH + timedelta(days=serial)
+    return None
+
+
+def _fuzzy_month(text):
+    try:
+        dt = parser.parse(text, fuzzy=True)
+        return dt.strftime("%Y-%m")
+    except Exception:
+        match = _FALLBACK_YEAR_MONTH.match(text)
+        if match:
+            year, month = match.groups()
+            return f"{year}-{int(month):02d}"
+        return text.upper()
+
+
+def _pandas_day(text):
+    try:
+        dt = pd.to_datetime(text, errors="coerce")
+        if pd.isna(dt):
+            match = _FALLBACK_MONTH_YEAR.match(text)
+            if match:
+                month = match.group(1).title()
+                year = match.group(2)
+                return f"{year}-{month}"
+            return text
+        return dt.strftime("%Y-%m-%d")
+    except Exception:
+        return text
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _normalize(text, precision):
+    dt = _fast_parse(text)
+    if dt is not None:
+        return dt.strftime(OUTPUT_FORMATS[precision])
+    if precision == "month":
+        return _fuzzy_month(text)
+    return _pandas_day(text)
+
+
+def normalize_date(value, precision="month"):
+    """
+    Normalizes a certificate or packing-list date.
+
+    precision="month" gives YYYY-MM, falling back to dateutil's fuzzy parser;
+    precision="day" gives YYYY-MM-DD, falling back to pd.to_datetime. Unparseable
+    values come back as-is (upper-cased for "month"). Results are memoized.
+    """
+    if precision not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown date precision: {precision!r}")
+    text = str(value).strip()
+    if not text:
+        return ""
+    return _normalize(text, precision)
+
+
+@timing.timed("validate.dates")
+def normalize_dates(values, precision="month"):
+    """Column version of `normalize_date`: each distinct value is normalized once."""
+    values = pd.Series(values, dtype=object) if not isinstance(values, pd.Series) else values
+    texts = pd.Series([str(value) for value in values], index=values.index, dtype=object)
+    codes, uniques = pd.factorize(texts)
+    normalized = pd.Series([normalize_date(text, precision) for text in uniques], dtype=object).to_numpy(dtype=object)
+    return pd.Series(normalized[codes], index=values.index, dtype=object)
+
+
+def clear_cache():
+    _normalize.cache_clear()
@@ -0,0 +1,474 @@
+import logging
+import os
+import random
+import smtplib
+import sqlite3
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from email.message import EmailMessage
+from email.utils import getaddresses, parseaddr
+
+DEFAULT_OUTBOX_DB = os.path.join(os.path.expanduser("~"), ".cache", "marflowqt", "outbox.sqlite3")
+DEFAULT_SMTP_PORT = 587
+DEFAULT_MAX_ATTEMPTS = 10
+# Retries wait 30 s, 1 min, 2 min, ... up to an hour, each with up to 20% jitter.
+BACKOFF_BASE = 30.0
+BACKOFF_MAX = 3600.0
+# An idle connection is kept this long for the next message, then closed.
+IDLE_TIMEOUT = 60.0
+BATCH_SIZE = 50
+# Sent and failed messages are deleted after this many seconds.
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    status TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    subject TEXT,
+    body BLOB NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL,
+    last_error TEXT,
+    sent REAL
+);
+CREATE INDEX IF NOT EXISTS messages_due ON messages (status, next_attempt);
+"""
+
+
+def smtp_settings_from_env():
+    """
+    SMTP settings from MARFLOW_SMTP_HOST, _PORT, _USER, _PASSWORD, _SENDER and
+    _SECURITY ("starttls", the default, "ssl" or "none"). Returns None when no
+    host is configured.
+    """
+    host = os.environ.get("MARFLOW_SMTP_HOST")
+    if not host:
+        return None
+    port = os.environ.get("MARFLOW_SMTP_PORT")
+    try:
+        port = int(port) if port else DEFAULT_SMTP_PORT
+    except ValueError:
+        logger.warning("⚠️ Ignoring invalid MARFLOW_SMTP_PORT=%r", port)
+        port = DEFAULT_SMTP_PORT
+    user = os.environ.get("MARFLOW_SMTP_USER") or None
+    return {
+        "host": host,
+        "port": port,
+        "user": user,
+        "password": os.environ.get("MARFLOW_SMTP_PASSWORD") or None,
+        "sender": os.environ.get("MARFLOW_SMTP_SENDER") or user,
+        "security": (os.environ.get("MARFLOW_SMTP_SECURITY") or "starttls").lower(),
+    }
+
+
+def report_email(to_email, report_df, sender, subject="Validation Report", filename="mismatch_report.csv", xlsx=None):
+    """
+    The report message: a short note with the table as a CSV attachment and,
+    when given, the .xlsx workbook bytes as a second one.
+    """
+    msg = EmailMessage()
+    msg["Subject"] = subject
+    msg["From"] = sender
+    msg["To"] = to_email
+    msg.set_content("Please find attached the concise mismatch report from Marflow QC Validator.")
+    msg.add_attachment(report_df.to_csv(index=False).encode("utf-8"), maintype="application", subtype="csv", filename=filename)
+    if xlsx is not None:
+        msg.add_attachment(
+            xlsx, maintype="application", subtype="vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            filename=os.path.splitext(filename)[0] + ".xlsx",
+        )
+    return msg
+
+
+def backoff_delay(attempts):
+    """Seconds to wait before retry number `attempts` (1-based)."""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.0)
+
+
+class Outbox:
+    """
+    Messages waiting to be sent, in a SQLite file, so a report queued before a
+    network failure or a restart is still delivered. Each call opens its own
+    connection, so the store can be shared by the sender thread and every
+    Streamlit session. A message is "queued", "sending" (claimed by a sender),
+    "sent" or "failed"; messages left "sending" by a process that stopped are
+    queued again when the outbox is opened.
+    """
+
+    def __init__(self, path, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            conn.execute("UPDATE messages SET status = 'queued' WHERE status = 'sending'")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, msg):
+        """Stores an EmailMessage for sending and returns its ID."""
+        headers = [value for field in ("To", "Cc", "Bcc") for value in msg.get_all(field, [])]
+        recipients = [address for _, address in getaddresses(headers) if address]
+        if not recipients:
+            raise ValueError("The message has no recipients")
+        sender = parseaddr(msg["From"] or "")[1]
+        del msg["Bcc"]
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO messages (created, status, sender, recipients, subject, body, next_attempt) VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (now, sender, ",".join(recipients), msg["Subject"], msg.as_bytes(), now),
+            )
+            return cursor.lastrowid
+
+    def due(self, limit=BATCH_SIZE):
+        """
+        Claims the queued messages whose next attempt is due, oldest first: they
+        are marked "sending" in the same transaction, so no other sender gets
+        them. Each one must end in `mark_sent`, `mark_failed` or `release`.
+        """
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = [dict(row) for row in conn.execute(
+                "SELECT * FROM messages WHERE status = 'queued' AND next_attempt <= ? ORDER BY next_attempt, id LIMIT ?",
+                (time.time(), limit),
+            )]
+            conn.executemany("UPDATE messages SET status = 'sending' WHERE id = ?", [(row["id"],) for row in rows])
+        for row in rows:
+            row["status"] = "sending"
+        return rows
+
+    def release(self, message_ids):
+        """Queues claimed messages again, untouched, for the next `due`."""
+        with self._connect() as conn:
+            conn.executemany("UPDATE messages SET status = 'queued' WHERE id = ? AND status = 'sending'", [(i,) for i in message_ids])
+
+    def next_due(self):
+        """When the next queued message is due (epoch seconds), or None if nothing is queued."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT MIN(next_attempt) FROM messages WHERE status = 'queued'").fetchone()
+        return row[0]
+
+    def mark_sent(self, message_id):
+        with self._connect() as conn:
+            conn.execute("UPDATE messages SET status = 'sent', sent = ?, last_error = NULL WHERE id = ?", (time.time(), message_id))
+
+    def mark_failed(self, message_id, error, permanent=False):
+        """
+        Records a failed attempt. The message is retried after `backoff_delay`
+        unless the error is permanent or it has used up `max_attempts`.
+        """
+        with self._connect() as conn:
+            row = conn.execute("SELECT attempts FROM messages WHERE id = ?", (message_id,)).fetchone()
+            if row is None:
+                return
+            attempts = row["attempts"] + 1
+            if permanent or attempts >= self.max_attempts:
+                conn.execute("UPDATE messages SET status = 'failed', attempts = ?, last_error = ? WHERE id = ?", (attempts, error, message_id))
+            else:
+                conn.execute(
+                    "UPDATE messages SET status = 'queued', attempts = ?, last_error = ?, next_attempt = ? WHERE id = ?",
+                    (attempts, error, time.time() + backoff_delay(attempts), message_id),
+                )
+
+    def retry(self, message_id):
+        """Queues a failed message again, due now."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE messages SET status = 'queued', attempts = 0, next_attempt = ? WHERE id = ? AND status = 'failed'",
+                (time.time(), message_id),
+            )
+
+    def get(self, message_id):
+        """The message's status row as a dict (without the body), or None."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, created, status, recipients, subject, attempts, next_attempt, last_error, sent FROM messages WHERE id = ?",
+                (message_id,),
+            ).fetchone()
+        return dict(row) if row else None
+
+    def recent(self, limit=20):
+        """The newest messages' status rows, newest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, created, status, recipients, subject, attempts, last_error, sent FROM messages ORDER BY id DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def purge(self, max_age=DEFAULT_MAX_AGE):
+        """Deletes sent and failed messages created more than `max_age` seconds ago."""
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM messages WHERE status IN ('sent', 'failed') AND created < ?", (time.time() - max_age,))
+        return cursor.rowcount
+
+
+def _is_permanent(error):
+    """
+    5xx replies to a message's MAIL, RCPT or DATA (bad address, message rejected)
+    will fail the same way again. Connect and login errors are not passed here.
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+class Sender:
+    """
+    Delivers the outbox on a background thread. Due messages are sent in batches
+    over one SMTP connection, which stays open for IDLE_TIMEOUT seconds so the
+    next report skips the connect, STARTTLS and login. A connection error drops
+    the connection and leaves the rest of the batch for the next round; failed
+    messages are retried with exponential backoff, and after a temporary failure
+    the sender itself backs off before trying the server again. Failing to
+    connect, start TLS or log in is the server's (or the settings') fault, not
+    the message's: the sender backs off and the messages stay queued untouched.
+    """
+
+    def __init__(self, outbox, settings, idle_timeout=IDLE_TIMEOUT, timeout=30):
+        self.outbox = outbox
+        self.settings = settings
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._smtp = None
+        self._last_used = 0.0
+        self._failures = 0
+        self._paused_until = 0.0
+        self._sending = None
+        self._error = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="marflow-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def wake(self):
+        """Makes the sender look at the outbox now (after `Outbox.enqueue`)."""
+        self._wake.set()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                # Still mid-send; `_run` closes the connection on its way out.
+                return
+            self._thread = None
+        self._close()
+
+    def status(self):
+        """
+        {"sending": ID of the message being sent or None, "paused_until": epoch
+        seconds the sender waits for the server until or None, "error": the last
+        connect or login error or None}.
+        """
+        remaining = self._paused_until - time.monotonic()
+        return {
+            "sending": self._sending,
+            "paused_until": time.time() + remaining if remaining > 0 else None,
+            "error": self._error,
+        }
+
+    def _pause(self):
+        self._close()
+        self._failures += 1
+        self._paused_until = time.monotonic() + backoff_delay(self._failures)
+
+    def _connect(self):
+        settings = self.settings
+        if settings["security"] == "ssl":
+            smtp = smtplib.SMTP_SSL(settings["host"], settings["port"], timeout=self.timeout, context=ssl.create_default_context())
+        else:
+            smtp = smtplib.SMTP(settings["host"], settings["port"], timeout=self.timeout)
+            if settings["security"] == "starttls":
+                smtp.starttls(context=ssl.create_default_context())
+        if settings["user"]:
+            smtp.login(settings["user"], settings["password"] or "")
+        return smtp
+
+    def _connection(self):
+        if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+            self._close()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        return self._smtp
+
+    def _close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+    def send_due(self):
+        """Sends every due message; returns the number sent. Also called by `_run`."""
+        sent = 0
+        while not self._stop.is_set() and time.monotonic() >= self._paused_until:
+            batch = self.outbox.due()
+            if not batch:
+                break
+            for n, message in enumerate(batch):
+                if self._stop.is_set():
+                    self.outbox.release([m["id"] for m in batch[n:]])
+                    return sent
+                try:
+                    smtp = self._connection()
+                except (smtplib.SMTPException, OSError) as e:
+                    self._error = f"{type(e).__name__}: {e}"
+                    logger.warning("⚠️ Could not connect or log in to %s, %d emails stay queued: %s",
+                                   self.settings["host"], len(batch) - n, e)
+                    self.outbox.release([m["id"] for m in batch[n:]])
+                    self._pause()
+                    return sent
+                self._sending = message["id"]
+                try:
+                    smtp.sendmail(message["sender"], message["recipients"].split(","), message["body"])
+                except (smtplib.SMTPException, OSError) as e:
+                    permanent = _is_permanent(e)
+                    self.outbox.mark_failed(message["id"], f"{type(e).__name__}: {e}", permanent=permanent)
+                    logger.warning("⚠️ Email %s to %s failed%s: %s", message["id"], message["recipients"],
+                                   "" if permanent else ", will retry", e)
+                    if not permanent:
+                        # The connection is suspect; the rest of the batch waits for a new one.
+                        self.outbox.release([m["id"] for m in batch[n + 1:]])
+                        self._pause()
+                        return sent
+                except Exception:
+                    self.outbox.release([m["id"] for m in batch[n:]])
+                    raise
+                else:
+                    self._failures = 0
+                    self._error = None
+                    self._last_used = time.monotonic()
+                    self.outbox.mark_sent(message["id"])
+                    logger.info("📧 Email %s sent to %s", message["id"], message["recipients"])
+                    sent += 1
+                finally:
+                    self._sending = None
+        return sent
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.send_due()
+            except Exception as e:
+                logger.exception("❌ Outbox sender error: %s", e)
+            next_due = self.outbox.next_due()
+            wait = self.idle_timeout if next_due is None else min(self.idle_timeout, next_due - time.time())
+            if self._smtp is not None:
+                wait = min(wait, self.idle_timeout - (time.monotonic() - self._last_used))
+            wait = max(wait, self._paused_until - time.monotonic(), 0.05)
+            if self._wake.wait(wait):
+                self._wake.clear()
+            if self._smtp is not None and time.monotonic() - self._last_used > self.idle_timeout:
+                self._close()
+        self._close()
+
+
+_default_outbox = None
+_default_sender = None
+_default_lock = threading.Lock()
+
+
+def get_outbox():
+    """
+    Process-wide outbox at MARFLOW_OUTBOX_DB (default ~/.cache/marflowqt/outbox.sqlite3),
+    with its background sender kept in step with the SMTP settings (see
+    `get_sender`). Messages queued without SMTP settings wait in the outbox.
+    """
+    global _default_outbox
+    with _default_lock:
+        if _default_outbox is None:
+            outbox = Outbox(os.environ.get("MARFLOW_OUTBOX_DB") or DEFAULT_OUTBOX_DB)
+            outbox.purge()
+            _default_outbox = outbox
+    get_sender()
+    return _default_outbox
+
+
+def get_sender():
+    """
+    The background sender for the current SMTP settings (`smtp_settings_from_env`),
+    or None while there are none. Checked on every call: the sender is started
+    once settings appear and restarted when they change, so messages queued
+    before SMTP was set up are sent then. The old sender is given its SMTP
+    timeout to finish the message in hand; messages are claimed by one sender at
+    a time (`Outbox.due`), so even one that outlives it never sends one twice.
+    """
+    global _default_sender
+    settings = smtp_settings_from_env()
+    with _default_lock:
+        if _default_outbox is None:
+            return None
+        if _default_sender is not None and _default_sender.settings != settings:
+            _default_sender.stop(timeout=_default_sender.timeout)
+            _default_sender = None
+        if _default_sender is None and settings is not None:
+            _default_sender = Sender(_default_outbox, settings).start()
+        return _default_sender
+
+
+def send_report(to_email, report_df, subject="Validation Report", xlsx=None):
+    """Queues the report for `to_email` and wakes the sender; returns the message ID."""
+    outbox = get_outbox()
+    settings = smtp_settings_from_env() or {}
+    msg = report_email(to_email, report_df, settings.get("sender") or "", subject=subject, xlsx=xlsx)
+    message_id = outbox.enqueue(msg)
+    sender = get_sender()
+    if sender is not None:
+        sender.wake()
+    return message_id
+
+
+def sender_configured():
+    return smtp_settings_from_env() is not None
+
+
+def describe(message, sender_status=None):
+    """
+    One line on where a message (an `Outbox.get` row) stands, for the status
+    panel. `sender_status` is `Sender.status()`, or None when SMTP is not set up.
+    """
+    if message["status"] == "sent":
+        return f"✅ Sent to {message['recipients']} at {time.strftime('%H:%M', time.localtime(message['sent']))}"
+    if message["status"] == "failed":
+        return f"❌ Failed after {message['attempts']} attempt(s): {message['last_error']}"
+    if message["status"] == "sending":
+        return f"📤 Sending to {message['recipients']}"
+    if sender_status is None:
+        return "🕒 Queued: SMTP is not configured (MARFLOW_SMTP_HOST), so it waits in the outbox"
+    if sender_status["sending"] == message["id"]:
+        return f"📤 Sending to {message['recipients']}"
+    if sender_status["paused_until"] and sender_status["error"]:
+        retry_at = time.strftime("%H:%M:%S", time.localtime(sender_status["paused_until"]))
+        return f"⏸️ Queued: could not connect or log in to the mail server ({sender_status['error']}), trying again at {retry_at}"
+    if message["attempts"]:
+        retry_at = time.strftime("%H:%M:%S", time.localtime(message["next_attempt"]))
+        return f"🔁 Retrying at {retry_at} after {message['attempts']} failed attempt(s) ({message['last_error']})"
+    return f"🕒 Queued for {message['recipients']}"
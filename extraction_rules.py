@@ -0,0 +1,114 @@
+import re
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def coa_value(value):
+    """COA post-processing: upper-case, `X`→`x`, `CH 16`→`CH16`, `CM`→`cm`, single spaces."""
+    value = value.upper().replace("X", "x").replace("CH ", "CH").replace("CM", "cm")
+    return _WHITESPACE.sub(" ", value)
+
+
+def sc_value(value):
+    """SC post-processing: upper-case."""
+    return value.upper()
+
+
+class FieldRule:
+    """
+    One field: the `pattern` whose first group is the value, and a `postprocess`
+    applied to the stripped value.
+    """
+
+    def __init__(self, name, pattern, postprocess):
+        self.name = name
+        self.pattern = pattern
+        self.postprocess = postprocess
+
+
+class LineRule:
+    """
+    A field read from the first line containing `label` whose `pattern` value is
+    non-empty and is not rejected by `reject` (used for the strict COA Product Type).
+    """
+
+    def __init__(self, name, label, pattern, reject, postprocess):
+        self.name = name
+        self.label = label
+        self.pattern = pattern
+        self.reject = reject
+        self.postprocess = postprocess
+
+
+class RuleSet:
+    """
+    Field-extraction rules compiled once at import.
+
+    `extract` searches each requested field with its own precompiled pattern. A
+    single alternation of all labels was measured ~30x slower in CPython's `re`
+    than these literal-prefixed searches, so fields are not merged into one regex.
+    Line rules jump straight to lines containing their label instead of splitting
+    and lower-casing the whole text.
+    """
+
+    def __init__(self, rules, flags=0):
+        self.rules = list(rules)
+        self.fields = [rule.name for rule in self.rules]
+        for rule in self.rules:
+            rule.pattern = re.compile(rule.pattern, flags)
+            if isinstance(rule, LineRule):
+                rule.label = re.compile(rule.label, flags)
+                rule.reject = re.compile(rule.reject, flags)
+
+    def extract(self, text, fields=None):
+        """Returns {field: value} for the requested `fields` (default: all) found in `text`."""
+        found = {}
+        for rule in self.rules:
+            if fields is not None and rule.name not in fields:
+                continue
+            if isinstance(rule, LineRule):
+                value = self._match_line(rule, text)
+            else:
+                match = rule.pattern.search(text)
+                value = rule.postprocess(match.group(1).strip()) if match else None
+            if value is not None:
+                found[rule.name] = value
+        return found
+
+    @staticmethod
+    def _match_line(rule, text):
+        pos = 0
+        while True:
+            hit = rule.label.search(text, pos)
+            if not hit:
+                return None
+            start = text.rfind("\n", 0, hit.start()) + 1
+            end = text.find("\n", hit.end())
+            line = text[start:] if end == -1 else text[start:end]
+            match = rule.pattern.search(line)
+            if match:
+                value = match.group(1).strip()
+                if value and not rule.reject.search(value):
+                    return rule.postprocess(value)
+            if end == -1:
+                return None
+            pos = end + 1
+
+
+COA_RULES = RuleSet([
+    LineRule("Product Type", r"product type", r"Product Type\s*[:\-]?\s*(.*)", r"^(PRODUCT SIZE|CERTIFICATE|BATCH|DATE|QTY)", coa_value),
+    FieldRule("Product Name", r"Product Name\s+(.*?)\s+Certificate No", coa_value),
+    FieldRule("Batch No", r"Batch No\.\s+(.*?)\s+(?:Product Type|Product Size|Certificate No)", coa_value),
+    FieldRule("Product Size", r"Product Size\s+([A-Z0-9 ,.+\-xXcmCM]+)", coa_value),
+    FieldRule("Mfg. Date", r"Mfg\. Date\s+(.*?)\s+Product Size", coa_value),
+    FieldRule("Exp. Date", r"Exp\. Date\s+(.*?)\s+Actual Batch Size", coa_value),
+    FieldRule("Shipping Qty", r"Shipping Qty\.\s+(\d+)", coa_value),
+    FieldRule("Quantity Released", r"Quantity Released\s+(\d+)", coa_value),
+], flags=re.IGNORECASE)
+
+SC_RULES = RuleSet([
+    FieldRule("Batch No", r"Batch No[:\s]*([A-Z0-9/]+)", sc_value),
+    FieldRule("Mfg. Date", r"Mfg\. Date[:\s]*([A-Z]{3}\s*[-–]?\s*\d{4})", sc_value),
+    FieldRule("Exp. Date", r"Exp\. Date[:\s]*([A-Z]{3}\s*[-–]?\s*\d{4})", sc_value),
+    FieldRule("Product Description", r"Product Description[:\s]*(.+?)(?:\n|$)", sc_value),
+], flags=re.IGNORECASE | re.MULTILINE)
@@ -0,0 +1,232 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+import timing
+from packing_list_index import PackingListIndex
+
+DEFAULT_HISTORY_PATH = os.path.join(os.path.expanduser("~"), ".cache", "marflowqt", "history.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shipments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    validated_on TEXT NOT NULL,
+    packing_list TEXT,
+    signature TEXT,
+    coa_count INTEGER NOT NULL,
+    sc_count INTEGER NOT NULL,
+    mismatches INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    shipment_id INTEGER NOT NULL REFERENCES shipments (id),
+    validated_on TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    batch_no TEXT,
+    ref_code TEXT,
+    field TEXT,
+    expected TEXT,
+    actual TEXT,
+    matched INTEGER NOT NULL,
+    file TEXT
+);
+CREATE TABLE IF NOT EXISTS certificates (
+    shipment_id INTEGER NOT NULL REFERENCES shipments (id),
+    kind TEXT NOT NULL,
+    file TEXT,
+    batch_no TEXT,
+    fields TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_batch ON results (batch_no, field);
+CREATE INDEX IF NOT EXISTS results_ref ON results (ref_code, field);
+CREATE INDEX IF NOT EXISTS results_date ON results (validated_on);
+CREATE INDEX IF NOT EXISTS results_field ON results (field, matched);
+CREATE INDEX IF NOT EXISTS certificates_batch ON certificates (batch_no);
+CREATE INDEX IF NOT EXISTS shipments_signature ON shipments (signature);
+"""
+
+HISTORY_COLUMNS = ["Validated On", "Kind", "Batch No", "Ref code", "Field", "Expected Value", "Certificate Value", "Match", "File", "Shipment"]
+
+
+def _strip_marks(value):
+    return str(value).replace("❌", "").replace("✅", "").strip()
+
+
+def _text(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return str(value)
+
+
+def _coa_rows(coa_table, ref_lookup):
+    if coa_table is None:
+        return []
+    files = coa_table["COA File"] if "COA File" in coa_table.columns else [None] * len(coa_table)
+    return [
+        ("COA", _text(batch), _text(ref_lookup.get(batch)), field, _text(expected), _text(actual), int(match == "✅"), file)
+        for batch, field, expected, actual, match, file in zip(
+            coa_table["Batch No"], coa_table["Field"], coa_table["Expected Value"],
+            coa_table["COA Value"], coa_table["Match"], files)
+    ]
+
+
+def _sc_rows(sc_table, ref_lookup):
+    if sc_table is None:
+        return []
+    # The SC table has no file column; SC file names are kept with the parsed certificates.
+    return [
+        ("SC", _text(batch), _text(ref_lookup.get(batch)), field, _strip_marks(expected), _strip_marks(actual), int(match == "✅"), None)
+        for batch, field, expected, actual, match in zip(
+            sc_table["Batch No"], sc_table["Field"], sc_table["Expected Value"],
+            sc_table["SC Value"], sc_table["Validation"])
+    ]
+
+
+class HistoryStore:
+    """
+    Validation history in a SQLite file: one row per shipment, one per checked
+    field and one per parsed certificate, indexed on batch number, ref code,
+    date and field.
+
+    A shipment is written in a single transaction with `executemany`, so saving
+    a few thousand checks takes tens of milliseconds.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def has_shipment(self, signature):
+        with self._connect() as conn:
+            return conn.execute("SELECT 1 FROM shipments WHERE signature = ? LIMIT 1", (signature,)).fetchone() is not None
+
+    @timing.timed("history.write")
+    def record_shipment(self, packing_list, coa_table=None, sc_table=None, certificates=(), packing_list_name=None, signature=None):
+        """
+        Saves one validated shipment and returns its ID. `certificates` are
+        ("COA" or "SC", file name, parsed fields) tuples. Ref codes are looked up
+        in the packing list.
+        """
+        ref_lookup = PackingListIndex.from_any(packing_list).ref_lookup()
+        rows = _coa_rows(coa_table, ref_lookup) + _sc_rows(sc_table, ref_lookup)
+        certificates = list(certificates)
+        now = time.time()
+        validated_on = datetime.fromtimestamp(now).strftime("%Y-%m-%d")
+
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO shipments (created, validated_on, packing_list, signature, coa_count, sc_count, mismatches)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (now, validated_on, packing_list_name, signature,
+                 sum(kind == "COA" for kind, _, _ in certificates),
+                 sum(kind == "SC" for kind, _, _ in certificates),
+                 sum(1 for row in rows if not row[6])),
+            )
+            shipment_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO results (shipment_id, validated_on, kind, batch_no, ref_code, field, expected, actual, matched, file)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(shipment_id, validated_on) + row for row in rows],
+            )
+            conn.executemany(
+                "INSERT INTO certificates (shipment_id, kind, file, batch_no, fields) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (shipment_id, kind, name, _text(str(fields.get("Batch No", "")).strip()), json.dumps(fields, default=str))
+                    for kind, name, fields in certificates
+                ],
+            )
+        return shipment_id
+
+    def query(self, batch_no=None, ref_code=None, field=None, date_from=None, date_to=None, failed_only=False, limit=1000):
+        """
+        Returns matching field checks, newest first, as a DataFrame with
+        HISTORY_COLUMNS. Dates are "YYYY-MM-DD" strings (inclusive).
+        """
+        where, params = [], []
+        for column, value in (("batch_no", batch_no), ("ref_code", ref_code), ("field", field)):
+            if value:
+                where.append(f"{column} = ?")
+                params.append(str(value).strip())
+        if date_from:
+            where.append("validated_on >= ?")
+            params.append(str(date_from))
+        if date_to:
+            where.append("validated_on <= ?")
+            params.append(str(date_to))
+        if failed_only:
+            where.append("matched = 0")
+        sql = (
+            "SELECT validated_on, kind, batch_no, ref_code, field, expected, actual,"
+            " CASE matched WHEN 1 THEN '✅' ELSE '❌' END, file, shipment_id FROM results"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + " ORDER BY shipment_id DESC, rowid LIMIT ?"
+        )
+        params.append(int(limit))
+        with self._connect() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        return pd.DataFrame(rows, columns=HISTORY_COLUMNS)
+
+    def batch_summary(self, batch_no):
+        """Counts of shipments, checks and failed checks recorded for a batch number."""
+        with self._connect() as conn:
+            shipments, checks, failures = conn.execute(
+                "SELECT COUNT(DISTINCT shipment_id), COUNT(*), COALESCE(SUM(matched = 0), 0) FROM results WHERE batch_no = ?",
+                (str(batch_no).strip(),),
+            ).fetchone()
+        return {"shipments": shipments, "checks": checks, "failures": failures}
+
+    def certificates(self, batch_no):
+        """Parsed certificate fields recorded for a batch number, newest first."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT shipment_id, kind, file, fields FROM certificates WHERE batch_no = ? ORDER BY shipment_id DESC",
+                (str(batch_no).strip(),),
+            ).fetchall()
+        return [{"shipment": shipment_id, "kind": kind, "file": name, "fields": json.loads(fields)} for shipment_id, kind, name, fields in rows]
+
+    def expected_values(self, fields):
+        """(ref code, field, packing-list value) of the recorded COA checks of `fields`, newest shipment first."""
+        placeholders = ", ".join("?" * len(fields))
+        with self._connect() as conn:
+            return conn.execute(
+                f"SELECT ref_code, field, expected FROM results WHERE kind = 'COA' AND field IN ({placeholders})"
+                " AND ref_code IS NOT NULL ORDER BY shipment_id DESC",
+                list(fields),
+            ).fetchall()
+
+    def fields(self):
+        with self._connect() as conn:
+            return [row[0] for row in conn.execute("SELECT DISTINCT field FROM results ORDER BY field")]
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_history_store() -> HistoryStore:
+    """Process-wide history store at MARFLOW_HISTORY_DB (default ~/.cache/marflowqt/history.sqlite3)."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = HistoryStore(os.environ.get("MARFLOW_HISTORY_DB") or DEFAULT_HISTORY_PATH)
+        return _default_store
@@ -0,0 +1,271 @@
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from parse_cache import as_named_stream, file_name, read_file_bytes
+
+DEFAULT_JOB_DIR = os.path.join(os.path.expanduser("~"), ".cache", "marflowqt", "jobs")
+DEFAULT_JOB_WORKERS = 1
+# Finished jobs (and their stored results) are deleted after this many seconds.
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+# Progress stages in the order a shipment job runs them.
+STAGES = ("coa", "sc", "validate", "report")
+STAGE_LABELS = {"coa": "COAs parsed", "sc": "SCs parsed", "validate": "Validated", "report": "Report built"}
+FINISHED = ("done", "failed")
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    progress TEXT NOT NULL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS job_results (
+    job_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value BLOB NOT NULL,
+    PRIMARY KEY (job_id, name)
+);
+"""
+
+
+class JobStore:
+    """
+    Job records, per-stage progress and results in a SQLite file under `directory`.
+
+    Each call opens its own short-lived connection, so the store can be shared by
+    the worker threads and every Streamlit session. Job inputs are pickled next to
+    the database until the job finishes, so interrupted jobs can be resumed.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "jobs.sqlite3")
+        with self._connect() as conn:
+            # WAL lets polling pages read while a worker is writing progress.
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _inputs_path(self, job_id):
+        return os.path.join(self.directory, f"{job_id}.inputs.pkl")
+
+    def create(self, inputs):
+        """Stores the inputs of a new queued job and returns its ID."""
+        job_id = uuid.uuid4().hex[:12]
+        with open(self._inputs_path(job_id), "wb") as fh:
+            pickle.dump(inputs, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        now = time.time()
+        progress = {stage: {"done": 0, "total": 0} for stage in STAGES}
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, created, updated, progress) VALUES (?, 'queued', ?, ?, ?)",
+                (job_id, now, now, json.dumps(progress)),
+            )
+        return job_id
+
+    def inputs(self, job_id):
+        with open(self._inputs_path(job_id), "rb") as fh:
+            return pickle.load(fh)
+
+    def set_status(self, job_id, status, error=None):
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, error = ?, updated = ? WHERE id = ?", (status, error, time.time(), job_id))
+        if status in FINISHED:
+            try:
+                os.remove(self._inputs_path(job_id))
+            except OSError:
+                pass
+
+    def set_progress(self, job_id, stage, done, total):
+        with self._connect() as conn:
+            row = conn.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+            progress = json.loads(row["progress"])
+            progress[stage] = {"done": done, "total": total}
+            conn.execute("UPDATE jobs SET progress = ?, updated = ? WHERE id = ?", (json.dumps(progress), time.time(), job_id))
+
+    def put_result(self, job_id, name, value):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_results (job_id, name, value) VALUES (?, ?, ?)",
+                (job_id, name, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)),
+            )
+
+    def get(self, job_id):
+        """Returns the job as a dict ("id", "status", "progress", "error", ...), or None."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"])
+        return job
+
+    def results(self, job_id):
+        """Returns every result stored so far for the job, by name."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT name, value FROM job_results WHERE job_id = ?", (job_id,)).fetchall()
+        return {row["name"]: pickle.loads(row["value"]) for row in rows}
+
+    def unfinished(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created").fetchall()
+        return [row["id"] for row in rows]
+
+    def purge(self, max_age=DEFAULT_MAX_AGE):
+        """Deletes finished jobs last updated more than `max_age` seconds ago."""
+        cutoff = time.time() - max_age
+        with self._connect() as conn:
+            ids = [row["id"] for row in conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('done', 'failed') AND updated < ?", (cutoff,))]
+            conn.executemany("DELETE FROM job_results WHERE job_id = ?", [(job_id,) for job_id in ids])
+            conn.executemany("DELETE FROM jobs WHERE id = ?", [(job_id,) for job_id in ids])
+        return len(ids)
+
+
+def run_shipment_job(store, job_id):
+    """
+    Parses and validates one shipment, storing each table as soon as it is ready
+    so a polling page can show partial results.
+    """
+    # Imported here so the queue module stays light for pages that only poll it.
+    from batch_parser import parse_coa_batch, parse_sc_batch
+    from history_store import get_history_store
+    from packaging_list_parser import parse_packaging_list
+    from product_master import get_product_master
+    from report_export import report_signature
+    from shipment import build_client_report, build_coa_table, build_sc_table, count_mismatches
+
+    inputs = store.inputs(job_id)
+    store.set_status(job_id, "running")
+
+    def progress(stage):
+        return lambda done, total, result: store.set_progress(job_id, stage, done, total)
+
+    name, data = inputs["packing_list"]
+    df, packing_list = parse_packaging_list(as_named_stream(data, name))
+    if df is None:
+        store.set_status(job_id, "failed", f"Could not parse packing list `{name}`")
+        return
+
+    products = get_product_master()
+    products.learn(packing_list, source=name)
+
+    coa_files = [as_named_stream(data, name) for name, data in inputs["coa"]]
+    sc_files = [as_named_stream(data, name) for name, data in inputs["sc"]]
+    store.set_progress(job_id, "coa", 0, len(coa_files))
+    store.set_progress(job_id, "sc", 0, len(sc_files))
+    store.set_progress(job_id, "validate", 0, 2)
+
+    parsed_coas = parse_coa_batch(coa_files, progress=progress("coa")) if coa_files else []
+    final_coa_table = build_coa_table(parsed_coas, packing_list, products)
+    store.put_result(job_id, "coa_table", final_coa_table)
+    store.set_progress(job_id, "validate", 1, 2)
+
+    parsed_scs = parse_sc_batch(sc_files, progress=progress("sc")) if sc_files else []
+    combined_validation = build_sc_table(parsed_scs, packing_list, products)
+    store.put_result(job_id, "sc_table", combined_validation)
+    store.set_progress(job_id, "validate", 2, 2)
+    store.put_result(job_id, "errors", [parsed["error"] for parsed in parsed_coas + parsed_scs if not parsed["data"]])
+
+    store.set_progress(job_id, "report", 0, 1)
+    store.put_result(job_id, "client_report", build_client_report(final_coa_table, combined_validation, packing_list))
+    store.put_result(job_id, "mismatches", count_mismatches(final_coa_table, combined_validation))
+    get_history_store().record_shipment(
+        packing_list,
+        final_coa_table,
+        combined_validation,
+        certificates=[("COA", parsed["name"], parsed["data"]) for parsed in parsed_coas if parsed["data"]]
+        + [("SC", parsed["name"], page) for parsed in parsed_scs if parsed["data"] for page in parsed["data"]],
+        packing_list_name=name,
+        signature=repr(report_signature(final_coa_table, combined_validation)),
+    )
+    store.set_progress(job_id, "report", 1, 1)
+    store.set_status(job_id, "done")
+
+
+class JobRunner:
+    """
+    Runs shipment jobs on a small thread pool. Parsing inside a job still fans out
+    to the shared parser process pool; the threads only keep jobs off the
+    Streamlit script thread, so a page can be refreshed or closed while they run.
+    """
+
+    def __init__(self, store, max_workers=DEFAULT_JOB_WORKERS):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="marflow-job")
+
+    def submit(self, packing_list_file, coa_files, sc_files):
+        """Queues a validation of uploaded files and returns the job ID."""
+        inputs = {
+            "packing_list": (file_name(packing_list_file), read_file_bytes(packing_list_file)),
+            "coa": [(file_name(f), read_file_bytes(f)) for f in coa_files],
+            "sc": [(file_name(f), read_file_bytes(f)) for f in sc_files],
+        }
+        job_id = self.store.create(inputs)
+        self._executor.submit(self._run, job_id)
+        return job_id
+
+    def resume(self):
+        """Requeues jobs left queued or running by a previous server process."""
+        job_ids = self.store.unfinished()
+        for job_id in job_ids:
+            self._executor.submit(self._run, job_id)
+        return job_ids
+
+    def _run(self, job_id):
+        try:
+            run_shipment_job(self.store, job_id)
+        except Exception as e:
+            logger.exception("❌ Job %s failed: %s", job_id, e)
+            self.store.set_status(job_id, "failed", str(e))
+
+
+_default_runner = None
+_default_lock = threading.Lock()
+
+
+def get_runner() -> JobRunner:
+    """
+    Process-wide runner shared by every Streamlit session. Jobs are stored in
+    MARFLOW_JOB_DIR (default ~/.cache/marflowqt/jobs) and run MARFLOW_JOB_WORKERS
+    at a time. Unfinished jobs from an earlier run are resumed on first use.
+    """
+    global _default_runner
+    with _default_lock:
+        if _default_runner is None:
+            store = JobStore(os.environ.get("MARFLOW_JOB_DIR") or DEFAULT_JOB_DIR)
+            store.purge()
+            workers = os.environ.get("MARFLOW_JOB_WORKERS")
+            try:
+                workers = max(1, int(workers)) if workers else DEFAULT_JOB_WORKERS
+            except ValueError:
+                logger.warning("⚠️ Ignoring invalid MARFLOW_JOB_WORKERS=%r", workers)
+                workers = DEFAULT_JOB_WORKERS
+            _default_runner = JobRunner(store, max_workers=workers)
+            _default_runner.resume()
+        return _default_runner
@@ -1,56 +1,210 @@
 import pandas as pd
 import re
 from datetime import datetime
+from date_normalization import normalize_date as shared_normalize_date, normalize_dates
+from packing_list_index import PackingListIndex
+from product_master import catalog_value, fill_from_catalog
+from product_matching import description_score
+import timing
 
 #we have to give importance to the refernce code as ell for the size because th e size is dependent heavily on the reference codew ,
 #reference code is unique for evvery products so even if we are hard coding the logic for sizes and product name it wont be a atter
-def validate_against_packaging_list(coa_data: dict, packing_list_df: pd.DataFrame) -> pd.DataFrame:
+def validate_against_packaging_list(coa_data: dict, packing_list, threshold=None, products=None) -> pd.DataFrame:
     """
     Returns detailed validation of COA vs. Packing List for each field.
+    `packing_list` is a PackingListIndex (or an extracted-items DataFrame).
+    The description is matched by token-set score (see product_matching) against
+    `threshold`, and the score is reported in the "Score" column. With a
+    `products` ProductMaster, a description or size missing from the packing
+    list is checked against the product of the row's ref code instead.
     """
+    catalog = products.lookup() if products is not None else None
     batch_no = str(coa_data.get("Batch No", "")).strip()
-    matches = packing_list_df[packing_list_df["Batch No"].astype(str).str.strip() == batch_no]
+    matches = PackingListIndex.from_any(packing_list).rows_for_batch(batch_no)
 
-    if matches.empty:
+    if not matches:
         return pd.DataFrame([{
             "Batch No": batch_no,
             "Field": "Batch No",
             "Expected Value": "Not found",
             "COA Value": batch_no,
-            "Match": "❌"
+            "Match": "❌",
+            "Score": ""
         }])
 
     result_rows = []
-    for _, row in matches.iterrows():
+    for row in matches:
+        ref_code = row.get("Ref Code", "")
         checks = [
-            ("Description", row.get("Description", ""), coa_data.get("Product Name", "")),
-            ("Size", row.get("Size", ""), coa_data.get("Product Size", "")),
+            ("Description", catalog_value(row.get("Description", ""), ref_code, catalog, "description"), coa_data.get("Product Name", "")),
+            ("Size", catalog_value(row.get("Size", ""), ref_code, catalog, "size"), coa_data.get("Product Size", "")),
             ("MFG Date", normalize_date(row.get("MFG Date", "")), normalize_date(coa_data.get("Mfg. Date", ""))),
             ("EXP Date", normalize_date(row.get("EXP Date", "")), normalize_date(coa_data.get("Exp. Date", ""))),
             ("Quantity", str(row.get("Qty", row.get("Quantity", ""))).replace(",", ""), str(coa_data.get("Quantity Released") or coa_data.get("Shipping Qty") or "").replace(",", ""))
         ]
 
         for field, expected, actual in checks:
-            if field == "Size":
-                expected_norm = normalize_size(expected)
-                actual_norm = normalize_size(actual)
+            score = ""
+            if field == "Description":
+                score, matched = description_score(expected, actual, threshold)
+                score = round(score, 2)
+            elif field == "Size":
+                matched = normalize_size(expected) == normalize_size(actual)
             else:
-                expected_norm = str(expected).strip().lower()
-                actual_norm = str(actual).strip().lower()
+                matched = str(expected).strip().lower() == str(actual).strip().lower()
 
-            match = "✅" if expected_norm == actual_norm else "❌"
+            match = "✅" if matched else "❌"
 
             result_rows.append({
                 "Batch No": batch_no,
                 "Field": field,
                 "Expected Value": expected,
                 "COA Value": actual,
-                "Match": match
+                "Match": match,
+                "Score": score
             })
 
     return pd.DataFrame(result_rows)
 
 
+COA_RESULT_COLUMNS = ["Batch No", "Field", "Expected Value", "COA Value", "Match", "Score"]
+
+
+def normalize_column(series: pd.Series, normalize) -> pd.Series:
+    """Applies a scalar normalizer once per distinct value of the column."""
+    cache = {}
+    values = []
+    for value in series:
+        try:
+            values.append(cache[value])
+        except KeyError:
+            values.append(cache.setdefault(value, normalize(value)))
+        except TypeError:
+            values.append(normalize(value))
+    return pd.Series(values, index=series.index, dtype=object)
+
+
+def packing_column(df: pd.DataFrame, name, default=""):
+    """Returns a packing-list column, or a column of `default` if the sheet lacks it."""
+    if name in df.columns:
+        return df[name]
+    return pd.Series([default] * len(df), index=df.index, dtype=object)
+
+
+def merge_with_packing_list(certificates: pd.DataFrame, packing_list, columns: dict) -> pd.DataFrame:
+    """
+    Left-joins certificates (with a normalized "_key" batch column and an "_order"
+    column) to the packing list. Each certificate gets one row per packing-list
+    row with the same batch number, in packing-list order; certificates without a
+    match keep a single row with "_row" set to -1.
+    """
+    index = PackingListIndex.from_any(packing_list)
+    packing = pd.DataFrame({"_key": index.batch_keys, "_row": range(len(index))})
+    for target, (source, default) in columns.items():
+        packing[target] = packing_column(index.df, source, default).to_numpy(dtype=object)
+    merged = certificates.merge(packing, how="left", on="_key")
+    merged["_row"] = merged["_row"].fillna(-1).astype(int)
+    return merged.sort_values(["_order", "_row"], kind="stable")
+
+
+def _lowered(series: pd.Series) -> pd.Series:
+    return series.map(str).str.strip().str.lower()
+
+
+@timing.timed("validate.coa")
+def validate_coa_batch(coa_records, packing_list, file_names=None, threshold=None, products=None) -> pd.DataFrame:
+    """
+    Validates every parsed COA against the packing list in one pass.
+
+    Joins all COAs to the packing list on the normalized batch number and compares
+    each field column-wise. The result matches concatenating
+    `validate_against_packaging_list` over the records, plus a "COA File" column
+    when `file_names` is given. `threshold` is the description-score threshold
+    and `products` an optional ProductMaster, as in `validate_against_packaging_list`.
+    """
+    coa_records = list(coa_records)
+    columns = COA_RESULT_COLUMNS + (["COA File"] if file_names is not None else [])
+    if not coa_records:
+        return pd.DataFrame(columns=columns)
+
+    coas = pd.DataFrame({
+        "_order": range(len(coa_records)),
+        "Batch No": [str(coa.get("Batch No", "")).strip() for coa in coa_records],
+        "Product Name": pd.Series([coa.get("Product Name", "") for coa in coa_records], dtype=object),
+        "Product Size": pd.Series([coa.get("Product Size", "") for coa in coa_records], dtype=object),
+        "Mfg. Date": pd.Series([coa.get("Mfg. Date", "") for coa in coa_records], dtype=object),
+        "Exp. Date": pd.Series([coa.get("Exp. Date", "") for coa in coa_records], dtype=object),
+        "Quantity": [str(coa.get("Quantity Released") or coa.get("Shipping Qty") or "").replace(",", "") for coa in coa_records],
+    })
+    coas["_key"] = coas["Batch No"]
+
+    index = PackingListIndex.from_any(packing_list)
+    qty_source = "Qty" if "Qty" in index.df.columns else "Quantity"
+    merged = merge_with_packing_list(coas, index, {
+        "_description": ("Description", ""),
+        "_size": ("Size", ""),
+        "_mfg": ("MFG Date", ""),
+        "_exp": ("EXP Date", ""),
+        "_qty": (qty_source, ""),
+        "_ref": ("Ref Code", ""),
+    })
+    found = merged[merged["_row"] >= 0]
+    missing = merged[merged["_row"] < 0]
+
+    mfg_expected = normalize_dates(found["_mfg"], precision="day")
+    mfg_actual = normalize_dates(found["Mfg. Date"], precision="day")
+    exp_expected = normalize_dates(found["_exp"], precision="day")
+    exp_actual = normalize_dates(found["Exp. Date"], precision="day")
+    qty_expected = found["_qty"].map(str).str.replace(",", "", regex=False)
+
+    catalog = products.lookup() if products is not None else None
+    descriptions = fill_from_catalog(found["_description"], found["_ref"], catalog, "description")
+    sizes = fill_from_catalog(found["_size"], found["_ref"], catalog, "size")
+
+    # Descriptions are scored against the packing list's precomputed token sets.
+    scores, described = index.description_index().score_rows(found["_row"], found["Product Name"], threshold, descriptions)
+    described = pd.Series(described, index=found.index)
+    no_score = pd.Series("", index=found.index, dtype=object)
+
+    # (field, expected, actual, matched, score)
+    checks = [
+        ("Description", descriptions, found["Product Name"], described, pd.Series(scores, index=found.index, dtype=object)),
+        ("Size", sizes, found["Product Size"], normalize_column(sizes, normalize_size) == normalize_column(found["Product Size"], normalize_size), no_score),
+        ("MFG Date", mfg_expected, mfg_actual, _lowered(mfg_expected) == _lowered(mfg_actual), no_score),
+        ("EXP Date", exp_expected, exp_actual, _lowered(exp_expected) == _lowered(exp_actual), no_score),
+        ("Quantity", qty_expected, found["Quantity"], _lowered(qty_expected) == _lowered(found["Quantity"]), no_score),
+    ]
+
+    frames = [pd.DataFrame({
+        "_order": missing["_order"],
+        "_row": missing["_row"],
+        "_field": 0,
+        "Batch No": missing["Batch No"],
+        "Field": "Batch No",
+        "Expected Value": "Not found",
+        "COA Value": missing["Batch No"],
+        "Match": "❌",
+        "Score": "",
+    })]
+    for position, (field, expected, actual, matched, score) in enumerate(checks):
+        frames.append(pd.DataFrame({
+            "_order": found["_order"],
+            "_row": found["_row"],
+            "_field": position,
+            "Batch No": found["Batch No"],
+            "Field": field,
+            "Expected Value": expected.astype(object),
+            "COA Value": actual.astype(object),
+            "Match": matched.map({True: "✅", False: "❌"}),
+            "Score": score,
+        }))
+
+    result = pd.concat(frames, ignore_index=True).sort_values(["_order", "_row", "_field"], kind="stable")
+    if file_names is not None:
+        result["COA File"] = [file_names[i] for i in result["_order"]]
+    return result[columns].reset_index(drop=True)
+
+
 def compare(val1, val2):
     return "✅" if str(val1).strip().lower() == str(val2).strip().lower() else "❌"
 
@@ -58,23 +212,7 @@ def normalize_date(date_str):
     """
     Flexible date normalization: turns most human/short dates into YYYY-MM-DD or YYYY-MM, else returns as-is.
     """
-    date_str = str(date_str).strip()
-    if not date_str:
-        return ""
-    try:
-        # Try to parse month/year, day optional
-        dt = pd.to_datetime(date_str, errors='coerce')
-        if pd.isna(dt):
-            match = re.match(r"([A-Za-z]{3})[-\s,]?(\d{4})", date_str)
-            if match:
-                month = match.group(1).title()
-                year = match.group(2)
-                return f"{year}-{month}"
-            else:
-                return date_str
-        return dt.strftime("%Y-%m-%d")
-    except:
-        return date_str
+    return shared_normalize_date(date_str, precision="day")
 
 def normalize_size(size_str):
     """Standardizes size format to reduce case/spelling mismatches."""
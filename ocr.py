@@ -0,0 +1,167 @@
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pymupdf
+
+import timing
+from parse_cache import ParseCache
+
+DEFAULT_OCR_DPI = 300
+DEFAULT_OCR_LANG = "eng"
+DEFAULT_OCR_WORKERS = 1
+DEFAULT_OCR_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "marflowqt", "ocr")
+# Bump whenever the OCR text changes (rendering, Tesseract options) so cached pages are redone.
+OCR_VERSION = "1"
+
+logger = logging.getLogger(__name__)
+
+_warned = False
+_available = None
+_cache = None
+_pool = None
+_lock = threading.Lock()
+
+
+def enabled():
+    """True when MARFLOW_OCR is set to 1 / true / on (OCR is opt-in)."""
+    return os.environ.get("MARFLOW_OCR", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+def version_suffix():
+    """
+    Added to the parsers' PARSER_VERSION, so results parsed with OCR are cached
+    apart. Only when Tesseract is actually available: a file parsed while it was
+    missing is cached as a plain parse and is parsed again once it is installed.
+    """
+    return f"-ocr{OCR_VERSION}" if enabled() and available() else ""
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    try:
+        return max(1, int(value)) if value else default
+    except ValueError:
+        logger.warning("⚠️ Ignoring invalid %s=%r", name, value)
+        return default
+
+
+def available():
+    """
+    Whether pytesseract and the tesseract binary can be used. Checked once; a
+    missing install is logged once and the pages are left without text.
+    """
+    global _available, _warned
+    if _available is None:
+        try:
+            import pytesseract
+
+            pytesseract.get_tesseract_version()
+            _available = True
+        except Exception as e:
+            _available = False
+            if not _warned:
+                _warned = True
+                logger.warning("⚠️ OCR is on but Tesseract is not available (%s); scanned pages stay empty", e)
+    return _available
+
+
+def get_cache():
+    """
+    Per-page OCR text in MARFLOW_OCR_CACHE_DIR (default ~/.cache/marflowqt/ocr; an
+    empty string keeps it in memory only). Each worker process has its own memory
+    layer; the disk layer is shared.
+    """
+    global _cache
+    with _lock:
+        if _cache is None:
+            disk_dir = os.environ.get("MARFLOW_OCR_CACHE_DIR", DEFAULT_OCR_CACHE_DIR)
+            _cache = ParseCache(disk_dir=disk_dir or None)
+        return _cache
+
+
+def is_scanned(data):
+    """
+    True if a PDF has a page with images but no fonts, i.e. no text layer.
+    Only page resources are read, not page content, so the check is cheap.
+    """
+    try:
+        with pymupdf.open(stream=data, filetype="pdf") as doc:
+            return any(page.get_images() and not page.get_fonts() for page in doc)
+    except Exception:
+        return False
+
+
+def page_hash(doc, page, dpi, lang):
+    """
+    Identifies a page's rendering: its content stream, the raw bytes of its
+    images, rotation and size, plus the OCR settings. The same scan in another
+    file (or an unchanged page of a re-sent file) gets the same hash.
+    """
+    digest = hashlib.sha256(f"{OCR_VERSION}:{dpi}:{lang}:{page.rotation}:{tuple(page.rect)}".encode("utf-8"))
+    digest.update(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
+
+
+def ocr_page(page, dpi, lang):
+    """Renders a PyMuPDF page in grayscale and returns Tesseract's text, one line per text line."""
+    import pytesseract
+    from PIL import Image
+
+    pixmap = page.get_pixmap(dpi=dpi, colorspace=pymupdf.csGRAY)
+    image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples)
+    text = pytesseract.image_to_string(image, lang=lang)
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+def page_text(doc, number):
+    """
+    OCR text of page `number` of an open PyMuPDF document, from the cache when the
+    same page was read before. Returns "" when Tesseract is not available.
+    """
+    if not available():
+        return ""
+    dpi = _env_int("MARFLOW_OCR_DPI", DEFAULT_OCR_DPI)
+    lang = os.environ.get("MARFLOW_OCR_LANG") or DEFAULT_OCR_LANG
+    page = doc[number]
+    if not page.get_images():
+        # Blank, not scanned.
+        return ""
+    cache = get_cache()
+    key = page_hash(doc, page, dpi, lang)
+    found, text = cache.get(key)
+    if not found:
+        with timing.span("pdf.ocr", page=number):
+            text = ocr_page(page, dpi, lang)
+        cache.put(key, text)
+    return text
+
+
+def get_pool():
+    """
+    Worker pool for scanned documents, separate from the parser pool so OCR never
+    holds up text-native files. MARFLOW_OCR_WORKERS (default 1) processes, as
+    Tesseract is CPU-heavy.
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=_env_int("MARFLOW_OCR_WORKERS", DEFAULT_OCR_WORKERS),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def shutdown_pool(pool=None):
+    """Stops the OCR pool, or with `pool` only if it is still the current one."""
+    global _pool
+    with _lock:
+        if _pool is not None and (pool is None or _pool is pool):
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -1,22 +1,38 @@
+import logging
 import pandas as pd
 import re
 import zipfile
-import tempfile
+from math import nan as NaN
 from io import BytesIO
+from openpyxl import load_workbook
+from packing_list_index import PackingListIndex
+import timing
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever extraction output changes so cached parse results are invalidated.
+PARSER_VERSION = "4"
 
 def strip_styles_from_excel(uploaded_file):
     """
     Removes styles.xml from the uploaded Excel file (to fix formatting issues).
-    Returns path to a clean temporary Excel file.
+    Returns the clean workbook as an in-memory file; nothing is written to disk.
+    The other members are stored uncompressed, so they are inflated once but
+    never deflated again.
     """
-    in_memory = BytesIO(uploaded_file.getvalue())
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx") as tmp:
-        with zipfile.ZipFile(in_memory) as zin:
-            with zipfile.ZipFile(tmp.name, "w") as zout:
-                for item in zin.infolist():
-                    if item.filename != "xl/styles.xml":
-                        zout.writestr(item, zin.read(item.filename))
-        return tmp.name
+    data = uploaded_file.getvalue() if hasattr(uploaded_file, "getvalue") else uploaded_file.read()
+    clean = BytesIO()
+    with zipfile.ZipFile(BytesIO(data)) as zin:
+        if "xl/styles.xml" not in zin.namelist():
+            return BytesIO(data)
+        with zipfile.ZipFile(clean, "w", compression=zipfile.ZIP_STORED) as zout:
+            for item in zin.infolist():
+                if item.filename != "xl/styles.xml":
+                    member = zipfile.ZipInfo(item.filename, item.date_time)
+                    member.external_attr = item.external_attr
+                    zout.writestr(member, zin.read(item.filename))
+    clean.seek(0)
+    return clean
 
 
 def extract_normalized_size(desc):
@@ -51,47 +67,164 @@ def extract_normalized_size(desc):
 
     return " x ".join(size_parts) if size_parts else "N/A"
 
+
+# Precompiled forms of the extract_normalized_size / description-cleaning patterns,
+# applied to whole columns at once.
+_CH_SIZE = re.compile(r"\bCH\s*(\d+(?:\.\d+)?)(?:\s*[-–TO/]+\s*CH?\s*(\d+(?:\.\d+)?))?\b")
+_CM_SIZE = re.compile(r"(\d+(?:\.\d+)?\s*CM)")
+_GAUGE_SIZE = re.compile(r"(\d+(?:\.\d+)?\s*G)")
+_DESC_CH = re.compile(r"\bCH\s*\d+.*?(?=[,\s]|$)", re.IGNORECASE)
+_DESC_CM = re.compile(r"\d+\s*CM", re.IGNORECASE)
+_DESC_GAUGE = re.compile(r"\d+\s*G", re.IGNORECASE)
+_DESC_SIGNS = re.compile(r"[-+]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _as_text(series):
+    # str() per value (NaN -> "nan" as before); object dtype keeps .str on Python's re.
+    return pd.Series([str(value) for value in series], index=series.index, dtype=object)
+
+
+def _join_size_parts(left, right):
+    both = left.notna() & right.notna()
+    joined = left.where(left.notna(), right)
+    joined[both] = left[both] + " x " + right[both]
+    return joined
+
+
+def _on_unique(series, transform):
+    # Packing lists repeat the same description across batches, so each distinct
+    # text is transformed once and the results are broadcast back.
+    codes, uniques = pd.factorize(series)
+    result = transform(pd.Series(uniques, dtype=object)).to_numpy(dtype=object)
+    return pd.Series(result[codes], index=series.index, dtype=object)
+
+
+def normalize_sizes(descriptions):
+    """Vectorized `extract_normalized_size` over a column of descriptions."""
+    return _on_unique(_as_text(descriptions), _normalize_sizes)
+
+
+def strip_size_from_descriptions(descriptions):
+    """Vectorized removal of the CH / cm / gauge size parts from descriptions."""
+    return _on_unique(_as_text(descriptions), _strip_size_parts)
+
+
+def _normalize_sizes(desc):
+    desc = desc.str.upper().str.replace("\n", " ", regex=False).str.replace("\r", " ", regex=False).str.strip()
+
+    ch = desc.str.extract(_CH_SIZE)
+    ch_clean = ("CH" + ch[0]).where(ch[1].isna(), "CH" + ch[0] + "-" + ch[1])
+    cm_clean = desc.str.extract(_CM_SIZE)[0].str.replace(" ", "", regex=False)
+    g_clean = desc.str.extract(_GAUGE_SIZE)[0].str.replace(" ", "", regex=False)
+
+    sizes = _join_size_parts(_join_size_parts(g_clean.astype(object), ch_clean.astype(object)), cm_clean.astype(object))
+    return sizes.where(sizes.notna(), "N/A").astype(object)
+
+
+def _strip_size_parts(cleaned):
+    for pattern in (_DESC_CH, _DESC_CM, _DESC_GAUGE, _DESC_SIGNS):
+        cleaned = cleaned.str.replace(pattern, "", regex=True)
+    return cleaned.str.replace(_WHITESPACE, " ", regex=True).str.strip(" ,")
+
+
+PACKING_LIST_SHEET = "PACKING LIST"
+
+# Columns read from the PACKING LIST sheet; the header row is located by these names.
+PACKING_LIST_COLUMNS = [
+    "Sl. No. of Item",
+    "Description of Goods",
+    "Ref. code",
+    "Qty          (In Nos)",
+    "BATCH NO",
+    "MFG DATE",
+    "EXP DATE",
+]
+HEADER_SCAN_ROWS = 200
+
+
+def _header_key(value):
+    return " ".join(str(value).split()).lower()
+
+
+def _cell_value(value):
+    # Match pd.read_excel: empty cells are NaN and integral floats become ints.
+    if value is None:
+        return NaN
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def iter_packing_list_rows(clean_file, sheet_name=PACKING_LIST_SHEET):
+    """
+    Streams the item rows of the packing-list sheet with openpyxl's read-only,
+    values-only reader. The header row is found by its column names (whitespace
+    and case are ignored) within the first HEADER_SCAN_ROWS rows. Yields one dict
+    per row that has a "Sl. No. of Item", holding only PACKING_LIST_COLUMNS.
+    """
+    wb = load_workbook(clean_file, read_only=True, data_only=True)
+    try:
+        rows = wb[sheet_name].iter_rows(values_only=True)
+        wanted = {_header_key(name): name for name in PACKING_LIST_COLUMNS}
+        positions = None
+        for row_no, row in enumerate(rows):
+            found = {}
+            for position, value in enumerate(row):
+                name = wanted.get(_header_key(value)) if value is not None else None
+                if name and name not in found:
+                    found[name] = position
+            if "Sl. No. of Item" in found and "Description of Goods" in found:
+                positions = found
+                break
+            if row_no >= HEADER_SCAN_ROWS:
+                break
+        if positions is None:
+            raise ValueError(f"No header row with 'Sl. No. of Item' and 'Description of Goods' in sheet '{sheet_name}'")
+
+        serial_position = positions["Sl. No. of Item"]
+        for row in rows:
+            if serial_position >= len(row) or row[serial_position] is None:
+                continue
+            yield {name: _cell_value(row[position]) if position < len(row) else NaN for name, position in positions.items()}
+    finally:
+        wb.close()
+
+
+@timing.timed("parse.packing_list")
 def parse_packaging_list(uploaded_file):
+    """
+    Returns the packing-list item rows (only the columns we use) and a
+    PackingListIndex of the extracted items.
+    """
     try:
-        clean_file_path = strip_styles_from_excel(uploaded_file)
-
-        df_raw = pd.read_excel(clean_file_path, 
-                               engine="openpyxl", 
-                               sheet_name="PACKING LIST", 
-                               header=None)
-
-        header_row = 21
-        columns = df_raw.iloc[header_row].fillna("").astype(str).str.strip().tolist()
-        df_data = df_raw.iloc[header_row + 1:].copy()
-        df_data.columns = columns
-        df_data = df_data.reset_index(drop=True)
-        df_data = df_data[df_data["Sl. No. of Item"].notna()]
-
-        extracted = []
-        for idx, row in df_data.iterrows():
-            full_desc = str(row.get("Description of Goods", "")).strip()
-            normalized_size = extract_normalized_size(full_desc)
-
-            # Remove size parts from the description
-            cleaned_desc = re.sub(r"\bCH\s*\d+.*?(?=[,\s]|$)", "", full_desc, flags=re.IGNORECASE)
-            cleaned_desc = re.sub(r"\d+\s*CM", "", cleaned_desc, flags=re.IGNORECASE)
-            cleaned_desc = re.sub(r"\d+\s*G", "", cleaned_desc, flags=re.IGNORECASE)
-            cleaned_desc = re.sub(r"[-+]", "", cleaned_desc)
-            cleaned_desc = re.sub(r"\s+", " ", cleaned_desc).strip(" ,")
-
-            extracted.append({
-                "Sr. No.": int(row.get("Sl. No. of Item")),
-                "Description": cleaned_desc,
-                "Size": normalized_size,
-                "Ref Code": str(row.get("Ref. code", "")).strip(),
-                "Qty": row.get("Qty          (In Nos)", ""),
-                "Batch No": str(row.get("BATCH NO", "")).strip(),
-                "MFG Date": str(row.get("MFG DATE", "")).strip(),  
-                "EXP Date": str(row.get("EXP DATE", "")).strip()   
-            })
-
-        return df_data, pd.DataFrame(extracted)
+        clean_file = strip_styles_from_excel(uploaded_file)
+        # Stream straight into one list per column rather than keeping row objects.
+        columns = {}
+        for row in iter_packing_list_rows(clean_file):
+            for name, value in row.items():
+                columns.setdefault(name, []).append(value)
+        df_data = pd.DataFrame(columns, columns=list(columns) or PACKING_LIST_COLUMNS, dtype=object)
+
+        def column(name, default=""):
+            if name in df_data.columns:
+                return df_data[name]
+            return pd.Series([default] * len(df_data), index=df_data.index, dtype=object)
+
+        full_desc = _as_text(column("Description of Goods")).str.strip()
+        extracted = pd.DataFrame({
+            "Sr. No.": [int(value) for value in column("Sl. No. of Item")],
+            "Description": strip_size_from_descriptions(full_desc).tolist(),
+            "Size": normalize_sizes(full_desc).tolist(),
+            "Ref Code": _as_text(column("Ref. code")).str.strip().tolist(),
+            "Qty": column("Qty          (In Nos)").tolist(),
+            "Batch No": _as_text(column("BATCH NO")).str.strip().tolist(),
+            "MFG Date": _as_text(column("MFG DATE")).str.strip().tolist(),
+            "EXP Date": _as_text(column("EXP DATE")).str.strip().tolist(),
+        })
+
+        return df_data, PackingListIndex(extracted)
 
     except Exception as e:
-        print(f"❌ Packing List Parsing Failed: {e}")
+        logger.error("❌ Packing List Parsing Failed: %s", e)
         return None, None
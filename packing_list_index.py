@@ -0,0 +1,67 @@
+import pandas as pd
+
+from product_matching import DescriptionIndex
+
+
+def normalize_key(value):
+    """Normalizes a batch number or ref code the way the validators compare them."""
+    return str(value).strip()
+
+
+class PackingListIndex:
+    """
+    Extracted packing-list items with batch-number and ref-code indexes.
+
+    Keys are normalized once when the index is built, so validators can look up
+    the rows for a certificate in O(1) instead of scanning the whole table.
+    Duplicate batch numbers keep all of their rows, in packing-list order.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        self.df = df.reset_index(drop=True)
+        self.records = self.df.to_dict("records")
+        self.batch_keys = [normalize_key(record.get("Batch No", "")) for record in self.records]
+        self.batch_index = {}
+        self.ref_index = {}
+        for position, record in enumerate(self.records):
+            self.batch_index.setdefault(self.batch_keys[position], []).append(position)
+            self.ref_index.setdefault(normalize_key(record.get("Ref Code", "")), []).append(position)
+        self._ref_lookup = None
+        self._description_index = None
+
+    @classmethod
+    def from_any(cls, packing_list):
+        """Accepts an index or a plain extracted-items DataFrame."""
+        if isinstance(packing_list, cls):
+            return packing_list
+        return cls(packing_list)
+
+    def __len__(self):
+        return len(self.records)
+
+    def rows_for_batch(self, batch_no):
+        """Returns the packing-list rows (as dicts) for a batch number."""
+        return [self.records[i] for i in self.batch_index.get(normalize_key(batch_no), ())]
+
+    def rows_for_ref(self, ref_code):
+        """Returns the packing-list rows (as dicts) for a ref code."""
+        return [self.records[i] for i in self.ref_index.get(normalize_key(ref_code), ())]
+
+    def ref_lookup(self):
+        """Maps each batch number to its ref code (the last row wins on duplicates)."""
+        if self._ref_lookup is None:
+            self._ref_lookup = {record["Batch No"]: record["Ref Code"] for record in self.records}
+        return self._ref_lookup
+
+    def description_index(self):
+        """A DescriptionIndex of the "Description" column, built on first use."""
+        if self._description_index is None:
+            self._description_index = DescriptionIndex(record.get("Description", "") for record in self.records)
+        return self._description_index
+
+    def batch_signature(self, batch_nos):
+        """
+        A string that changes whenever any packing-list row for one of `batch_nos`
+        changes, so results validated against those rows can be reused until then.
+        """
+        return repr([self.rows_for_batch(batch_no) for batch_no in batch_nos])
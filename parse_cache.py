@@ -0,0 +1,207 @@
+import hashlib
+import inspect
+import logging
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_DISK_BYTES = 512 * 1024 * 1024
+DEFAULT_DISK_DIR = os.path.join(os.path.expanduser("~"), ".cache", "marflowqt", "parse")
+
+logger = logging.getLogger(__name__)
+
+
+def read_file_bytes(uploaded_file):
+    """
+    Returns the raw bytes of a Streamlit upload, an open file object or a path.
+    """
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        with open(uploaded_file, "rb") as fh:
+            return fh.read()
+    if hasattr(uploaded_file, "getvalue"):
+        return uploaded_file.getvalue()
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+    return uploaded_file.read()
+
+
+def file_name(uploaded_file):
+    if isinstance(uploaded_file, (str, os.PathLike)):
+        return os.path.basename(os.fspath(uploaded_file))
+    return getattr(uploaded_file, "name", "upload")
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def parser_version(parse_fn) -> str:
+    """
+    Identifies a parser by module, name and the module's PARSER_VERSION so that
+    bumping the version invalidates every cached result of that parser.
+    """
+    module = inspect.getmodule(parse_fn)
+    version = getattr(module, "PARSER_VERSION", "0")
+    return f"{parse_fn.__module__}.{parse_fn.__qualname__}@{version}"
+
+
+def as_named_stream(data: bytes, name: str) -> BytesIO:
+    """Wraps bytes in a BytesIO that looks like an upload to the parsers."""
+    stream = BytesIO(data)
+    stream.name = name
+    return stream
+
+
+class ParseCache:
+    """
+    Parse-result cache keyed by file content hash and parser version.
+
+    Results live in an in-memory LRU of at most `max_entries` items and, when
+    `disk_dir` is set, are also pickled to disk so they survive restarts. The
+    disk layer is kept under `max_disk_bytes` by evicting the least recently
+    used files.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MEMORY_ENTRIES, disk_dir=None, max_disk_bytes=DEFAULT_DISK_BYTES):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(parse_fn, digest: str) -> str:
+        return content_hash(f"{parser_version(parse_fn)}:{digest}".encode("utf-8"))
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """Returns (found, value)."""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return True, self._memory[key]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                with open(path, "rb") as fh:
+                    value = pickle.load(fh)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                return False, None
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self._remember(key, value)
+            return True, value
+
+        return False, None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.disk_dir:
+            path = self._disk_path(key)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "wb") as fh:
+                    pickle.dump(value, fh, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, path)
+            except (OSError, pickle.PicklingError) as e:
+                logger.warning("⚠️ Parse cache write failed: %s", e)
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                return
+            self._evict_disk()
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        try:
+            entries = []
+            for entry in os.scandir(self.disk_dir):
+                if entry.name.endswith(".pkl"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self.disk_dir and os.path.isdir(self.disk_dir):
+            for entry in os.scandir(self.disk_dir):
+                if entry.name.endswith(".pkl"):
+                    os.remove(entry.path)
+
+    def parse(self, parse_fn, uploaded_file):
+        """
+        Runs `parse_fn` on the uploaded file unless a result for the same
+        content and parser version is already cached.
+        """
+        data = read_file_bytes(uploaded_file)
+        key = self.make_key(parse_fn, content_hash(data))
+        found, value = self.get(key)
+        if found:
+            return value
+        value = parse_fn(as_named_stream(data, file_name(uploaded_file)))
+        if is_cacheable(value):
+            self.put(key, value)
+        return value
+
+
+def is_cacheable(value):
+    """
+    False for failed parses: None, an empty result, or a tuple of Nones (the
+    packing-list parser's failure value). Parsers return those from catch-all
+    error handlers too, so caching them would keep a one-off failure for good.
+    """
+    if isinstance(value, tuple):
+        return any(part is not None for part in value)
+    if isinstance(value, (list, dict)):
+        return bool(value)
+    return value is not None
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_default_cache() -> ParseCache:
+    """
+    Process-wide cache shared by every Streamlit session. The disk layer lives in
+    MARFLOW_PARSE_CACHE_DIR (default ~/.cache/marflowqt/parse); set it to an
+    empty string to keep the cache in memory only.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            disk_dir = os.environ.get("MARFLOW_PARSE_CACHE_DIR", DEFAULT_DISK_DIR)
+            _default_cache = ParseCache(disk_dir=disk_dir or None)
+        return _default_cache
+
+
+def cached_parse(parse_fn, uploaded_file, cache=None):
+    """Parses `uploaded_file` with `parse_fn` through the default parse cache."""
+    return (cache or get_default_cache()).parse(parse_fn, uploaded_file)
@@ -0,0 +1,160 @@
+import os
+from io import BytesIO
+
+import pdfplumber
+import pymupdf
+import ocr
+import timing
+from parse_cache import read_file_bytes
+
+TEXT_BACKENDS = ("pymupdf", "pdfplumber")
+TABLE_BACKENDS = ("pdfplumber", "pymupdf")
+DEFAULT_TEXT_BACKEND = os.environ.get("MARFLOW_PDF_TEXT_BACKEND", "pymupdf")
+
+# pdfplumber's extract_text default: words whose tops are within Y_TOLERANCE points
+# form one line.
+Y_TOLERANCE = 3
+# Points kept above a table keyword so the header row's top border is inside the
+# PyMuPDF clip.
+HEADER_MARGIN = 40
+
+
+def cluster_lines(words, tolerance=Y_TOLERANCE):
+    """
+    Groups (top, x0, text) words into lines the way pdfplumber does: words are
+    sorted by top and a new line starts when a top is more than `tolerance` below
+    the previous one. Returns the lines as lists of words sorted left to right.
+    """
+    lines = []
+    last_top = None
+    for word in sorted(words, key=lambda word: word[0]):
+        if last_top is None or word[0] - last_top > tolerance:
+            lines.append([])
+        lines[-1].append(word)
+        last_top = word[0]
+    return [sorted(line, key=lambda word: word[1]) for line in lines]
+
+
+def pymupdf_page_text(page):
+    """
+    Page text from PyMuPDF laid out like pdfplumber's `extract_text()`: one line
+    per cluster of word tops, words joined by single spaces, lines by newlines.
+    Words are split on whitespace only, so glyphs placed apart without a space
+    character stay one word (pdfplumber would split them).
+    """
+    words = []
+    for x0, y0, x1, y1, text, *_ in page.get_text("words", sort=False):
+        words.append((y0, x0, text))
+    return "\n".join(" ".join(word[2] for word in line) for line in cluster_lines(words))
+
+
+def pdfplumber_page_text(page):
+    return page.extract_text() or ""
+
+
+def pdfplumber_tables(page, keyword):
+    """
+    Yields the rows of each table on a pdfplumber page that reaches below the first
+    `keyword`. Cropping is not used here: pdfplumber copies and filters every object
+    to crop, which costs more than the detection it saves. Instead, tables that end
+    above the keyword are skipped without extracting their text.
+    """
+    hits = page.search(keyword, regex=False)
+    if not hits:
+        return
+    keyword_top = min(hit["top"] for hit in hits)
+    for table in page.find_tables():
+        if table.bbox[3] >= keyword_top:
+            yield table.extract()
+
+
+def pymupdf_tables(page, keyword):
+    """Yields the rows of each table on a PyMuPDF page, clipped to just above the first `keyword`."""
+    hits = page.search_for(keyword)
+    if not hits:
+        return
+    clip = pymupdf.Rect(page.rect)
+    clip.y0 = max(clip.y0, min(hit.y0 for hit in hits) - HEADER_MARGIN)
+    for table in page.find_tables(clip=clip).tables:
+        yield table.extract()
+
+
+class PdfDocument:
+    """
+    One PDF read through a text backend and, only when tables are asked for, a
+    table backend.
+
+    PyMuPDF extracts text several times faster than pdfplumber, which parses every
+    page object in Python, so it is the default text backend. pdfplumber is opened
+    lazily for table geometry, so text-only parsers never pay for it.
+
+    With `ocr_pages` (default: MARFLOW_OCR), pages without a text layer are read
+    with Tesseract instead of coming back empty.
+    """
+
+    def __init__(self, source, text_backend=None, table_backend="pdfplumber", ocr_pages=None):
+        text_backend = text_backend or DEFAULT_TEXT_BACKEND
+        if text_backend not in TEXT_BACKENDS:
+            raise ValueError(f"Unknown text backend: {text_backend!r}")
+        if table_backend not in TABLE_BACKENDS:
+            raise ValueError(f"Unknown table backend: {table_backend!r}")
+        self.text_backend = text_backend
+        self.table_backend = table_backend
+        self.ocr_pages = ocr.enabled() if ocr_pages is None else ocr_pages
+        self.textless_pages = 0
+        self.data = read_file_bytes(source)
+        self._mupdf = None
+        self._plumber = None
+
+    def _open(self, backend):
+        if backend == "pymupdf":
+            if self._mupdf is None:
+                self._mupdf = pymupdf.open(stream=self.data, filetype="pdf")
+            return self._mupdf
+        if self._plumber is None:
+            self._plumber = pdfplumber.open(BytesIO(self.data))
+        return self._plumber
+
+    def _page(self, backend, number):
+        doc = self._open(backend)
+        return doc[number] if backend == "pymupdf" else doc.pages[number]
+
+    def __len__(self):
+        doc = self._open(self.text_backend)
+        return len(doc) if self.text_backend == "pymupdf" else len(doc.pages)
+
+    def page_text(self, number):
+        with timing.span("pdf.text", backend=self.text_backend):
+            page = self._page(self.text_backend, number)
+            text = pymupdf_page_text(page) if self.text_backend == "pymupdf" else pdfplumber_page_text(page)
+        if not text.strip():
+            self.textless_pages += 1
+            if self.ocr_pages:
+                text = ocr.page_text(self._open("pymupdf"), number)
+        return text
+
+    def page_texts(self):
+        """Yields each page's text in order, extracting pages only as they are consumed."""
+        for number in range(len(self)):
+            yield self.page_text(number)
+
+    def page_tables(self, number, keyword):
+        """Lazily yields the rows of the tables from the first `keyword` down on a page."""
+        page = self._page(self.table_backend, number)
+        if self.table_backend == "pymupdf":
+            return pymupdf_tables(page, keyword)
+        return pdfplumber_tables(page, keyword)
+
+    def close(self):
+        if self._mupdf is not None:
+            self._mupdf.close()
+            self._mupdf = None
+        if self._plumber is not None:
+            self._plumber.close()
+            self._plumber = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,245 @@
+import json
+import os
+import re
+import threading
+import time
+
+import pandas as pd
+
+from packing_list_index import PackingListIndex, normalize_key
+
+DEFAULT_PRODUCT_MASTER_PATH = os.path.join(os.path.expanduser("~"), ".cache", "marflowqt", "product_master.json")
+FORMAT_VERSION = 1
+# Values that mean "not on the packing list" ("N/A" is what size extraction gives
+# when a description carries no size).
+MISSING_VALUES = {"", "N/A", "NAN", "NONE"}
+# Signatures of the packing lists already learned, so a rerun does not count them twice.
+MAX_SOURCES = 1000
+
+# Size parts in the order the packing-list parser joins them ("18G x CH16 x 40CM").
+SIZE_COMPONENTS = ("gauge", "ch", "cm")
+
+_GAUGE = re.compile(r"^\d+(?:\.\d+)?G$")
+_CH = re.compile(r"^CH\d+(?:\.\d+)?(?:-\d+(?:\.\d+)?)?$")
+_CM = re.compile(r"^\d+(?:\.\d+)?CM$")
+
+
+def is_missing(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return True
+    return str(value).strip().upper() in MISSING_VALUES
+
+
+def size_components(size):
+    """Splits a normalized packing-list size ("18G x CH16 x 40CM") into its gauge, CH and cm parts."""
+    components = {"gauge": None, "ch": None, "cm": None}
+    if is_missing(size):
+        return components
+    for part in str(size).upper().split(" X "):
+        part = part.strip()
+        if _GAUGE.match(part):
+            components["gauge"] = part
+        elif _CH.match(part):
+            components["ch"] = part
+        elif _CM.match(part):
+            components["cm"] = part
+    return components
+
+
+def product_size(product):
+    """
+    A product's size rebuilt from its stored gauge / CH / cm parts, in packing-list
+    order, so the validators get a canonical size without re-parsing the text;
+    the stored size string when not all of its parts were recognized.
+    """
+    parts = [product[name] for name in SIZE_COMPONENTS if product.get(name)]
+    size = product.get("size")
+    if not parts or (size and len(str(size).upper().split(" X ")) != len(parts)):
+        return size
+    return " x ".join(parts)
+
+
+def packing_list_signature(packing_list):
+    index = PackingListIndex.from_any(packing_list)
+    return str(int(pd.util.hash_pandas_object(index.df.astype(str), index=False).sum()) & 0xFFFFFFFFFFFFFFFF)
+
+
+class ProductMaster:
+    """
+    Products by ref code (canonical description, and size with its gauge / CH / cm
+    parts) in a JSON file.
+
+    The file is read into a dict once and read again only when its modification
+    time or size changes, so validators get O(1) lookups without re-reading it on
+    every rerun. `learn` adds the rows of a packing list; each packing list is
+    counted once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._stamp = None
+        self._products = {}
+        self._sources = []
+
+    def _file_stamp(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _refresh(self):
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        products, sources = {}, []
+        if stamp is not None:
+            with open(self.path, encoding="utf-8") as fh:
+                data = json.load(fh)
+            products, sources = data.get("products", {}), data.get("sources", [])
+        self._products, self._sources, self._stamp = products, sources, stamp
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"version": FORMAT_VERSION, "products": self._products, "sources": self._sources}, fh, indent=1, sort_keys=True)
+        os.replace(tmp, self.path)
+        self._stamp = self._file_stamp()
+
+    def lookup(self):
+        """The current {ref code: product} dict (reloaded first if the file changed). Do not modify it."""
+        with self._lock:
+            self._refresh()
+            return self._products
+
+    def version(self):
+        """Changes whenever the file does (its modification time and size), None while there is no file."""
+        with self._lock:
+            self._refresh()
+            return self._stamp
+
+    def get(self, ref_code):
+        return self.lookup().get(normalize_key(ref_code))
+
+    def __len__(self):
+        return len(self.lookup())
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def learn(self, packing_list, source=None):
+        """
+        Adds or updates the products of a packing list (PackingListIndex or
+        extracted-items DataFrame). Descriptions and sizes seen last win; empty
+        and "N/A" values never overwrite known ones. Returns the number of
+        products added or changed, 0 if this packing list was learned before.
+        """
+        index = PackingListIndex.from_any(packing_list)
+        signature = packing_list_signature(index)
+        with self._lock:
+            self._refresh()
+            if signature in self._sources:
+                return 0
+            changed = 0
+            for record in index.records:
+                changed += self._learn_row(record, source)
+            self._sources = (self._sources + [signature])[-MAX_SOURCES:]
+            self._save()
+            return changed
+
+    def _learn_row(self, record, source):
+        ref_code = normalize_key(record.get("Ref Code", ""))
+        if is_missing(ref_code):
+            return 0
+        product = self._products.get(ref_code)
+        before = json.dumps(product, sort_keys=True)
+        if product is None:
+            product = self._products[ref_code] = {"description": None, "size": None, "seen": 0}
+        description, size = record.get("Description"), record.get("Size")
+        if not is_missing(description):
+            product["description"] = str(description).strip()
+        if not is_missing(size):
+            product["size"] = str(size).strip()
+            product.update(size_components(size))
+        # Quantities are per shipment, not per product; nothing checks against them.
+        product.pop("quantities", None)
+        product["seen"] += 1
+        product["updated"] = time.strftime("%Y-%m-%d")
+        if source:
+            product["source"] = source
+        return int(json.dumps(product, sort_keys=True) != before)
+
+    def seed_from_history(self, history):
+        """
+        Fills products not known yet from the packing-list values recorded in the
+        validation history (the expected Description and Size of COA checks).
+        Returns the number of products added.
+        """
+        rows = history.expected_values(("Description", "Size"))
+        with self._lock:
+            self._refresh()
+            added = set()
+            for ref_code, field, expected in rows:
+                ref_code = normalize_key(ref_code)
+                if is_missing(ref_code) or is_missing(expected):
+                    continue
+                if ref_code in self._products and ref_code not in added:
+                    continue
+                product = self._products.setdefault(ref_code, {"description": None, "size": None, "seen": 0, "source": "history"})
+                added.add(ref_code)
+                if field == "Description" and product["description"] is None:
+                    product["description"] = expected
+                elif field == "Size" and product["size"] is None:
+                    product["size"] = expected
+                    product.update(size_components(expected))
+            if added:
+                self._save()
+            return len(added)
+
+
+def catalog_value(value, ref_code, catalog, field):
+    """
+    `value`, or the catalog's `field` for `ref_code` when the packing list has no
+    value (empty or "N/A"). Sizes come from the stored parts (`product_size`).
+    """
+    if catalog and is_missing(value):
+        product = catalog.get(normalize_key(ref_code))
+        if product:
+            found = product_size(product) if field == "size" else product.get(field)
+            if found:
+                return found
+    return value
+
+
+def fill_from_catalog(values, ref_codes, catalog, field):
+    """Column form of `catalog_value`."""
+    if not catalog:
+        return values
+    filled = [catalog_value(value, ref_code, catalog, field) for value, ref_code in zip(values, ref_codes)]
+    return pd.Series(filled, index=values.index, dtype=object)
+
+
+_default_master = None
+_default_lock = threading.Lock()
+
+
+def get_product_master() -> ProductMaster:
+    """
+    Process-wide product master at MARFLOW_PRODUCT_MASTER (default
+    ~/.cache/marflowqt/product_master.json). A new file is seeded from the
+    validation history.
+    """
+    global _default_master
+    with _default_lock:
+        if _default_master is None:
+            master = ProductMaster(os.environ.get("MARFLOW_PRODUCT_MASTER") or DEFAULT_PRODUCT_MASTER_PATH)
+            if not master.exists():
+                from history_store import get_history_store
+
+                master.seed_from_history(get_history_store())
+            _default_master = master
+        return _default_master
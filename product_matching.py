@@ -0,0 +1,151 @@
+import logging
+import os
+import re
+from functools import lru_cache
+
+MEMO_SIZE = 4096
+
+logger = logging.getLogger(__name__)
+
+
+def _threshold_from_env(default=1.0):
+    value = os.environ.get("MARFLOW_DESCRIPTION_THRESHOLD")
+    try:
+        return float(value) if value else default
+    except ValueError:
+        logger.warning("⚠️ Ignoring invalid MARFLOW_DESCRIPTION_THRESHOLD=%r", value)
+        return default
+
+
+# Certificates pass the description check at or above this token-set score
+# (MARFLOW_DESCRIPTION_THRESHOLD). The default asks for the same words (in any
+# order or spelling variant), so an extra qualifier such as "(INFANT)" fails; a
+# lower value accepts partial overlaps.
+DEFAULT_THRESHOLD = _threshold_from_env()
+
+# Spellings and abbreviations seen on certificates, mapped to the packing-list word.
+# A replacement may expand to several tokens ("jtip" -> "j tip").
+SYNONYMS = {
+    "cath": "catheter",
+    "caths": "catheter",
+    "catheters": "catheter",
+    "jtip": "j tip",
+    "paed": "paediatric",
+    "ped": "paediatric",
+    "pediatric": "paediatric",
+    "peadiatric": "paediatric",
+    "fem": "female",
+    "tubes": "tube",
+    "bags": "bag",
+    "sets": "set",
+    "cc": "ml",
+    "two": "2",
+    "three": "3",
+}
+STOP_WORDS = frozenset(["with", "and", "for", "of", "the", "a"])
+
+_ABBREVIATION_DOTS = re.compile(r"(?<=[a-z])\.(?=[a-z])")
+_NOT_ALPHANUMERIC = re.compile(r"[^a-z0-9]")
+_TOKEN = re.compile(r"[a-z]+|\d+(?:\.\d+)?")
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _tokenize(text):
+    text = _ABBREVIATION_DOTS.sub("", text.lower())
+    tokens = set()
+    for token in _TOKEN.findall(text):
+        for word in SYNONYMS.get(token, token).split():
+            if word not in STOP_WORDS:
+                tokens.add(word)
+    return frozenset(tokens)
+
+
+def tokenize(text):
+    """
+    The token set of a description: lower-cased, split into words and numbers
+    ("J-TIP" and "TIP J" both give {"j", "tip"}, "2WAY" gives {"2", "way"}),
+    with SYNONYMS applied and STOP_WORDS dropped. Values are str()-ed first, as
+    the exact comparison did.
+    """
+    return _tokenize(text if isinstance(text, str) else str(text))
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _squash(text):
+    return _NOT_ALPHANUMERIC.sub("", text.lower())
+
+
+def squash(text):
+    """
+    Letters and digits only, lower-cased: the comparison the validators made
+    before scoring. Descriptions equal this way always match, even where the
+    tokens differ ("SUCTIONCATHETER" vs "SUCTION CATHETER").
+    """
+    return _squash(text if isinstance(text, str) else str(text))
+
+
+def _numbers(tokens):
+    return {token for token in tokens if token[0].isdigit()}
+
+
+def token_set_score(left, right):
+    """Dice similarity of two token sets: 1.0 for the same words in any order, 0.0 for none shared."""
+    if not left and not right:
+        return 1.0
+    return 2 * len(left & right) / (len(left) + len(right))
+
+
+def is_match(left, right, score, threshold=None):
+    """
+    A pair of token sets matches when `score` reaches the threshold and both carry
+    the same numbers, so "2 WAY" never passes for "3 WAY" however similar the rest is.
+    """
+    threshold = DEFAULT_THRESHOLD if threshold is None else threshold
+    return score >= threshold and _numbers(left) == _numbers(right)
+
+
+def description_score(expected, actual, threshold=None):
+    """Returns (score, matched) for one packing-list description and certificate value."""
+    if squash(expected) == squash(actual):
+        return 1.0, True
+    left, right = tokenize(expected), tokenize(actual)
+    score = token_set_score(left, right)
+    return score, is_match(left, right, score, threshold)
+
+
+class DescriptionIndex:
+    """
+    Token sets of the packing-list descriptions, built once per packing list, so
+    `score` checks a certificate against one row without re-tokenizing the row.
+    """
+
+    def __init__(self, descriptions):
+        self.descriptions = list(descriptions)
+        self.squashed = [squash(description) for description in self.descriptions]
+        self.tokens = [tokenize(description) for description in self.descriptions]
+
+    def score(self, row, text, threshold=None):
+        """Returns (score, matched) for certificate `text` against packing-list row `row`."""
+        if self.squashed[row] == squash(text):
+            return 1.0, True
+        left, right = self.tokens[row], tokenize(text)
+        score = token_set_score(left, right)
+        return score, is_match(left, right, score, threshold)
+
+    def score_rows(self, rows, texts, threshold=None, expected=None):
+        """
+        `score` over paired packing-list rows and certificate values; returns
+        (scores, matched) lists. `expected` optionally gives each row's description
+        (e.g. filled in from the product master); where it differs from the row's
+        own, it is scored instead.
+        """
+        scores, matched = [], []
+        expected = [None] * len(texts) if expected is None else expected
+        for row, text, description in zip(rows, texts, expected):
+            if description is None or description == self.descriptions[row]:
+                score, match = self.score(row, text, threshold)
+            else:
+                score, match = description_score(description, text, threshold)
+            scores.append(round(score, 2))
+            matched.append(match)
+        return scores, matched
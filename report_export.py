@@ -0,0 +1,91 @@
+from io import BytesIO
+
+import pandas as pd
+import xlsxwriter
+
+import timing
+
+# Sheet name for each table, in workbook order.
+REPORT_SHEETS = [
+    ("client", "Report"),
+    ("coa", "COA Validation"),
+    ("sc", "SC Validation"),
+]
+WIDTH_PADDING = 3
+
+
+def _cell(value):
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return value
+
+
+def write_table(workbook, name, df, formats):
+    """
+    Writes `df` to a new sheet row by row. Column widths (longest value plus
+    padding, as the openpyxl report had) are tracked while writing and applied
+    afterwards, which constant_memory mode allows since widths live in the sheet
+    header, not in the flushed rows.
+    """
+    ws = workbook.add_worksheet(name)
+    widths = [len(str(column)) for column in df.columns]
+    for col, column in enumerate(df.columns):
+        ws.write_string(0, col, str(column), formats["header"])
+
+    for row, values in enumerate(df.itertuples(index=False, name=None), 1):
+        for col, value in enumerate(values):
+            value = _cell(value)
+            if value is None:
+                ws.write_blank(row, col, None, formats["cell"])
+                continue
+            if isinstance(value, str):
+                ws.write_string(row, col, value, formats["cell"])
+            else:
+                ws.write(row, col, value, formats["cell"])
+            width = len(str(value))
+            if width > widths[col]:
+                widths[col] = width
+
+    for col, width in enumerate(widths):
+        ws.set_column(col, col, width + WIDTH_PADDING)
+    return ws
+
+
+@timing.timed("export.xlsx")
+def write_report(target, client_report, coa_table=None, sc_table=None):
+    """
+    Writes the client report and, when given, the COA and SC validation tables to
+    one .xlsx file (`target` is a path or a binary buffer). Rows are streamed with
+    XlsxWriter's constant_memory mode and share one header and one cell format.
+    """
+    tables = {"client": client_report, "coa": coa_table, "sc": sc_table}
+    workbook = xlsxwriter.Workbook(target, {"constant_memory": True, "strings_to_numbers": False})
+    formats = {
+        "header": workbook.add_format({"bold": True, "text_wrap": True, "valign": "top"}),
+        "cell": workbook.add_format({"text_wrap": True, "valign": "top"}),
+    }
+    for key, name in REPORT_SHEETS:
+        if tables[key] is not None:
+            write_table(workbook, name, tables[key], formats)
+    workbook.close()
+
+
+def report_excel_bytes(client_report, coa_table=None, sc_table=None):
+    """Renders the report workbook (see `write_report`) and returns its bytes."""
+    buffer = BytesIO()
+    write_report(buffer, client_report, coa_table, sc_table)
+    return buffer.getvalue()
+
+
+def report_signature(*tables):
+    """
+    A cheap fingerprint of the report's tables, used to reuse an already rendered
+    workbook until the tables change.
+    """
+    parts = []
+    for df in tables:
+        if df is None:
+            parts.append(None)
+        else:
+            parts.append((tuple(df.columns), len(df), int(pd.util.hash_pandas_object(df, index=False).sum())))
+    return tuple(parts)
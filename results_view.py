@@ -0,0 +1,165 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+PAGE_SIZES = (50, 100, 250, 500)
+DEFAULT_PAGE_SIZE = 100
+# Filter results kept per view, so paging through a filtered table does not redo the filter.
+MAX_FILTERS = 16
+
+
+def highlight(value):
+    """Cell style for ✅ / ❌ marked values."""
+    if isinstance(value, str) and value.startswith("❌"):
+        return "color: red; font-weight: bold;"
+    if isinstance(value, str) and value.startswith("✅"):
+        return "color: green; font-weight: bold;"
+    return ""
+
+
+def _positions(df, column):
+    """{value: sorted row positions} for a column, or {} if the table has no such column."""
+    if column not in df.columns or df.empty:
+        return {}
+    return {str(value): np.asarray(rows) for value, rows in df.groupby(df[column].map(str), sort=True).indices.items()}
+
+
+class ResultsView:
+    """
+    A validation table with the row positions of every batch number, field and
+    outcome, built once per table. Filters combine those positions instead of
+    rescanning the frame, only the rows of the page shown are sliced and styled,
+    and the summary counts are computed once.
+    """
+
+    def __init__(self, df, result_column=None, style_columns=()):
+        self.df = df
+        self.result_column = result_column if result_column in df.columns else None
+        self.style_columns = [column for column in style_columns if column in df.columns]
+        self.by_batch = _positions(df, "Batch No")
+        self.by_field = _positions(df, "Field")
+        self.failed = None
+        if self.result_column:
+            outcomes = df[self.result_column].to_numpy()
+            self.failed = np.flatnonzero(outcomes == "❌")
+            self.passed = np.flatnonzero(outcomes == "✅")
+        self._filters = {}
+        self._field_counts = None
+
+    def __len__(self):
+        return len(self.df)
+
+    def counts(self):
+        """
+        {"checks", "matches", "mismatches"} for the whole table. Without a result
+        column (the client report) every row is a mismatch.
+        """
+        if self.failed is None:
+            return {"checks": len(self.df), "matches": 0, "mismatches": len(self.df)}
+        return {"checks": len(self.df), "matches": len(self.passed), "mismatches": len(self.failed)}
+
+    def field_counts(self):
+        """Checks and mismatches per field, computed on first use."""
+        if self._field_counts is None:
+            failed = np.zeros(len(self.df), dtype=bool)
+            if self.failed is not None:
+                failed[self.failed] = True
+            self._field_counts = pd.DataFrame(
+                [(field, len(rows), int(failed[rows].sum())) for field, rows in self.by_field.items()],
+                columns=["Field", "Checks", "Mismatches"],
+            )
+        return self._field_counts
+
+    def fields(self):
+        return list(self.by_field)
+
+    def filter(self, failed_only=False, batches=(), fields=()):
+        """
+        Sorted row positions of the mismatches (if `failed_only`) among the given
+        batch numbers and fields; empty `batches` or `fields` mean all of them.
+        """
+        key = (bool(failed_only), tuple(sorted(batches)), tuple(sorted(fields)))
+        positions = self._filters.get(key)
+        if positions is None:
+            positions = np.arange(len(self.df))
+            if failed_only and self.failed is not None:
+                positions = self.failed
+            for wanted, index in ((key[1], self.by_batch), (key[2], self.by_field)):
+                if wanted:
+                    keep = np.zeros(len(self.df), dtype=bool)
+                    for value in wanted:
+                        keep[index.get(value, [])] = True
+                    positions = positions[keep[positions]]
+            if len(self._filters) >= MAX_FILTERS:
+                self._filters.pop(next(iter(self._filters)))
+            self._filters[key] = positions
+        return positions
+
+    def page(self, positions, page, page_size=DEFAULT_PAGE_SIZE):
+        """The rows of page `page` (1-based) of `positions`."""
+        start = (page - 1) * page_size
+        return self.df.iloc[positions[start:start + page_size]]
+
+    def styled(self, rows):
+        """Highlights the ✅ / ❌ cells of `rows` only (a page, not the whole table)."""
+        if not self.style_columns or rows.empty:
+            return rows
+        return rows.style.map(highlight, subset=self.style_columns)
+
+
+def cached_view(cache, key, sources, build, **options):
+    """
+    The ResultsView kept under `key` in `cache` (st.session_state) while `sources`
+    are the same objects it was built from; otherwise a new view of `build()`.
+    ValidationState tables keep their identity until they change, so reruns
+    reuse the view and its positions.
+    """
+    entry = cache.get(key)
+    if entry is None or len(entry[0]) != len(sources) or any(old is not new for old, new in zip(entry[0], sources)):
+        entry = (tuple(sources), ResultsView(build(), **options))
+        cache[key] = entry
+    return entry[1]
+
+
+def parse_batches(text):
+    """Batch numbers typed as a comma- or space-separated list."""
+    return [part.strip() for part in text.replace(",", " ").split() if part.strip()]
+
+
+def render_results(view, key, expanded_counts=False):
+    """
+    Shows one page of `view` with mismatch, batch and field filters above it.
+    Widget state lives under `key`-prefixed session keys.
+    """
+    # Imported here so the view logic can be used without Streamlit.
+    import streamlit as st
+
+    filter_columns = st.columns(3)
+    failed_only = False
+    if view.failed is not None:
+        failed_only = filter_columns[0].checkbox("Only mismatches", key=f"{key}_failed")
+    batches = []
+    if view.by_batch:
+        batches = parse_batches(filter_columns[1].text_input("Batch No", key=f"{key}_batches", help="One or more, separated by commas"))
+    fields = []
+    if view.by_field:
+        fields = filter_columns[2].multiselect("Field", view.fields(), key=f"{key}_fields")
+
+    positions = view.filter(failed_only, batches, fields)
+    size_column, page_column = st.columns(2)
+    page_size = size_column.selectbox("Rows per page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE), key=f"{key}_page_size")
+    pages = max(1, math.ceil(len(positions) / page_size))
+    # A narrower filter can leave the stored page past the end.
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    page = page_column.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+
+    rows = view.page(positions, page, page_size)
+    st.dataframe(view.styled(rows), use_container_width=True, hide_index=True)
+    start = (page - 1) * page_size
+    st.caption(f"Page {page} of {pages}: rows {start + 1 if len(rows) else 0}–{start + len(rows)} of {len(positions)} ({len(view)} in total)")
+
+    if view.by_field and view.failed is not None:
+        with st.expander("📊 Checks by field", expanded=expanded_counts):
+            st.dataframe(view.field_counts(), use_container_width=True, hide_index=True)
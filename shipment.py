@@ -0,0 +1,99 @@
+import pandas as pd
+
+from match_coa_to_packing_list import validate_coa_batch
+from packing_list_index import PackingListIndex
+import timing
+from validate_sc import validate_sc_batch
+
+CLIENT_REPORT_COLUMNS = ["Ref code", "Batch No", "EtO Sterilization certificate", "COA", "Packing list"]
+
+
+def build_coa_table(parsed_coas, packing_list, products=None):
+    """
+    Validates parsed COAs (results of `parse_coa_batch`) against the packing list
+    and, for values it lacks, the optional `products` ProductMaster.
+    Returns the combined COA validation table, or None if nothing was parsed.
+    """
+    parsed_coas = [parsed for parsed in parsed_coas if parsed["data"]]
+    if not parsed_coas:
+        return None
+    return validate_coa_batch(
+        [parsed["data"] for parsed in parsed_coas],
+        packing_list,
+        file_names=[parsed["name"] for parsed in parsed_coas],
+        products=products,
+    )
+
+
+def build_sc_table(parsed_scs, packing_list, products=None):
+    """
+    Validates every certificate page of the parsed SCs (results of `parse_sc_batch`)
+    against the packing list (and the optional `products` ProductMaster). Returns
+    the combined table, or None if nothing was parsed.
+    """
+    sc_results = []
+    for parsed in parsed_scs:
+        if parsed["data"]:
+            sc_results.extend(parsed["data"])
+    if not sc_results:
+        return None
+    return validate_sc_batch(sc_results, packing_list, products=products).astype(str)
+
+
+def _strip_marks(value):
+    return value.replace("❌", "").replace("✅", "").strip()
+
+
+@timing.timed("report.client")
+def build_client_report(final_coa_table, combined_validation, packing_list):
+    """
+    Builds the mismatch-only table in the client's format from the COA and SC
+    validation tables (either may be None).
+    """
+    ref_lookup = PackingListIndex.from_any(packing_list).ref_lookup()
+    parts = []
+
+    if final_coa_table is not None:
+        coa_data = final_coa_table[final_coa_table["Match"] == "❌"].copy()
+        coa_data["Ref code"] = coa_data["Batch No"].map(ref_lookup).fillna("Not mention")
+        coa_data["COA"] = coa_data["Field"] + ": " + coa_data["COA Value"].astype(str)
+        coa_data["Packing list"] = coa_data["Field"] + ": " + coa_data["Expected Value"].astype(str)
+        coa_data["EtO Sterilization certificate"] = "--"
+        parts.append(coa_data[CLIENT_REPORT_COLUMNS])
+
+    if combined_validation is not None:
+        sc_data = combined_validation[combined_validation["Validation"] == "❌"].copy()
+        sc_data["Ref code"] = sc_data["Batch No"].map(ref_lookup).fillna("Not mention")
+        sc_data["EtO Sterilization certificate"] = [f"{field}: {_strip_marks(value)}" for field, value in zip(sc_data["Field"], sc_data["SC Value"])]
+        sc_data["Packing list"] = [f"{field}: {_strip_marks(value)}" for field, value in zip(sc_data["Field"], sc_data["Expected Value"])]
+        sc_data["COA"] = "--"
+        parts.append(sc_data[CLIENT_REPORT_COLUMNS])
+
+    if not parts:
+        return pd.DataFrame(columns=CLIENT_REPORT_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def client_report_excel_bytes(final_client_format):
+    """Renders the client report as a formatted .xlsx file and returns its bytes."""
+    from report_export import report_excel_bytes
+
+    return report_excel_bytes(final_client_format)
+
+
+def write_client_report(final_client_format, path):
+    """Writes the client report to `path` as .xlsx or .csv depending on the extension."""
+    if str(path).lower().endswith((".xlsx", ".xlsm")):
+        with open(path, "wb") as fh:
+            fh.write(client_report_excel_bytes(final_client_format))
+    else:
+        final_client_format.to_csv(path, index=False)
+
+
+def count_mismatches(final_coa_table, combined_validation):
+    total = 0
+    if final_coa_table is not None:
+        total += int((final_coa_table["Match"] == "❌").sum())
+    if combined_validation is not None:
+        total += int((combined_validation["Validation"] == "❌").sum())
+    return total
@@ -1,13 +1,62 @@
-import pdfplumber
-import re
+import logging
+import os
+
+import ocr
+import timing
+from extraction_rules import SC_RULES
+from parse_cache import file_name
+from pdf_backends import DEFAULT_TEXT_BACKEND, TABLE_BACKENDS, PdfDocument
+
+DEFAULT_TABLE_BACKEND = os.environ.get("MARFLOW_SC_TABLE_BACKEND", "pdfplumber")
+
+# Bump whenever extraction output changes so cached parse results are invalidated.
+# The backends and OCR are part of the version since they can split text and cells differently.
+PARSER_VERSION = f"3-{DEFAULT_TEXT_BACKEND}-{DEFAULT_TABLE_BACKEND}{ocr.version_suffix()}"
+
+TABLE_KEYWORD = "Size"
+
+logger = logging.getLogger(__name__)
+
+
+def size_and_quantity(tables):
+    """
+    Reads Size and Quantity from the first table whose header mentions "Size".
+    Tables are consumed lazily, so nothing after that table is extracted.
+    """
+    for table in tables:
+        if not table or len(table) < 2:
+            continue
+
+        header = table[0]
+        if header and any("Size" in str(cell) for cell in header):
+            # This is the correct table
+            for row in table[1:]:
+                if row and len(row) >= 4:
+                    _, type_, size, quantity = row[:4]
+                    if size and quantity:
+                        return size.replace(" ", "").upper(), quantity.strip()
+            break  # Found correct table, stop scanning
+    return None, None
+
+
+def parse_sterilization_certificate(uploaded_file, table_backend=None, text_backend=None):
+    """
+    Returns one record per page with text (scanned pages are read with OCR when
+    MARFLOW_OCR is on). `text_backend` (default from
+    MARFLOW_PDF_TEXT_BACKEND) reads the fields and `table_backend` ("pdfplumber" or
+    "pymupdf", default from MARFLOW_SC_TABLE_BACKEND) the Size/Quantity table;
+    table detection only runs on pages that mention "Size", and stops at the first
+    table with a "Size" header.
+    """
+    table_backend = table_backend or DEFAULT_TABLE_BACKEND
+    if table_backend not in TABLE_BACKENDS:
+        raise ValueError(f"Unknown table backend: {table_backend!r}")
 
-def parse_sterilization_certificate(uploaded_file):
     try:
         all_steri_data = []
 
-        with pdfplumber.open(uploaded_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
+        with PdfDocument(uploaded_file, text_backend=text_backend, table_backend=table_backend) as pdf:
+            for page_number, page_text in enumerate(pdf.page_texts()):
                 if not page_text:
                     continue
 
@@ -21,40 +70,24 @@ def parse_sterilization_certificate(uploaded_file):
                 }
 
                 # Extract fields from text
-                patterns = {
-                    "Batch No": r"Batch No[:\s]*([A-Z0-9/]+)",
-                    "Mfg. Date": r"Mfg\. Date[:\s]*([A-Z]{3}\s*[-–]?\s*\d{4})",
-                    "Exp. Date": r"Exp\. Date[:\s]*([A-Z]{3}\s*[-–]?\s*\d{4})",
-                    "Product Description": r"Product Description[:\s]*(.+?)(?:\n|$)"
-                }
-
-                for key, pattern in patterns.items():
-                    match = re.search(pattern, page_text, re.IGNORECASE | re.MULTILINE)
-                    if match:
-                        steri_data[key] = match.group(1).strip().upper()
+                with timing.span("extract.sc"):
+                    steri_data.update(SC_RULES.extract(page_text))
 
                 # Extract correct table for Size and Quantity
-                tables = page.extract_tables()
-                for table in tables:
-                    if not table or len(table) < 2:
-                        continue
-                    
-                    header = table[0]
-                    if header and any("Size" in str(cell) for cell in header):
-                        # This is the correct table
-                        for row in table[1:]:
-                            if row and len(row) >= 4:
-                                _, type_, size, quantity = row[:4]
-                                if size and quantity:
-                                    steri_data["Size"] = size.replace(" ", "").upper()
-                                    steri_data["Quantity"] = quantity.strip()
-                                    break  # Found, stop
-                        break  # Found correct table, stop scanning
+                if TABLE_KEYWORD in page_text:
+                    with timing.span("pdf.tables", backend=table_backend):
+                        size, quantity = size_and_quantity(pdf.page_tables(page_number, TABLE_KEYWORD))
+                    if size:
+                        steri_data["Size"] = size
+                        steri_data["Quantity"] = quantity
 
                 all_steri_data.append(steri_data)
+            if pdf.textless_pages and not pdf.ocr_pages:
+                logger.warning("⚠️ `%s` has %d pages without text (scanned?); set MARFLOW_OCR=1 to read them",
+                               file_name(uploaded_file), pdf.textless_pages)
 
         return all_steri_data
 
     except Exception as e:
-        print(f"❌ Sterilization Certificate Parsing Error: {e}")
+        logger.error("❌ Sterilization Certificate Parsing Error: %s", e)
         return None
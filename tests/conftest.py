@@ -0,0 +1,49 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Caches and stores go to a scratch directory, set before any module reads them
+# (spawned parser workers inherit the environment).
+_SCRATCH = tempfile.mkdtemp(prefix="marflow-tests-")
+for name, path in {
+    "MARFLOW_PARSE_CACHE_DIR": "parse_cache",
+    "MARFLOW_OCR_CACHE_DIR": "ocr_cache",
+    "MARFLOW_HISTORY_DB": "history.sqlite3",
+    "MARFLOW_PRODUCT_MASTER": "product_master.json",
+    "MARFLOW_OUTBOX_DB": "outbox.sqlite3",
+    "MARFLOW_JOB_DIR": "jobs",
+}.items():
+    os.environ[name] = os.path.join(_SCRATCH, path)
+os.environ["MARFLOW_PARSE_WORKERS"] = "2"
+
+
+@pytest.fixture(scope="session")
+def shipment(tmp_path_factory):
+    """A small synthetic shipment (benchmarks.synthetic): packing list, COAs and SCs."""
+    from benchmarks.synthetic import make_shipment
+
+    directory = tmp_path_factory.mktemp("shipment")
+    generated = make_shipment(str(directory), items=30, coas=6, coa_pages=2, scs=2, sc_pages=5)
+    # COAs and SCs in folders of their own, as cli.py and the watcher expect.
+    for kind in ("coa", "sc"):
+        folder = directory / kind
+        folder.mkdir()
+        paths = getattr(generated, f"{kind}_paths")
+        for i, path in enumerate(paths):
+            paths[i] = str(folder / os.path.basename(path))
+            os.replace(path, paths[i])
+        setattr(generated, f"{kind}_dir", str(folder))
+    return generated
+
+
+@pytest.fixture(scope="session", autouse=True)
+def _shutdown_pools():
+    yield
+    from batch_parser import shutdown_pool
+
+    shutdown_pool()
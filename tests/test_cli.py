@@ -0,0 +1,34 @@
+import shutil
+
+import pymupdf
+
+import cli
+
+
+def run_cli(shipment, tmp_path, monkeypatch, sc_dir=None):
+    # cli.main sets MARFLOW_PARSE_WORKERS from -j; monkeypatch restores it afterwards.
+    monkeypatch.setenv("MARFLOW_PARSE_WORKERS", "2")
+    report = tmp_path / "report.csv"
+    status = cli.main([
+        shipment.packing_list, "--coa-dir", shipment.coa_dir, "--sc-dir", sc_dir or shipment.sc_dir,
+        "-o", str(report), "-q", "-j", "1", "--no-cache",
+    ])
+    return status, report
+
+
+def test_mismatches_exit_1(shipment, tmp_path, monkeypatch):
+    status, report = run_cli(shipment, tmp_path, monkeypatch)
+    assert status == (cli.EXIT_MISMATCH if shipment.mismatches else cli.EXIT_OK)
+    assert report.exists()
+
+
+def test_unreadable_certificate_exits_2(shipment, tmp_path, monkeypatch, capsys):
+    sc_dir = tmp_path / "sc"
+    shutil.copytree(shipment.sc_dir, sc_dir)
+    blank = pymupdf.open()
+    blank.new_page()
+    blank.save(str(sc_dir / "blank.pdf"))
+
+    status, _ = run_cli(shipment, tmp_path, monkeypatch, sc_dir=str(sc_dir))
+    assert status == cli.EXIT_ERROR
+    assert "parse errors: 1" in capsys.readouterr().out
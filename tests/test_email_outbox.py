@@ -0,0 +1,176 @@
+import socketserver
+import threading
+import time
+from email.message import EmailMessage
+
+import pytest
+
+import email_outbox
+from email_outbox import Outbox, Sender
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: 550 for bad@ recipients, 451 while `server.busy` counts down."""
+
+    def reply(self, line):
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply("220 test ESMTP")
+        recipients = []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            if not line:
+                return
+            command = line.split()[0].upper()
+            if command in ("EHLO", "HELO"):
+                self.reply("250 test")
+            elif command == "MAIL":
+                recipients = []
+                self.reply("250 ok")
+            elif command == "RCPT":
+                if "bad@" in line:
+                    self.reply("550 no such user")
+                else:
+                    recipients.append(line.split(":", 1)[1].strip("<> "))
+                    self.reply("250 ok")
+            elif command == "DATA":
+                self.reply("354 go ahead")
+                while self.rfile.readline().strip() != b".":
+                    pass
+                if server.busy:
+                    server.busy -= 1
+                    self.reply("451 try again later")
+                else:
+                    server.received.extend(recipients)
+                    self.reply("250 queued")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+@pytest.fixture
+def smtp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPHandler)
+    server.daemon_threads = True
+    server.connections = 0
+    server.busy = 0
+    server.received = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def settings(smtp_server):
+    return {"host": "127.0.0.1", "port": smtp_server.server_address[1], "user": None, "password": None,
+            "sender": "qc@example.com", "security": "none"}
+
+
+def message(to):
+    msg = EmailMessage()
+    msg["From"] = "qc@example.com"
+    msg["To"] = to
+    msg["Subject"] = "Validation Report"
+    msg.set_content("report")
+    return msg
+
+
+def test_one_connection_is_reused(tmp_path, smtp_server, settings):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    sender = Sender(outbox, settings)
+    ids = [outbox.enqueue(message(f"user{i}@example.com")) for i in range(3)]
+    assert sender.send_due() == 3
+    ids.append(outbox.enqueue(message("late@example.com")))
+    assert sender.send_due() == 1
+    sender.stop()
+    assert smtp_server.connections == 1
+    assert len(smtp_server.received) == 4
+    assert [outbox.get(i)["status"] for i in ids] == ["sent"] * 4
+
+
+def test_temporary_failure_backs_off_then_retries(tmp_path, smtp_server, settings):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    sender = Sender(outbox, settings)
+    first, second = outbox.enqueue(message("a@example.com")), outbox.enqueue(message("b@example.com"))
+    smtp_server.busy = 1
+    before = time.time()
+    assert sender.send_due() == 0
+    row = outbox.get(first)
+    assert (row["status"], row["attempts"]) == ("queued", 1)
+    assert row["next_attempt"] >= before + 0.8 * email_outbox.BACKOFF_BASE
+    assert outbox.get(second)["status"] == "queued"
+    assert sender.status()["paused_until"] is not None
+    # Nothing is sent while the sender is paused.
+    assert sender.send_due() == 0
+
+    with outbox._connect() as conn:
+        conn.execute("UPDATE messages SET next_attempt = 0")
+    sender._paused_until = 0.0
+    assert sender.send_due() == 2
+    sender.stop()
+    assert outbox.get(first)["status"] == "sent"
+    assert sorted(smtp_server.received) == ["a@example.com", "b@example.com"]
+
+
+def test_permanent_failure_is_not_retried(tmp_path, smtp_server, settings):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    sender = Sender(outbox, settings)
+    bad, good = outbox.enqueue(message("bad@example.com")), outbox.enqueue(message("good@example.com"))
+    assert sender.send_due() == 1
+    sender.stop()
+    row = outbox.get(bad)
+    assert (row["status"], row["attempts"]) == ("failed", 1)
+    assert "550" in row["last_error"]
+    assert outbox.get(good)["status"] == "sent"
+    assert outbox.due() == []
+
+
+def test_claimed_messages_go_to_one_sender(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    ids = [outbox.enqueue(message(f"user{i}@example.com")) for i in range(3)]
+    claimed = outbox.due(limit=2)
+    assert [row["id"] for row in claimed] == ids[:2]
+    assert [row["id"] for row in outbox.due()] == ids[2:]
+    assert outbox.due() == []
+    outbox.release([ids[0]])
+    assert [row["id"] for row in outbox.due()] == ids[:1]
+
+
+def test_restart_delivers_what_was_left(tmp_path, smtp_server, settings):
+    path = str(tmp_path / "outbox.sqlite3")
+    outbox = Outbox(path)
+    ids = [outbox.enqueue(message(f"user{i}@example.com")) for i in range(3)]
+    # A process that claimed messages and died before sending them.
+    outbox.due(limit=2)
+
+    outbox = Outbox(path)
+    sender = Sender(outbox, settings).start()
+    deadline = time.time() + 10
+    while time.time() < deadline and any(outbox.get(i)["status"] != "sent" for i in ids):
+        time.sleep(0.05)
+    sender.stop()
+    assert [outbox.get(i)["status"] for i in ids] == ["sent"] * 3
+    assert sorted(smtp_server.received) == [f"user{i}@example.com" for i in range(3)]
+
+
+def test_stopped_sender_leaves_the_rest_of_the_batch_queued(tmp_path, smtp_server, settings):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    ids = [outbox.enqueue(message(f"user{i}@example.com")) for i in range(3)]
+    sender = Sender(outbox, settings)
+    mark_sent = outbox.mark_sent
+
+    def stop_after_first(message_id):
+        mark_sent(message_id)
+        sender._stop.set()
+
+    outbox.mark_sent = stop_after_first
+    assert sender.send_due() == 1
+    sender.stop()
+    assert [outbox.get(i)["status"] for i in ids] == ["sent", "queued", "queued"]
+    assert smtp_server.received == ["user0@example.com"]
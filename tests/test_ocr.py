@@ -0,0 +1,11 @@
+import ocr
+
+
+def test_version_suffix_needs_tesseract(monkeypatch):
+    monkeypatch.setenv("MARFLOW_OCR", "1")
+    monkeypatch.setattr(ocr, "_available", False)
+    assert ocr.version_suffix() == ""
+    monkeypatch.setattr(ocr, "_available", True)
+    assert ocr.version_suffix() == f"-ocr{ocr.OCR_VERSION}"
+    monkeypatch.setenv("MARFLOW_OCR", "0")
+    assert ocr.version_suffix() == ""
@@ -0,0 +1,23 @@
+import pytest
+
+from benchmarks.bench_packing_list import DESCRIPTION_CORPUS, legacy, vectorized
+from packaging_list_parser import parse_packaging_list
+
+
+@pytest.mark.parametrize("description", DESCRIPTION_CORPUS)
+def test_matches_per_row_baseline(description):
+    assert vectorized([description]) == legacy([description])
+
+
+def test_matches_per_row_baseline_on_the_corpus():
+    # Repeats exercise the normalize-each-unique-description-once path.
+    descriptions = DESCRIPTION_CORPUS * 3
+    assert vectorized(descriptions) == legacy(descriptions)
+
+
+def test_parsed_packing_list_matches_baseline(shipment):
+    with open(shipment.packing_list, "rb") as f:
+        df_data, index = parse_packaging_list(f)
+    sizes, descriptions = legacy(df_data["Description of Goods"].tolist())
+    assert index.df["Size"].tolist() == sizes
+    assert index.df["Description"].tolist() == descriptions
@@ -0,0 +1,36 @@
+from batch_parser import parse_batch
+from parse_cache import ParseCache, content_hash, is_cacheable
+
+calls = []
+
+
+def flaky_parser(stream):
+    """Fails (returns None, like the parsers' catch-all handlers) on the first call only."""
+    calls.append(stream.name)
+    return None if len(calls) == 1 else {"Batch No": "B1"}
+
+
+def test_failed_parse_is_not_cached(tmp_path):
+    calls.clear()
+    path = tmp_path / "coa.pdf"
+    path.write_bytes(b"%PDF-1.4 not really")
+    cache = ParseCache(disk_dir=str(tmp_path / "cache"))
+
+    first = parse_batch([str(path)], flaky_parser, max_workers=1, cache=cache)
+    assert first[0]["data"] is None and first[0]["error"]
+    assert cache.get(cache.make_key(flaky_parser, content_hash(path.read_bytes()))) == (False, None)
+
+    second = parse_batch([str(path)], flaky_parser, max_workers=1, cache=cache)
+    assert second[0] == {"name": "coa.pdf", "data": {"Batch No": "B1"}, "error": None}
+    third = parse_batch([str(path)], flaky_parser, max_workers=1, cache=cache)
+    assert third[0]["data"] == {"Batch No": "B1"}
+    assert len(calls) == 2
+
+
+def test_is_cacheable():
+    assert not is_cacheable(None)
+    assert not is_cacheable([])
+    assert not is_cacheable({})
+    assert not is_cacheable((None, None))
+    assert is_cacheable([{"Batch No": "B1"}])
+    assert is_cacheable(("df", "items"))
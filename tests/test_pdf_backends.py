@@ -0,0 +1,32 @@
+import random
+
+import pytest
+
+from benchmarks.bench_pdf_backends import write_corpus
+from coa_parser import parse_certificate_of_analysis
+from pdf_backends import TEXT_BACKENDS
+from sterilization_cert import parse_sterilization_certificate
+
+
+def differing(paths, parse_fn):
+    """Paths whose parsed fields differ between the text backends (or that parse to nothing)."""
+    bad = []
+    for path in paths:
+        parsed = [parse_fn(path, text_backend=backend) for backend in TEXT_BACKENDS]
+        if not parsed[0] or any(result != parsed[0] for result in parsed):
+            bad.append(path)
+    return bad
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    """The benchmark's varied corpus: several fonts, jittered baselines, ruled tables, annex pages."""
+    return write_corpus(str(tmp_path_factory.mktemp("backends")), random.Random(7), docs=8, annex_pages=1)
+
+
+def test_coa_fields_match_across_backends(shipment, corpus):
+    assert differing(shipment.coa_paths + corpus[0], parse_certificate_of_analysis) == []
+
+
+def test_sc_fields_match_across_backends(shipment, corpus):
+    assert differing(shipment.sc_paths + corpus[1], parse_sterilization_certificate) == []
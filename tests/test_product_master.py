@@ -0,0 +1,30 @@
+import pandas as pd
+
+from product_master import ProductMaster, catalog_value, product_size
+
+
+def items(size, description="FOLEY CATHETER 2 WAY", qty="100"):
+    return pd.DataFrame([{"Batch No": "B1", "Ref Code": "MF-1", "Description": description, "Size": size, "Qty": qty}])
+
+
+def test_learned_size_is_rebuilt_from_its_parts(tmp_path):
+    master = ProductMaster(str(tmp_path / "pm.json"))
+    assert master.learn(items("18G x CH16 x 40CM")) == 1
+    product = master.get("MF-1")
+    assert (product["gauge"], product["ch"], product["cm"]) == ("18G", "CH16", "40CM")
+    assert "quantities" not in product
+    assert catalog_value("N/A", "MF-1", master.lookup(), "size") == "18G x CH16 x 40CM"
+    assert catalog_value("CH12", "MF-1", master.lookup(), "size") == "CH12"
+
+
+def test_unrecognized_parts_keep_the_stored_size():
+    assert product_size({"size": "CH16 x 40MM", "gauge": None, "ch": "CH16", "cm": None}) == "CH16 x 40MM"
+    assert product_size({"size": "STANDARD", "gauge": None, "ch": None, "cm": None}) == "STANDARD"
+
+
+def test_missing_values_never_overwrite(tmp_path):
+    master = ProductMaster(str(tmp_path / "pm.json"))
+    master.learn(items("CH16"))
+    master.learn(items("N/A", description=""))
+    assert master.get("MF-1")["size"] == "CH16"
+    assert master.get("MF-1")["description"] == "FOLEY CATHETER 2 WAY"
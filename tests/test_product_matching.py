@@ -0,0 +1,19 @@
+import importlib
+
+import pytest
+
+import product_matching
+from benchmarks.bench_matching import CASES
+from product_matching import description_score
+
+
+@pytest.mark.parametrize("expected, actual, should_match", CASES)
+def test_description_cases(expected, actual, should_match):
+    assert description_score(expected, actual)[1] == should_match
+
+
+def test_invalid_threshold_falls_back(monkeypatch):
+    monkeypatch.setenv("MARFLOW_DESCRIPTION_THRESHOLD", "high")
+    assert importlib.reload(product_matching).DEFAULT_THRESHOLD == 1.0
+    monkeypatch.delenv("MARFLOW_DESCRIPTION_THRESHOLD")
+    importlib.reload(product_matching)
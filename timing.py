@@ -0,0 +1,174 @@
+import contextvars
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import threading
+import time
+from contextlib import nullcontext
+
+import pandas as pd
+
+logger = logging.getLogger("marflow.timing")
+
+SUMMARY_COLUMNS = ["Stage", "Calls", "Total ms", "Mean ms", "Max ms"]
+
+# Timing is off unless MARFLOW_TIMING is set, `enable()` is called (process-wide,
+# for the CLI and parser workers) or `collect_run()` is called (for the calling
+# thread's run only, e.g. one Streamlit session's script run). While off, `span`
+# hands back one shared no-op context manager and `timed` functions only pay for
+# two flag checks.
+_enabled = os.environ.get("MARFLOW_TIMING", "") not in ("", "0")
+_totals = {}
+_run_totals = contextvars.ContextVar("marflow_timing_run", default=None)
+_lock = threading.Lock()
+_NO_SPAN = nullcontext()
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = bool(on)
+
+
+def collect_run(on=True):
+    """
+    Starts (or with `on` False, stops) collecting timings for the current context
+    only, with fresh totals. Other threads, such as other Streamlit sessions and
+    background jobs, keep their own setting and totals.
+    """
+    _run_totals.set({} if on else None)
+
+
+def is_enabled():
+    return _enabled or _run_totals.get() is not None
+
+
+def _current():
+    # Called with _lock held, as `drain` swaps the process-wide dict.
+    totals = _run_totals.get()
+    return _totals if totals is None else totals
+
+
+def record(stage, seconds):
+    """Adds one timed call of `stage` to the current run's totals, else the process-wide ones."""
+    with _lock:
+        totals = _current()
+        calls, total, longest = totals.get(stage, (0, 0.0, 0.0))
+        totals[stage] = (calls + 1, total + seconds, max(longest, seconds))
+
+
+class _Span:
+    __slots__ = ("stage", "fields", "start")
+
+    def __init__(self, stage, fields):
+        self.stage = stage
+        self.fields = fields
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        record(self.stage, elapsed)
+        logger.debug("%s took %.2f ms %s", self.stage, elapsed * 1000, self.fields or "")
+        return False
+
+
+def span(stage, **fields):
+    """
+    Times a block as `stage` when timing is on. Extra `fields` (file name, backend,
+    ...) only go to the debug log line.
+    """
+    if not _enabled and _run_totals.get() is None:
+        return _NO_SPAN
+    return _Span(stage, fields)
+
+
+def timed(stage):
+    """Decorator form of `span` for whole functions."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled and _run_totals.get() is None:
+                return fn(*args, **kwargs)
+            with _Span(stage, None):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def drain():
+    """Returns the process-wide totals collected so far and clears them (used to ship worker timings back)."""
+    global _totals
+    with _lock:
+        totals, _totals = _totals, {}
+    return totals
+
+
+def merge(totals):
+    """Adds totals drained in another process to the current run's (or the process-wide) totals."""
+    with _lock:
+        own = _current()
+        for stage, (calls, total, longest) in totals.items():
+            own_calls, own_total, own_longest = own.get(stage, (0, 0.0, 0.0))
+            own[stage] = (own_calls + calls, own_total + total, max(own_longest, longest))
+
+
+def reset():
+    drain()
+
+
+def summary():
+    """Per-stage totals of the current run (or the process) as a DataFrame, slowest stage first."""
+    with _lock:
+        items = list(_current().items())
+    rows = [
+        (stage, calls, total * 1000, total * 1000 / calls, longest * 1000)
+        for stage, (calls, total, longest) in items
+    ]
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS).sort_values("Total ms", ascending=False, ignore_index=True)
+
+
+def start_profile():
+    """Starts a cProfile capture of the calling thread and returns the profiler."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def stop_profile(profiler, path=None, limit=30):
+    """
+    Stops `profiler`, optionally dumps the raw stats to `path` (for snakeviz or
+    pstats), and returns the top `limit` functions by cumulative time as text.
+    """
+    profiler.disable()
+    if path:
+        profiler.dump_stats(path)
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def profiled(path=None):
+    """Context manager that profiles its block when `path` is set, else does nothing."""
+    if not path:
+        return _NO_SPAN
+    return _Profiled(path)
+
+
+class _Profiled:
+    def __init__(self, path):
+        self.path = path
+        self.profiler = None
+
+    def __enter__(self):
+        self.profiler = start_profile()
+        return self
+
+    def __exit__(self, *exc_info):
+        stop_profile(self.profiler, self.path)
+        logger.info("cProfile stats written to %s", self.path)
+        return False
@@ -1,6 +1,11 @@
 import pandas as pd
 import re
-from dateutil import parser
+from date_normalization import normalize_date as shared_normalize_date, normalize_dates
+from match_coa_to_packing_list import merge_with_packing_list, normalize_column
+from packing_list_index import PackingListIndex
+from product_master import catalog_value, fill_from_catalog
+from product_matching import description_score
+import timing
 
 def normalize_size(size_str):
     """
@@ -27,36 +32,33 @@ def normalize_date(date_str):
     Normalize all dates to YYYY-MM format.
     Works for formats like 'Feb 2025', '2025-02', '01/2025', etc.
     """
-    date_str = str(date_str).strip()
-    if not date_str:
-        return ""
-    try:
-        dt = parser.parse(date_str, fuzzy=True)
-        return dt.strftime("%Y-%m")
-    except Exception:
-        match = re.match(r"(\d{4})[-/ ]?(\d{1,2})", date_str)
-        if match:
-            year, month = match.groups()
-            return f"{year}-{int(month):02d}"
-        return date_str.upper()
-
-def validate_sc_against_sources(sc_data: dict, packing_list_df: pd.DataFrame) -> pd.DataFrame:
+    return shared_normalize_date(date_str, precision="month")
+
+def validate_sc_against_sources(sc_data: dict, packing_list, threshold=None, products=None) -> pd.DataFrame:
     """
     Validate SC data against Packing List only and report detailed mismatches.
+    `packing_list` is a PackingListIndex (or an extracted-items DataFrame).
+    The product description is matched by token-set score against `threshold`
+    and the score is reported in the "Score" column. With a `products`
+    ProductMaster, a size or description missing from the packing list is
+    checked against the product of the row's ref code instead.
     """
     batch_no = str(sc_data.get("Batch No", "")).strip()
-    packing_match = packing_list_df[packing_list_df["Batch No"].astype(str).str.strip() == batch_no]
+    packing_match = PackingListIndex.from_any(packing_list).rows_for_batch(batch_no)
     
-    if packing_match.empty:
+    if not packing_match:
         return pd.DataFrame([{
             "Batch No": batch_no,
             "Field": "All",
             "SC Value": "N/A",
             "Expected Value": "Not found in Packing List",
-            "Validation": "❌"
+            "Validation": "❌",
+            "Score": ""
         }])
 
-    packing_row = packing_match.iloc[0]
+    packing_row = packing_match[0]
+    catalog = products.lookup() if products is not None else None
+    ref_code = packing_row.get("Ref Code", "")
     results = []
     
     def compare_field(field_name, sc_val, source_val):
@@ -68,16 +70,19 @@ def validate_sc_against_sources(sc_data: dict, packing_list_df: pd.DataFrame) ->
         if field_name in ["Mfg. Date", "Exp. Date"]:
             sc_val_clean = normalize_date(sc_val)
             source_val_clean = normalize_date(source_val)
+        score = ""
+        matched = sc_val_clean == source_val_clean
         if field_name == "Product Description":
-            sc_val_clean = normalize_product_name(sc_val)
-            source_val_clean = normalize_product_name(source_val)
-        if sc_val_clean == source_val_clean:
+            score, matched = description_score(source_val, sc_val, threshold)
+            score = round(score, 2)
+        if matched:
             return {
                 "Batch No": batch_no,
                 "Field": field_name,
                 "SC Value": sc_val,
                 "Expected Value": source_val,
-                "Validation": "✅"
+                "Validation": "✅",
+                "Score": score
             }
         else:
             return {
@@ -85,18 +90,120 @@ def validate_sc_against_sources(sc_data: dict, packing_list_df: pd.DataFrame) ->
                 "Field": field_name,
                 "SC Value": f"❌ {sc_val}",
                 "Expected Value": f"✅ {source_val}",
-                "Validation": "❌"
+                "Validation": "❌",
+                "Score": score
             }
 
     fields_to_check = [
-        ("Size", sc_data.get("Size"), packing_row.get("Size")),
+        ("Size", sc_data.get("Size"), catalog_value(packing_row.get("Size"), ref_code, catalog, "size")),
         ("Quantity", sc_data.get("Quantity"), packing_row.get("Qty")),
         ("Mfg. Date", sc_data.get("Mfg. Date"), packing_row.get("MFG Date")),
         ("Exp. Date", sc_data.get("Exp. Date"), packing_row.get("EXP Date")),
-        ("Product Description", sc_data.get("Product Description"), packing_row.get("Description"))
+        ("Product Description", sc_data.get("Product Description"), catalog_value(packing_row.get("Description"), ref_code, catalog, "description"))
     ]
 
     for field, sc_val, source_val in fields_to_check:
         results.append(compare_field(field, sc_val, source_val))
 
     return pd.DataFrame(results)
+
+
+SC_RESULT_COLUMNS = ["Batch No", "Field", "SC Value", "Expected Value", "Validation", "Score", "SC Certificate"]
+
+
+def _cleaned(series: pd.Series) -> pd.Series:
+    truthy = series.map(bool)
+    return series.map(str).str.strip().str.upper().where(truthy, "")
+
+
+@timing.timed("validate.sc")
+def validate_sc_batch(sc_records, packing_list, file_names=None, threshold=None, products=None) -> pd.DataFrame:
+    """
+    Validates every parsed SC record against the packing list in one pass.
+
+    Joins all records to the first packing-list row of their batch and compares
+    each field column-wise. The result matches concatenating
+    `validate_sc_against_sources` over the records with an "SC Certificate" column,
+    plus an "SC File" column when `file_names` (one per record) is given.
+    `threshold` is the description-score threshold and `products` an optional
+    ProductMaster, as in `validate_sc_against_sources`.
+    """
+    sc_records = list(sc_records)
+    columns = SC_RESULT_COLUMNS + (["SC File"] if file_names is not None else [])
+    if not sc_records:
+        return pd.DataFrame(columns=columns)
+
+    scs = pd.DataFrame({
+        "_order": range(len(sc_records)),
+        "Batch No": [str(sc.get("Batch No", "")).strip() for sc in sc_records],
+        "SC Certificate": pd.Series([sc.get("Batch No", "Unknown") for sc in sc_records], dtype=object),
+    })
+    for field in ["Size", "Quantity", "Mfg. Date", "Exp. Date", "Product Description"]:
+        scs[field] = pd.Series([sc.get(field) for sc in sc_records], dtype=object)
+    scs["_key"] = scs["Batch No"]
+
+    merged = merge_with_packing_list(scs, packing_list, {
+        "_size": ("Size", None),
+        "_qty": ("Qty", None),
+        "_mfg": ("MFG Date", None),
+        "_exp": ("EXP Date", None),
+        "_description": ("Description", None),
+        "_ref": ("Ref Code", ""),
+    }).drop_duplicates("_order", keep="first")
+    found = merged[merged["_row"] >= 0]
+    missing = merged[merged["_row"] < 0]
+
+    catalog = products.lookup() if products is not None else None
+    sizes = fill_from_catalog(found["_size"], found["_ref"], catalog, "size")
+    descriptions = fill_from_catalog(found["_description"], found["_ref"], catalog, "description")
+
+    # (field, sc values, packing values, normalizer or None for the plain upper-case comparison;
+    # descriptions are scored against the packing list's precomputed token sets instead)
+    checks = [
+        ("Size", found["Size"], sizes, normalize_size),
+        ("Quantity", found["Quantity"], found["_qty"], None),
+        ("Mfg. Date", found["Mfg. Date"], found["_mfg"], normalize_date),
+        ("Exp. Date", found["Exp. Date"], found["_exp"], normalize_date),
+        ("Product Description", found["Product Description"], descriptions, description_score),
+    ]
+    index = PackingListIndex.from_any(packing_list)
+
+    frames = [pd.DataFrame({
+        "_order": missing["_order"],
+        "_field": 0,
+        "Batch No": missing["Batch No"],
+        "Field": "All",
+        "SC Value": "N/A",
+        "Expected Value": "Not found in Packing List",
+        "Validation": "❌",
+        "Score": "",
+        "SC Certificate": missing["SC Certificate"],
+    })]
+    for position, (field, sc_values, source_values, normalize) in enumerate(checks):
+        score = pd.Series("", index=found.index, dtype=object)
+        if normalize is description_score:
+            scores, matched = index.description_index().score_rows(found["_row"], sc_values, threshold, source_values)
+            score = pd.Series(scores, index=found.index, dtype=object)
+            matched = pd.Series(matched, index=found.index)
+        elif normalize is None:
+            matched = _cleaned(sc_values) == _cleaned(source_values)
+        elif normalize is normalize_date:
+            matched = normalize_dates(sc_values) == normalize_dates(source_values)
+        else:
+            matched = normalize_column(sc_values, normalize) == normalize_column(source_values, normalize)
+        frames.append(pd.DataFrame({
+            "_order": found["_order"],
+            "_field": position,
+            "Batch No": found["Batch No"],
+            "Field": field,
+            "SC Value": sc_values.where(matched, "❌ " + sc_values.map(str)),
+            "Expected Value": source_values.where(matched, "✅ " + source_values.map(str)),
+            "Validation": matched.map({True: "✅", False: "❌"}),
+            "Score": score,
+            "SC Certificate": found["SC Certificate"],
+        }))
+
+    result = pd.concat(frames, ignore_index=True).sort_values(["_order", "_field"], kind="stable")
+    if file_names is not None:
+        result["SC File"] = [file_names[i] for i in result["_order"]]
+    return result[columns].reset_index(drop=True)
@@ -0,0 +1,223 @@
+import pandas as pd
+
+from batch_parser import parse_coa_batch, parse_sc_batch
+from match_coa_to_packing_list import COA_RESULT_COLUMNS, validate_coa_batch
+from packing_list_index import PackingListIndex, normalize_key
+from parse_cache import content_hash, file_name, read_file_bytes
+from results_view import ResultsView
+from shipment import CLIENT_REPORT_COLUMNS, build_client_report
+from validate_sc import SC_RESULT_COLUMNS, validate_sc_batch
+import timing
+
+
+def _batch_keys(kind, data):
+    records = [data] if kind == "coa" else data
+    return [str(record.get("Batch No", "")).strip() for record in records]
+
+
+def _signature(index, batch_nos, catalog):
+    """
+    The entry's packing-list rows (`batch_signature`) plus, with a product-master
+    `catalog`, the description and size it holds for their ref codes, so results
+    are revalidated when the product master fills in a value they were checked
+    without.
+    """
+    signature = index.batch_signature(batch_nos)
+    if catalog:
+        refs = sorted({normalize_key(row.get("Ref Code", "")) for batch_no in batch_nos for row in index.rows_for_batch(batch_no)})
+        products = [(ref, catalog.get(ref, {}).get("description"), catalog.get(ref, {}).get("size")) for ref in refs]
+        signature += repr(products)
+    return signature
+
+
+def _validate_coa(entries, packing_list, products):
+    table = validate_coa_batch(
+        [entry["data"] for entry in entries],
+        packing_list,
+        file_names=[entry["key"] for entry in entries],
+        products=products,
+    )
+    return table, "COA File"
+
+
+def _validate_sc(entries, packing_list, products):
+    records, keys = [], []
+    for entry in entries:
+        records.extend(entry["data"])
+        keys.extend([entry["key"]] * len(entry["data"]))
+    table = validate_sc_batch(records, packing_list, file_names=keys, products=products).astype(str)
+    return table, "SC File"
+
+
+KINDS = {
+    "coa": {
+        "parse": parse_coa_batch,
+        "validate": _validate_coa,
+        "columns": COA_RESULT_COLUMNS + ["COA File"],
+        "result_column": "Match",
+        "style_columns": ["Match"],
+    },
+    "sc": {
+        "parse": parse_sc_batch,
+        "validate": _validate_sc,
+        "columns": SC_RESULT_COLUMNS,
+        "result_column": "Validation",
+        "style_columns": ["SC Value", "Expected Value"],
+    },
+}
+
+
+class ValidationState:
+    """
+    Validation results for the COAs or SCs of one session, kept per file.
+
+    Entries are keyed by file content hash and name. `sync` parses only files that
+    were not seen before, drops files that were removed, and revalidates only the
+    files whose packing-list rows (or product-master entries for them) changed, so a
+    single added, removed or replaced certificate costs one file's work. The combined
+    table, client-report rows and summary counts are reassembled from the per-file
+    results. Keep one instance per kind in `st.session_state`.
+    """
+
+    def __init__(self, kind, products=None):
+        if kind not in KINDS:
+            raise ValueError(f"Unknown certificate kind: {kind!r}")
+        self.kind = kind
+        self.config = KINDS[kind]
+        # Optional ProductMaster for sizes and descriptions missing from the packing list.
+        self.products = products
+        self.entries = {}
+        self.order = []
+        self.packing_list = None
+        self.catalog_version = None
+        self._table = None
+        self._client = None
+        self._view = None
+
+    def sync(self, files, packing_list, progress=None):
+        """
+        Brings the state in line with the uploaded `files` and `packing_list`.
+        `progress` is passed to the batch parser for the files that need parsing.
+        Returns counts of the files parsed, revalidated and removed.
+        """
+        index = PackingListIndex.from_any(packing_list)
+        order, new_files = [], []
+        for uploaded_file in files:
+            key = f"{content_hash(read_file_bytes(uploaded_file))}:{file_name(uploaded_file)}"
+            order.append(key)
+            if key not in self.entries:
+                new_files.append((key, uploaded_file))
+
+        current = set(order)
+        removed = [key for key in self.entries if key not in current]
+        for key in removed:
+            del self.entries[key]
+
+        if new_files:
+            parsed = self.config["parse"]([uploaded_file for _, uploaded_file in new_files], progress=progress)
+            for (key, _), result in zip(new_files, parsed):
+                self.entries[key] = {
+                    "key": key,
+                    "name": result["name"],
+                    "data": result["data"],
+                    "error": result["error"],
+                    "signature": None,
+                    "rows": None,
+                    "client": None,
+                    "counts": {"checks": 0, "matches": 0, "mismatches": 0},
+                }
+
+        catalog_version = catalog = None
+        if self.products is not None:
+            catalog_version, catalog = self.products.version(), self.products.lookup()
+        stale = []
+        for entry in self.entries.values():
+            if not entry["data"]:
+                continue
+            if entry["signature"] is None or index is not self.packing_list or catalog_version != self.catalog_version:
+                signature = _signature(index, _batch_keys(self.kind, entry["data"]), catalog)
+                if signature != entry["signature"]:
+                    entry["signature"] = signature
+                    stale.append(entry)
+        if stale:
+            self._revalidate(stale, index)
+
+        if stale or removed or new_files or order != self.order:
+            self._table = None
+            self._client = None
+            self._view = None
+        self.order = order
+        self.packing_list = index
+        self.catalog_version = catalog_version
+        return {"parsed": len(new_files), "validated": len(stale), "removed": len(removed)}
+
+    def _revalidate(self, entries, index):
+        table, file_column = self.config["validate"](entries, index, self.products)
+        groups = dict(tuple(table.groupby(file_column, sort=False)))
+        result_column = self.config["result_column"]
+        for entry in entries:
+            rows = groups.get(entry["key"], table.iloc[0:0])
+            if file_column in self.config["columns"]:
+                rows = rows.assign(**{file_column: entry["name"]})
+            rows = rows[self.config["columns"]].reset_index(drop=True)
+            entry["rows"] = rows
+            if self.kind == "coa":
+                entry["client"] = build_client_report(rows, None, index)
+            else:
+                entry["client"] = build_client_report(None, rows, index)
+            entry["counts"] = {
+                "checks": len(rows),
+                "matches": int((rows[result_column] == "✅").sum()),
+                "mismatches": int((rows[result_column] == "❌").sum()),
+            }
+
+    def _validated(self):
+        for key in self.order:
+            entry = self.entries[key]
+            if entry["rows"] is not None:
+                yield entry
+
+    def table(self):
+        """The combined validation table in upload order, or None if nothing was parsed."""
+        if self._table is None:
+            frames = [entry["rows"] for entry in self._validated()]
+            with timing.span(f"aggregate.{self.kind}"):
+                self._table = pd.concat(frames, ignore_index=True) if frames else None
+        return self._table
+
+    def view(self):
+        """A ResultsView of `table()` (None if nothing was parsed), rebuilt only when the table changes."""
+        if self._view is None and self.table() is not None:
+            self._view = ResultsView(self.table(), self.config["result_column"], self.config["style_columns"])
+        return self._view
+
+    def client_rows(self):
+        """This kind's part of the client report, in upload order."""
+        if self._client is None:
+            frames = [entry["client"] for entry in self._validated()]
+            self._client = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=CLIENT_REPORT_COLUMNS)
+        return self._client
+
+    def counts(self):
+        """Summary counts ({"checks", "matches", "mismatches"}) summed from the per-file counts."""
+        totals = {"checks": 0, "matches": 0, "mismatches": 0}
+        for entry in self._validated():
+            for name, value in entry["counts"].items():
+                totals[name] += value
+        return totals
+
+    def certificates(self):
+        """Yields ("COA" or "SC", file name, parsed fields) for every validated certificate."""
+        for entry in self._validated():
+            records = [entry["data"]] if self.kind == "coa" else entry["data"]
+            for record in records:
+                yield self.kind.upper(), entry["name"], record
+
+    def errors(self):
+        """Parse errors of the current files, in upload order."""
+        return [self.entries[key]["error"] for key in self.order if not self.entries[key]["data"]]
+
+
+def client_report(coa_state, sc_state):
+    """The client report from the per-file rows of both states (COA rows first, as in `build_client_report`)."""
+    return pd.concat([coa_state.client_rows(), sc_state.client_rows()], ignore_index=True)
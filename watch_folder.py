@@ -0,0 +1,522 @@
+"""
+Folder watcher that validates shipments as their documents arrive.
+
+    python watch_folder.py --packing-list-dir PL/ --coa-dir COAS/ --sc-dir SCS/ -o REPORTS/
+
+Polls the folders every `--interval` seconds. A file is parsed once its size and
+modification time have stayed the same for `--settle` seconds, so files still
+being copied are left alone. At most `--max-in-flight` files are read and queued
+on the parser pool at a time; the rest wait on disk, so a bulk copy of hundreds
+of files never holds more than that in memory. Parsed results are kept with each
+file's size, modification time and parser version (which includes whether OCR is
+on) in a SQLite state file in the output folder, so unchanged files are not
+parsed again, not even after a restart, until the parser changes.
+
+COAs and SC certificate pages are grouped with the packing list that lists their
+batch number. Once every batch of a packing list has a COA and an SC page, the
+report (client report, COA and SC sheets) is written to the output folder. It is
+written again only if one of the shipment's documents changes.
+"""
+import argparse
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+
+DEFAULT_INTERVAL = 2.0
+DEFAULT_SETTLE = 3.0
+STATE_FILE = ".watch_folder.sqlite3"
+EXTENSIONS = {"packing_list": (".xlsx", ".xls"), "coa": (".pdf",), "sc": (".pdf",)}
+# Names used by editors and copy tools for files that are still being written.
+TEMPORARY_PREFIXES = (".", "~$")
+TEMPORARY_SUFFIXES = (".tmp", ".part", ".partial", ".crdownload")
+# A worker crash fails every file in flight, so each is retried before it is marked failed.
+MAX_CRASHES = 2
+
+EXIT_OK = 0
+EXIT_ERROR = 2
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    parser TEXT,
+    parsed BLOB,
+    error TEXT,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reports (
+    packing_list TEXT PRIMARY KEY,
+    signature TEXT NOT NULL,
+    report TEXT NOT NULL,
+    mismatches INTEGER NOT NULL,
+    written REAL NOT NULL
+);
+"""
+
+
+def list_files(directory, extensions):
+    """Yields (path, (size, mtime_ns)) for the non-empty files in `directory` with one of `extensions`."""
+    try:
+        entries = list(os.scandir(directory))
+    except OSError as e:
+        logger.warning("⚠️ Cannot list `%s`: %s", directory, e)
+        return
+    for entry in entries:
+        name = entry.name
+        if name.startswith(TEMPORARY_PREFIXES) or name.lower().endswith(TEMPORARY_SUFFIXES):
+            continue
+        if not name.lower().endswith(extensions):
+            continue
+        try:
+            if not entry.is_file():
+                continue
+            stat = entry.stat()
+        except OSError:
+            continue
+        if stat.st_size:
+            yield entry.path, (stat.st_size, stat.st_mtime_ns)
+
+
+class WatchState:
+    """
+    Parsed files and written reports in a SQLite file, so the watcher picks up
+    where it left off after a restart.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            # State files from before the parser version was kept; their rows are parsed again.
+            if "parser" not in {row[1] for row in conn.execute("PRAGMA table_info(files)")}:
+                conn.execute("ALTER TABLE files ADD COLUMN parser TEXT")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def files(self):
+        """Returns {path: {"kind", "stamp", "parser", "parsed", "error"}} for every file processed so far."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT path, kind, size, mtime_ns, parser, parsed, error FROM files").fetchall()
+        return {
+            path: {"kind": kind, "stamp": (size, mtime_ns), "parser": parser,
+                   "parsed": pickle.loads(parsed) if parsed else None, "error": error}
+            for path, kind, size, mtime_ns, parser, parsed, error in rows
+        }
+
+    def put_file(self, path, kind, stamp, parser, parsed, error):
+        blob = pickle.dumps(parsed, protocol=pickle.HIGHEST_PROTOCOL) if parsed is not None else None
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (path, kind, size, mtime_ns, parser, parsed, error, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (path, kind, stamp[0], stamp[1], parser, blob, error, time.time()),
+            )
+
+    def forget(self, paths):
+        with self._connect() as conn:
+            conn.executemany("DELETE FROM files WHERE path = ?", [(path,) for path in paths])
+
+    def report(self, packing_list):
+        """Returns (signature, report path) of the last report written for a packing list, or None."""
+        with self._connect() as conn:
+            return conn.execute("SELECT signature, report FROM reports WHERE packing_list = ?", (packing_list,)).fetchone()
+
+    def put_report(self, packing_list, signature, report, mismatches):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO reports (packing_list, signature, report, mismatches, written) VALUES (?, ?, ?, ?, ?)",
+                (packing_list, signature, report, mismatches, time.time()),
+            )
+
+
+class FolderWatcher:
+    """
+    Polls the packing-list, COA and SC folders (`folders` maps "packing_list",
+    "coa" and "sc" to a directory), parses settled files on the shared parser pool
+    and writes a report for every shipment whose documents are all present.
+
+    Call `poll` repeatedly, or `run` to loop. `products` (a ProductMaster) and
+    `history` (a HistoryStore) are optional, as in cli.py.
+    """
+
+    def __init__(self, folders, output_dir, state_path=None, settle=DEFAULT_SETTLE, workers=None,
+                 max_in_flight=None, interval=DEFAULT_INTERVAL, products=None, history=None):
+        from batch_parser import default_worker_count
+        from parse_cache import get_default_cache, parser_version
+
+        self.folders = folders
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self.state = WatchState(state_path or os.path.join(output_dir, STATE_FILE))
+        self.settle = settle
+        self.interval = interval
+        self.workers = workers or default_worker_count()
+        self.max_in_flight = max_in_flight or 2 * self.workers
+        self.products = products
+        self.history = history
+        self.cache = get_default_cache()
+        # A stored parse is reused only while the parser (and OCR setting) it came from is the same.
+        self.versions = {kind: parser_version(self._parser(kind)) for kind in EXTENSIONS}
+        self.files = self.state.files()
+        self._seen = {}
+        self._queue = deque()
+        self._queued = set()
+        self._in_flight = {}
+        self._crashes = {}
+        self._indexes = {}
+        self._last_scan = None
+        self._last_check = None
+        self._changed = True
+
+    def scan(self):
+        """
+        Lists the folders and queues the files that are new, changed or parsed by
+        an older parser, once they have settled: seen unchanged on a later scan at
+        least `settle` seconds after the first. The modification time itself is
+        not trusted, as copies that keep it (cp -p, rsync, unzip) can still be
+        half-written. Files that disappeared are forgotten.
+        """
+        now = time.monotonic()
+        self._last_scan = now
+        present = set()
+        for kind, directory in self.folders.items():
+            for path, stamp in list_files(directory, EXTENSIONS[kind]):
+                present.add(path)
+                record = self.files.get(path)
+                if path in self._queued or (record and record["stamp"] == stamp and record["parser"] == self.versions[kind]):
+                    continue
+                seen = self._seen.get(path)
+                if seen is None or seen[0] != stamp:
+                    self._seen[path] = (stamp, now)
+                    continue
+                if now - seen[1] >= self.settle:
+                    del self._seen[path]
+                    self._queue.append((path, kind, stamp))
+                    self._queued.add(path)
+
+        gone = [path for path in self.files if path not in present]
+        if gone:
+            for path in gone:
+                logger.info("🗑️ `%s` was removed", os.path.basename(path))
+                del self.files[path]
+            self.state.forget(gone)
+            self._changed = True
+        for path in [path for path in self._seen if path not in present]:
+            del self._seen[path]
+
+    def submit(self):
+        """Moves queued files onto the parser pool while fewer than `max_in_flight` are being parsed."""
+        from batch_parser import submit_parse
+        from parse_cache import content_hash
+
+        while self._queue and len(self._in_flight) < self.max_in_flight:
+            path, kind, stamp = self._queue.popleft()
+            parse_fn = self._parser(kind)
+            name = os.path.basename(path)
+            try:
+                with open(path, "rb") as fh:
+                    data = fh.read()
+            except OSError as e:
+                logger.warning("⚠️ Could not read `%s`: %s", name, e)
+                self._queued.discard(path)
+                continue
+            key = self.cache.make_key(parse_fn, content_hash(data))
+            found, value = self.cache.get(key)
+            if found:
+                self._finish(path, kind, stamp, value)
+                continue
+            future = submit_parse(parse_fn, name, data)
+            self._in_flight[future] = (path, kind, stamp, key)
+            logger.debug("⏳ Parsing `%s` (%d queued, %d in flight)", name, len(self._queue), len(self._in_flight))
+
+    def collect(self, timeout):
+        """Waits up to `timeout` seconds for parses to finish and records the results."""
+        import timing
+        from parse_cache import is_cacheable
+
+        if not self._in_flight:
+            return
+        done, _ = wait(self._in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            path, kind, stamp, key = self._in_flight.pop(future)
+            name = os.path.basename(path)
+            try:
+                value, worker_timings = future.result()
+            except BrokenProcessPool as e:
+                self._crashes[path] = self._crashes.get(path, 0) + 1
+                if self._crashes[path] < MAX_CRASHES:
+                    self._queue.append((path, kind, stamp))
+                else:
+                    self._finish(path, kind, stamp, None, f"Parser worker crashed on `{name}`: {e}")
+            except Exception as e:
+                self._finish(path, kind, stamp, None, f"Parsing `{name}` failed: {e}")
+            else:
+                if worker_timings:
+                    timing.merge(worker_timings)
+                if is_cacheable(value):
+                    self.cache.put(key, value)
+                self._finish(path, kind, stamp, value)
+
+    @staticmethod
+    def _parser(kind):
+        if kind == "packing_list":
+            from packaging_list_parser import parse_packaging_list
+
+            return parse_packaging_list
+        if kind == "coa":
+            from coa_parser import parse_certificate_of_analysis
+
+            return parse_certificate_of_analysis
+        from sterilization_cert import parse_sterilization_certificate
+
+        return parse_sterilization_certificate
+
+    def _finish(self, path, kind, stamp, value, error=None):
+        name = os.path.basename(path)
+        if kind == "packing_list" and value is not None:
+            # Only the extracted items are kept; the index is rebuilt from them.
+            value = value[1].df if value[0] is not None else None
+        # Empty certificates ([] from an SC with no readable pages) fail like None.
+        empty = value is None if kind == "packing_list" else not value
+        if empty and error is None:
+            error = f"Could not extract data from `{name}`"
+            value = None
+        self._queued.discard(path)
+        self._crashes.pop(path, None)
+        parser = self.versions[kind]
+        self.files[path] = {"kind": kind, "stamp": stamp, "parser": parser, "parsed": value, "error": error}
+        self.state.put_file(path, kind, stamp, parser, value, error)
+        self._changed = True
+        if error:
+            logger.warning("❌ %s", error)
+            return
+        logger.info("✅ Parsed `%s`", name)
+        if kind == "packing_list" and self.products is not None:
+            self.products.learn(value, source=name)
+
+    def _packing_list(self, path):
+        from packing_list_index import PackingListIndex
+
+        record = self.files[path]
+        cached = self._indexes.get(path)
+        if cached is None or cached[0] != record["stamp"]:
+            cached = self._indexes[path] = (record["stamp"], PackingListIndex(record["parsed"]))
+        return cached[1]
+
+    def shipments(self):
+        """
+        Groups the parsed certificates with the packing lists that list their batch
+        numbers. Returns {packing-list path: {"index", "coa", "sc", "missing_coa",
+        "missing_sc"}}; "coa" and "sc" hold `parse_batch`-style results (an SC keeps
+        only its pages for that packing list) and "missing_*" the batches not
+        covered yet.
+        """
+        from packing_list_index import normalize_key
+
+        shipments = {}
+        owners = {}
+        for path, record in sorted(self.files.items()):
+            if record["kind"] == "packing_list" and record["parsed"] is not None:
+                index = self._packing_list(path)
+                shipments[path] = {"index": index, "coa": [], "sc": []}
+                for batch_no in index.batch_index:
+                    if batch_no:
+                        owners.setdefault(batch_no, []).append(path)
+
+        covered = {path: {"coa": set(), "sc": set()} for path in shipments}
+        for path, record in sorted(self.files.items()):
+            if record["parsed"] is None or record["kind"] == "packing_list":
+                continue
+            name = os.path.basename(path)
+            pages = [record["parsed"]] if record["kind"] == "coa" else record["parsed"]
+            by_owner = {}
+            for page in pages:
+                batch_no = normalize_key(page.get("Batch No", ""))
+                for owner in owners.get(batch_no, ()):
+                    by_owner.setdefault(owner, []).append(page)
+                    covered[owner][record["kind"]].add(batch_no)
+            for owner, owned in by_owner.items():
+                data = owned[0] if record["kind"] == "coa" else owned
+                shipments[owner][record["kind"]].append({"name": name, "data": data, "error": None, "path": path})
+
+        for path, shipment in shipments.items():
+            batches = {batch_no for batch_no in shipment["index"].batch_index if batch_no}
+            shipment["missing_coa"] = sorted(batches - covered[path]["coa"])
+            shipment["missing_sc"] = sorted(batches - covered[path]["sc"])
+        return shipments
+
+    def _signature(self, path, shipment):
+        paths = [path] + [parsed["path"] for parsed in shipment["coa"] + shipment["sc"]]
+        return repr(sorted((p, self.files[p]["stamp"], self.files[p]["parser"]) for p in paths))
+
+    def report_path(self, packing_list_path):
+        stem = os.path.splitext(os.path.basename(packing_list_path))[0]
+        return os.path.join(self.output_dir, f"{stem}_validation.xlsx")
+
+    def write_reports(self):
+        """Writes the report of every complete shipment whose documents changed; returns the paths written."""
+        written = []
+        for path, shipment in self.shipments().items():
+            name = os.path.basename(path)
+            if shipment["missing_coa"] or shipment["missing_sc"]:
+                logger.debug("⏳ `%s`: waiting for %d COA and %d SC batches", name,
+                            len(shipment["missing_coa"]), len(shipment["missing_sc"]))
+                continue
+            signature = self._signature(path, shipment)
+            previous = self.state.report(path)
+            if previous and previous[0] == signature and os.path.exists(previous[1]):
+                continue
+            written.append(self.write_report(path, shipment, signature))
+        return written
+
+    def write_report(self, path, shipment, signature):
+        import timing
+        from report_export import report_signature, write_report
+        from shipment import build_client_report, build_coa_table, build_sc_table, count_mismatches
+
+        index = shipment["index"]
+        with timing.span("watch.report", file=os.path.basename(path)):
+            coa_table = build_coa_table(shipment["coa"], index, self.products)
+            sc_table = build_sc_table(shipment["sc"], index, self.products)
+            client_report = build_client_report(coa_table, sc_table, index)
+            report = self.report_path(path)
+            tmp = os.path.join(self.output_dir, f".{os.path.basename(report)}.{os.getpid()}.tmp")
+            write_report(tmp, client_report, coa_table, sc_table)
+            os.replace(tmp, report)
+        mismatches = count_mismatches(coa_table, sc_table)
+        self.state.put_report(path, signature, report, mismatches)
+        if self.history is not None:
+            history_signature = repr(report_signature(coa_table, sc_table))
+            if not self.history.has_shipment(history_signature):
+                certificates = [("COA", parsed["name"], parsed["data"]) for parsed in shipment["coa"]]
+                certificates += [("SC", parsed["name"], page) for parsed in shipment["sc"] for page in parsed["data"]]
+                self.history.record_shipment(index, coa_table, sc_table, certificates=certificates,
+                                             packing_list_name=os.path.basename(path), signature=history_signature)
+        logger.info("📄 `%s`: %d COAs, %d SC certificates, %d mismatches → %s", os.path.basename(path),
+                    len(shipment["coa"]), sum(len(parsed["data"]) for parsed in shipment["sc"]), mismatches, report)
+        return report
+
+    def poll(self):
+        """
+        One round: lists the folders (at most once per `interval`), keeps the
+        parser pool fed, waits up to `interval` for a parse to finish and, if
+        anything changed, writes the reports of complete shipments (at most once
+        per `interval` while files are still being parsed). Returns the report
+        paths written.
+        """
+        if self._last_scan is None or time.monotonic() - self._last_scan >= self.interval:
+            self.scan()
+        self.submit()
+        if self._in_flight:
+            self.collect(self.interval)
+            self.submit()
+        elif not self._queue:
+            # Nothing to do until the next scan.
+            time.sleep(max(0.0, self._last_scan + self.interval - time.monotonic()))
+        now = time.monotonic()
+        if not self._changed or (self._in_flight and self._last_check is not None and now - self._last_check < self.interval):
+            return []
+        self._changed = False
+        self._last_check = now
+        return self.write_reports()
+
+    def idle(self):
+        """True when every file in the folders has been processed."""
+        return not (self._queue or self._in_flight or self._seen)
+
+    def run(self, once=False):
+        """Polls until interrupted, or with `once` until every file present has been processed."""
+        while True:
+            self.poll()
+            if once and self.idle():
+                self.scan()
+                if self.idle():
+                    return
+
+
+def build_arg_parser():
+    ap = argparse.ArgumentParser(description="Validate shipments as their documents are dropped into folders.")
+    ap.add_argument("--packing-list-dir", required=True, help="Folder of packing list Excel files")
+    ap.add_argument("--coa-dir", required=True, help="Folder of COA PDFs")
+    ap.add_argument("--sc-dir", required=True, help="Folder of sterilization certificate PDFs")
+    ap.add_argument("-o", "--output-dir", required=True, help="Folder for the reports (and the watcher's state file)")
+    ap.add_argument("--state", help=f"State file (default: OUTPUT_DIR/{STATE_FILE})")
+    ap.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Seconds between folder scans")
+    ap.add_argument("--settle", type=float, default=DEFAULT_SETTLE, help="Seconds a file must stay unchanged before it is parsed")
+    ap.add_argument("-j", "--workers", type=int, default=None, help="Parser worker processes (default: MARFLOW_PARSE_WORKERS or CPU count)")
+    ap.add_argument("--max-in-flight", type=int, default=None, help="Files read and queued for parsing at once (default: twice the workers)")
+    ap.add_argument("--history", action="store_true", help="Save each report to the validation history (MARFLOW_HISTORY_DB)")
+    ap.add_argument("--product-master", action="store_true",
+                    help="Add packing lists to the product master (MARFLOW_PRODUCT_MASTER) and check sizes and descriptions they lack against it")
+    ap.add_argument("--ocr", action="store_true", help="Read scanned pages with Tesseract (same as MARFLOW_OCR=1)")
+    ap.add_argument("--once", action="store_true", help="Process the files present and exit instead of watching")
+    ap.add_argument("-q", "--quiet", action="store_true", help="Only log warnings")
+    ap.add_argument("-v", "--verbose", action="store_true", help="Log every file queued and timing span")
+    return ap
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    level = logging.DEBUG if args.verbose else logging.WARNING if args.quiet else logging.INFO
+    logging.basicConfig(level=level, format="%(asctime)s %(message)s")
+    folders = {"packing_list": args.packing_list_dir, "coa": args.coa_dir, "sc": args.sc_dir}
+    for directory in folders.values():
+        if not os.path.isdir(directory):
+            print(f"❌ Not a directory: `{directory}`", file=sys.stderr)
+            return EXIT_ERROR
+
+    if args.ocr:
+        # Set before the parsers are imported: their cache version includes it.
+        os.environ["MARFLOW_OCR"] = "1"
+    if args.workers:
+        # The shared parser pool is sized from this when it is first used.
+        os.environ["MARFLOW_PARSE_WORKERS"] = str(args.workers)
+    import timing
+    from batch_parser import shutdown_pool
+
+    timing.enable(args.verbose)
+    products = history = None
+    if args.product_master:
+        from product_master import get_product_master
+
+        products = get_product_master()
+    if args.history:
+        from history_store import get_history_store
+
+        history = get_history_store()
+
+    watcher = FolderWatcher(folders, args.output_dir, state_path=args.state, settle=args.settle, workers=args.workers,
+                            max_in_flight=args.max_in_flight, interval=args.interval, products=products, history=history)
+    logger.info("👀 Watching %s", ", ".join(f"`{directory}`" for directory in folders.values()))
+    try:
+        watcher.run(once=args.once)
+    except KeyboardInterrupt:
+        logger.info("👋 Stopped")
+    finally:
+        shutdown_pool()
+    return EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())